@@ -0,0 +1,377 @@
+# Python
+from typing import Any, Dict, Iterator, Tuple
+import codecs
+import json
+import re
+import os
+
+# Internal
+from utilities import hash_file
+from ArchiveWriter import CHECKSUM_SUFFIX_PATTERN, CHECKSUM_SUFFIX_SIZE
+
+# Reading more than this at once does not make parsing any faster.
+CHUNK_SIZE: int = 64*1024
+
+# In an archive written by ArchiveWriter, the key of each playlist is the only 
+# thing at the start of a line that is indented by exactly 8 spaces (strings 
+# never have raw newlines in JSON).
+PLAYLIST_KEY_PATTERN = re.compile(rb'\n        ("(?:[^"\\\n]|\\.)*"):')
+
+
+class JSONStream:
+    '''
+    This class parses a JSON document from a binary file a bit at a time, 
+    without reading the whole file.
+
+    It only knows how to walk through objects key by key (iterate_keys()), 
+    any value can then be either decoded as a whole (decode_value()) or 
+    walked through the same way if it is an object. This is all an archive 
+    needs, and it means only the value being decoded has to fit in memory.
+
+    Every method raises ValueError (json.JSONDecodeError is one) if the 
+    document is not valid JSON.
+    '''
+
+    def __init__(self, file, offset: int = 0):
+        '''
+        Params:
+            file: a file opened for reading in binary mode, positioned at the 
+            start of what should be parsed.
+            offset: the position of the file in bytes, only used so that 
+            get_offset() can tell where a value starts.
+        '''
+
+        self.file = file
+
+        self.utf8_decoder = codecs.getincrementaldecoder("utf-8")()
+        self.json_decoder = json.JSONDecoder()
+
+        self.buffer: str = ""
+        self.index: int = 0
+        self.eof: bool = False
+
+        # The byte offset of buffer[counted_index] in the file.
+        self.counted_index: int = 0
+        self.counted_offset: int = offset
+
+    def read_more(self, amount: int = CHUNK_SIZE) -> bool:
+        '''
+        This method reads at least amount bytes more into the buffer, 
+        dropping the part of the buffer that was already parsed.
+
+        Returns:
+            False if the end of the file was already reached, True otherwise.
+        '''
+
+        if (self.eof):
+            return False
+
+        self.get_offset()
+
+        data = self.file.read(max(amount, CHUNK_SIZE))
+
+        if not (data):
+            self.eof = True
+
+        self.buffer = self.buffer[self.index:] + self.utf8_decoder.decode(
+            data, final=self.eof
+        )
+        self.index = 0
+        self.counted_index = 0
+
+        return True
+
+    def get_offset(self) -> int:
+        '''
+        Returns:
+            The offset in bytes (in the file) of the next character to parse.
+        '''
+
+        self.counted_offset += len(
+            self.buffer[self.counted_index:self.index].encode("utf-8")
+        )
+        self.counted_index = self.index
+
+        return self.counted_offset
+
+    def peek(self) -> str:
+        '''
+        This method skips whitespaces then returns the next character without 
+        consuming it, "" if the document has ended.
+        '''
+
+        while True:
+
+            while (self.index < len(self.buffer) and 
+                   self.buffer[self.index] in " \t\n\r"):
+
+                self.index += 1
+
+            if (self.index < len(self.buffer)):
+                return self.buffer[self.index]
+
+            if not (self.read_more()):
+                return ""
+
+    def expect(self, character: str) -> None:
+        '''
+        This method consumes the next (non whitespace) character, which must 
+        be the given one.
+        '''
+
+        found = self.peek()
+
+        if (found != character):
+            raise ValueError(
+                f"Expected {character!r} at byte {self.get_offset()} but found {found!r}"
+            )
+
+        self.index += 1
+
+    def expect_end(self) -> None:
+        '''
+        This method checks that there is nothing but whitespaces left.
+        '''
+
+        found = self.peek()
+
+        if (found != ""):
+            raise ValueError(
+                f"Expected the end of the document at byte {self.get_offset()} but found {found!r}"
+            )
+
+    def decode_value(self) -> Any:
+        '''
+        This method decodes the next value as a whole.
+
+        Returns:
+            The Python equivalent of the value (like json.load()).
+        '''
+
+        self.peek()
+
+        while True:
+
+            try:
+                value, end = self.json_decoder.raw_decode(self.buffer, self.index)
+
+                # A number could go on in the next chunk.
+                if (end < len(self.buffer) or self.eof or 
+                    not isinstance(value, (int, float))):
+
+                    self.index = end
+                    return value
+
+            except json.JSONDecodeError:
+
+                if (self.eof):
+                    raise
+
+            # Doubling what is read every time keeps decoding a big value 
+            # linear, even though it is decoded again from the start.
+            self.read_more(len(self.buffer) - self.index)
+
+    def iterate_keys(self) -> Iterator[str]:
+        '''
+        This method walks through an object, it yields the keys one by one. 
+        After each key, the caller must consume the value of that key (with 
+        decode_value() or by walking through it) before asking for the next 
+        one.
+        '''
+
+        self.expect("{")
+
+        if (self.peek() == "}"):
+            self.index += 1
+            return
+
+        while True:
+            key = self.decode_value()
+
+            if not (isinstance(key, str)):
+                raise ValueError(f"Expected a string key at byte {self.get_offset()}")
+
+            self.expect(":")
+
+            yield key
+
+            if (self.peek() == "}"):
+                self.index += 1
+                return
+
+            self.expect(",")
+
+
+class ArchiveReader:
+    '''
+    This class reads an archive (see README for the format) one playlist at 
+    a time, so that no matter how big the archive is, only one playlist has 
+    to be in memory.
+
+    While playlists are iterated, the offset of each one in the file is 
+    remembered, so that a playlist can be read again later on its own 
+    (read_playlist()) without going through the file again.
+    '''
+
+    def __init__(self, file):
+        '''
+        Params:
+            file: the archive, opened for reading in binary mode.
+        '''
+
+        self.file = file
+
+        # The time attribute of the archive, only known once iterate() went 
+        # past it.
+        self.time: Any = None
+
+        # Playlist id -> offset in bytes of the playlist in the file.
+        self.offsets: Dict[str, int] = {}
+
+    def iterate(self) -> Iterator[Tuple[str, Any]]:
+        '''
+        This method goes through the whole archive from the start, yielding 
+        the playlists one by one.
+
+        Yields:
+            (playlist id, playlist) for each entry of the playlists 
+            attribute, in the order of the file.
+
+        Raises:
+            ValueError if the file is not valid JSON or is not a JSON object 
+            with a "playlists" object.
+        '''
+
+        self.file.seek(0)
+
+        stream = JSONStream(self.file)
+
+        has_playlists = False
+
+        for key in stream.iterate_keys():
+
+            if (key == "playlists" and stream.peek() == "{"):
+                has_playlists = True
+
+                for playlist_id in stream.iterate_keys():
+                    offset = stream.get_offset()
+
+                    playlist = stream.decode_value()
+
+                    self.offsets[playlist_id] = offset
+
+                    yield playlist_id, playlist
+
+            elif (key == "time"):
+                self.time = stream.decode_value()
+
+            else:
+                stream.decode_value()
+
+        stream.expect_end()
+
+        if not (has_playlists):
+            raise ValueError("The archive has no playlists object")
+
+    def read_time(self) -> Any:
+        '''
+        This method finds the time attribute without reading the playlists, 
+        unless the time comes after them in the file (archiver.py always 
+        writes it first).
+
+        Returns:
+            The time attribute, None if there is none.
+
+        Raises:
+            ValueError if the file is not valid JSON.
+        '''
+
+        self.file.seek(0)
+
+        stream = JSONStream(self.file)
+
+        for key in stream.iterate_keys():
+
+            if (key == "time"):
+                self.time = stream.decode_value()
+                return self.time
+
+            stream.decode_value()
+
+        return None
+
+    def find_playlists(self) -> None:
+        '''
+        This method finds where each playlist is (like iterate() does) 
+        without parsing them, by looking for the keys of the playlists where 
+        ArchiveWriter puts them. So it must only be used on archives written 
+        by ArchiveWriter, which verify_checksum() makes sure of.
+        '''
+
+        self.file.seek(0)
+
+        # The offset in the file of buffer[0].
+        buffer_offset = 0
+        buffer = b""
+
+        while True:
+            data = self.file.read(16*CHUNK_SIZE)
+
+            buffer += data
+
+            # The last line may go on in the next chunk.
+            end = buffer.rfind(b"\n") if (data) else len(buffer)
+
+            for match in PLAYLIST_KEY_PATTERN.finditer(buffer, 0, max(end, 0)):
+                playlist_id = json.loads(match.group(1))
+
+                self.offsets[playlist_id] = buffer_offset + match.end()
+
+            if not (data):
+                return
+
+            if (end > 0):
+                buffer_offset += end
+                buffer = buffer[end:]
+
+    def verify_checksum(self) -> bool:
+        '''
+        This method checks the checksum that ArchiveWriter puts at the end of 
+        the archive, without parsing anything.
+
+        Returns:
+            True if the archive has a checksum and it matches, False 
+            otherwise.
+        '''
+
+        self.file.seek(0, os.SEEK_END)
+        checksum_offset = self.file.tell() - CHECKSUM_SUFFIX_SIZE
+
+        if (checksum_offset < 0):
+            return False
+
+        self.file.seek(checksum_offset)
+        match = CHECKSUM_SUFFIX_PATTERN.fullmatch(self.file.read())
+
+        if (match == None):
+            return False
+
+        return hash_file(self.file, checksum_offset).hex() == match.group(1).decode("ascii")
+
+    def read_playlist(self, playlist_id: str) -> Any:
+        '''
+        This method reads a single playlist, which must have been gone 
+        through by iterate() before.
+
+        Params:
+            The id of the playlist.
+
+        Returns:
+            The playlist (the Python equivalent of its JSON).
+        '''
+
+        offset = self.offsets[playlist_id]
+
+        self.file.seek(offset)
+
+        return JSONStream(self.file, offset).decode_value()
@@ -0,0 +1,139 @@
+# Python
+import pathlib
+import json
+import hashlib
+import re
+import os
+
+# Internal
+from utilities import output_file_opening
+from PlaceHolder import PlaceHolder
+
+# The end of an archive written by ArchiveWriter: the checksum attribute is
+# the SHA-256 digest (in hex) of everything before it in the file.
+CHECKSUM_SUFFIX_FORMAT: str = ",\n    \"checksum\": \"{}\"\n}}"
+CHECKSUM_SUFFIX_PATTERN = re.compile(rb',\n    "checksum": "([0-9a-f]{64})"\n}')
+CHECKSUM_SUFFIX_SIZE: int = len(CHECKSUM_SUFFIX_FORMAT.format("0"*64))
+
+
+class ArchiveWriter:
+    '''
+    This class writes an archive (see README for the format) to a file one 
+    playlist at a time, so that only the playlist being written has to be in 
+    memory instead of the whole archive.
+
+    Everything is written to a temporary file next to the output file, which 
+    only replaces the output file (atomically) once the archive is complete. 
+    If the program stops before that, the output file is left as it was 
+    (which is either nothing or the previous archive) and the temporary file 
+    is removed.
+
+    The output is exactly the same as json.dump(archive, indent=4, 
+    ensure_ascii=False) of the whole archive, with the checksum attribute 
+    added last (see CHECKSUM_SUFFIX_FORMAT) so that comparator.py can trust 
+    the archive without checking every video.
+    '''
+
+    def __init__(self, output_file_path: pathlib.Path, time_str: str):
+        self.output_file_path: pathlib.Path = output_file_path
+
+        self.temporary_file_path: pathlib.Path = output_file_path.with_name(
+            f".{output_file_path.name}.tmp"
+        )
+
+        self.time_str: str = time_str
+
+        self.file = PlaceHolder.get_place_holder()
+
+        # Everything written so far.
+        self.checksum = hashlib.sha256()
+
+        self.playlist_count: int = 0
+        self.finished: bool = False
+
+    def open(self) -> bool:
+        '''
+        This method opens the temporary file and writes the start of the 
+        archive.
+
+        Returns:
+            True if successful, False otherwise (the reason is already 
+            printed).
+        '''
+
+        # Opened in binary mode so that what is hashed is exactly what is in 
+        # the file.
+        self.file = output_file_opening(self.temporary_file_path, binary=True)
+
+        if (self.file == PlaceHolder.get_place_holder()):
+            return False
+
+        self.write(
+            "{\n" 
+            f"    \"time\": {json.dumps(self.time_str, ensure_ascii=False)},\n" 
+            "    \"playlists\": {"
+        )
+
+        return True
+
+    def write_playlist(self, playlist: dict) -> None:
+        '''
+        This method appends one playlist to the archive.
+
+        Params:
+            The JSON representation of the playlist.
+        '''
+
+        if (self.playlist_count != 0):
+            self.write(",")
+
+        # json.dumps() only puts raw newlines between elements (newlines in 
+        # strings are escaped), so shifting every line by the depth of the 
+        # playlist gives the same result as dumping the whole archive.
+        playlist_str = json.dumps(playlist, ensure_ascii=False, indent=4)
+
+        self.write(
+            f"\n        {json.dumps(playlist['id'], ensure_ascii=False)}: " 
+            + playlist_str.replace("\n", "\n        ")
+        )
+
+        self.playlist_count += 1
+
+    def write(self, text: str) -> None:
+        data = text.encode("utf-8")
+
+        self.checksum.update(data)
+        self.file.write(data)
+
+    def finish(self) -> None:
+        '''
+        This method writes the end of the archive then moves it to the 
+        output file.
+        '''
+
+        if (self.playlist_count != 0):
+            self.write("\n    }")
+
+        else:
+            self.write("}")
+
+        self.file.write(
+            CHECKSUM_SUFFIX_FORMAT.format(self.checksum.hexdigest()).encode("utf-8")
+        )
+
+        self.file.close()
+
+        os.replace(self.temporary_file_path, self.output_file_path)
+
+        self.finished = True
+
+    def close(self) -> None:
+        '''
+        This method closes the temporary file, and removes it if the archive 
+        was not finished.
+        '''
+
+        self.file.close()
+
+        if (not self.finished and self.temporary_file_path.exists()):
+            os.remove(self.temporary_file_path)
@@ -0,0 +1,562 @@
+'''
+BinaryArchive.py: reading and writing archives in the binary format.
+
+The binary archive format holds exactly the same information as the JSON 
+format in README, but stores each playlist as columns (ids, names, channels) 
+instead of one object per video, and leaves out everything that can be 
+worked out again (the links, and the video ids used as keys).
+
+Layout of the file (all numbers are little endian):
+
+    MAGIC
+    playlist block, for each playlist
+    index
+    offset of the index (u64), MAGIC
+
+A playlist block is zlib compressed and contains:
+
+    flags (u8, see the FLAG_ constants)
+    id (str)
+    link (str, only if FLAG_PLAYLIST_LINK)
+    ids of the videos (str column)
+    names of the videos (str column)
+    channel table (str column, every channel once)
+    channel of each video (u32 column of indexes into the channel table)
+    keys of the videos (str column, only if FLAG_VIDEO_KEYS)
+    links of the videos (str column, only if FLAG_VIDEO_LINKS)
+    pages, as JSON (str, only if FLAG_PAGES)
+
+The index contains the time of the archive (str), the number of playlists 
+(u32) and for each playlist its id (str), the offset (u64) and size (u32) of 
+its block. So a single playlist can be read without touching the others. 
+The index ends with the SHA-256 digest (32 bytes) of everything before it in 
+the file (archives written before it was added have no digest).
+
+A str is its length in bytes (u32) followed by its UTF-8 encoding. A column 
+is the number of items (u32) followed by the items, for a str column all the 
+lengths come first then all the strings.
+'''
+
+# Python
+from typing import Any, Dict, Iterator, List, Tuple, Union
+from array import array
+import itertools
+import hashlib
+import pathlib
+import struct
+import json
+import zlib
+import sys
+import os
+
+# Internal
+from utilities import output_file_opening, hash_file
+from PlaceHolder import PlaceHolder
+from Video import YOUTUBE_VIDEO_PREFIX
+from configuration import YOUTUBE_PLAYLIST_PREFIX
+
+MAGIC: bytes = b"YTVARC01"
+
+# The playlist link is not YOUTUBE_PLAYLIST_PREFIX + id.
+FLAG_PLAYLIST_LINK: int = 1
+
+# At least one video is not keyed by its own id.
+FLAG_VIDEO_KEYS: int = 2
+
+# At least one video link is not YOUTUBE_VIDEO_PREFIX + id.
+FLAG_VIDEO_LINKS: int = 4
+
+# The playlist has the pages attribute.
+FLAG_PAGES: int = 8
+
+
+def is_binary_archive(file) -> bool:
+    '''
+    This function checks whether the given file is a binary archive.
+
+    Params:
+        A file opened for reading in binary mode, it is left at its start.
+
+    Returns:
+        True if it starts like a binary archive, False otherwise.
+    '''
+
+    file.seek(0)
+    is_binary = (file.read(len(MAGIC)) == MAGIC)
+    file.seek(0)
+
+    return is_binary
+
+def to_little_endian(numbers: array) -> array:
+
+    if (sys.byteorder == "big"):
+        numbers.byteswap()
+
+    return numbers
+
+def pack_str(string: str) -> bytes:
+    encoded = string.encode("utf-8")
+
+    return struct.pack("<I", len(encoded)) + encoded
+
+def pack_str_column(strings: List[str]) -> bytes:
+    encoded = [string.encode("utf-8") for string in strings]
+
+    lengths = to_little_endian(array("I", [len(string) for string in encoded]))
+
+    return (
+        struct.pack("<I", len(encoded)) 
+        + lengths.tobytes() 
+        + b"".join(encoded)
+    )
+
+def pack_u32_column(numbers: List[int]) -> bytes:
+    return (
+        struct.pack("<I", len(numbers)) 
+        + to_little_endian(array("I", numbers)).tobytes()
+    )
+
+
+class BufferReader:
+    '''
+    This class reads the values packed by the pack_ functions back from a 
+    bytes object, one after another.
+    '''
+
+    def __init__(self, data: bytes):
+        self.data: bytes = data
+        self.position: int = 0
+
+    def read_struct(self, format: str) -> tuple:
+        values = struct.unpack_from(format, self.data, self.position)
+        self.position += struct.calcsize(format)
+
+        return values
+
+    def read_bytes(self, length: int) -> bytes:
+
+        if (self.position + length > len(self.data)):
+            raise ValueError("The binary archive is cut off")
+
+        data = self.data[self.position:self.position + length]
+        self.position += length
+
+        return data
+
+    def read_str(self) -> str:
+        length, = self.read_struct("<I")
+
+        return self.read_bytes(length).decode("utf-8")
+
+    def read_u32_array(self, count: int) -> array:
+        numbers = array("I")
+        numbers.frombytes(self.read_bytes(count*numbers.itemsize))
+
+        return to_little_endian(numbers)
+
+    def read_u32_column(self) -> array:
+        count, = self.read_struct("<I")
+
+        return self.read_u32_array(count)
+
+    def read_str_column(self) -> List[str]:
+        count, = self.read_struct("<I")
+
+        lengths = self.read_u32_array(count)
+
+        data = self.read_bytes(sum(lengths))
+
+        strings: List[str] = []
+        start = 0
+
+        for end in itertools.accumulate(lengths):
+            strings.append(data[start:end].decode("utf-8"))
+            start = end
+
+        return strings
+
+
+def encode_playlist(playlist: dict) -> bytes:
+    '''
+    This function turns the JSON representation of a playlist into a 
+    playlist block.
+
+    Params:
+        The JSON representation of the playlist.
+
+    Returns:
+        The (compressed) playlist block.
+    '''
+
+    playlist_id = playlist["id"]
+    videos = playlist["videos"]
+
+    keys = list(videos.keys())
+    ids = [video["id"] for video in videos.values()]
+    names = [video["name"] for video in videos.values()]
+    links = [video["link"] for video in videos.values()]
+
+    channel_table: Dict[str, int] = {}
+    channel_indexes = [
+        channel_table.setdefault(video["channel"], len(channel_table)) 
+        for video in videos.values()
+    ]
+
+    flags = 0
+
+    if (playlist["link"] != YOUTUBE_PLAYLIST_PREFIX + playlist_id):
+        flags |= FLAG_PLAYLIST_LINK
+
+    if (keys != ids):
+        flags |= FLAG_VIDEO_KEYS
+
+    if (any(link != YOUTUBE_VIDEO_PREFIX + video_id 
+            for link, video_id in zip(links, ids))):
+
+        flags |= FLAG_VIDEO_LINKS
+
+    if ("pages" in playlist):
+        flags |= FLAG_PAGES
+
+    parts = [struct.pack("<B", flags), pack_str(playlist_id)]
+
+    if (flags & FLAG_PLAYLIST_LINK):
+        parts.append(pack_str(playlist["link"]))
+
+    parts.append(pack_str_column(ids))
+    parts.append(pack_str_column(names))
+    parts.append(pack_str_column(list(channel_table)))
+    parts.append(pack_u32_column(channel_indexes))
+
+    if (flags & FLAG_VIDEO_KEYS):
+        parts.append(pack_str_column(keys))
+
+    if (flags & FLAG_VIDEO_LINKS):
+        parts.append(pack_str_column(links))
+
+    if (flags & FLAG_PAGES):
+        parts.append(pack_str(json.dumps(playlist["pages"], ensure_ascii=False)))
+
+    return zlib.compress(b"".join(parts))
+
+def decode_playlist(block: bytes) -> dict:
+    '''
+    This function turns a playlist block back into the JSON representation 
+    of the playlist, exactly as it was given to encode_playlist().
+
+    Params:
+        The (compressed) playlist block.
+
+    Returns:
+        The JSON representation of the playlist.
+
+    Raises:
+        ValueError if the block is corrupted.
+    '''
+
+    try:
+        reader = BufferReader(zlib.decompress(block))
+
+        flags, = reader.read_struct("<B")
+        playlist_id = reader.read_str()
+
+        if (flags & FLAG_PLAYLIST_LINK):
+            link = reader.read_str()
+
+        else:
+            link = YOUTUBE_PLAYLIST_PREFIX + playlist_id
+
+        ids = reader.read_str_column()
+        names = reader.read_str_column()
+        channel_table = reader.read_str_column()
+        channel_indexes = reader.read_u32_column()
+
+        keys = reader.read_str_column() if (flags & FLAG_VIDEO_KEYS) else ids
+
+        if (flags & FLAG_VIDEO_LINKS):
+            links = reader.read_str_column()
+
+        else:
+            links = [YOUTUBE_VIDEO_PREFIX + video_id for video_id in ids]
+
+        videos = {
+            key: {
+                "id": video_id,
+                "name": name,
+                "channel": channel_table[channel_index],
+                "link": video_link
+            }
+            for key, video_id, name, channel_index, video_link in zip(
+                keys, ids, names, channel_indexes, links
+            )
+        }
+
+        playlist = {"id": playlist_id, "link": link, "videos": videos}
+
+        if (flags & FLAG_PAGES):
+            playlist["pages"] = json.loads(reader.read_str())
+
+    except (zlib.error, struct.error, UnicodeDecodeError, IndexError) as error:
+        raise ValueError(f"The binary archive is corrupted: {error}")
+
+    return playlist
+
+
+class BinaryArchiveWriter:
+    '''
+    This class writes an archive in the binary format, one playlist at a 
+    time. It works exactly like ArchiveWriter (see ArchiveWriter.py): 
+    everything goes to a temporary file which only replaces the output file 
+    once the archive is complete.
+    '''
+
+    def __init__(self, output_file_path: pathlib.Path, time_str: str):
+        self.output_file_path: pathlib.Path = output_file_path
+
+        self.temporary_file_path: pathlib.Path = output_file_path.with_name(
+            f".{output_file_path.name}.tmp"
+        )
+
+        self.time_str: str = time_str
+
+        self.file = PlaceHolder.get_place_holder()
+
+        # (playlist id, offset, size) of every block written.
+        self.index: List[Tuple[str, int, int]] = []
+        self.offset: int = 0
+
+        # Everything written so far.
+        self.checksum = hashlib.sha256()
+
+        self.finished: bool = False
+
+    def open(self) -> bool:
+        '''
+        This method opens the temporary file and writes the start of the 
+        archive.
+
+        Returns:
+            True if successful, False otherwise (the reason is already 
+            printed).
+        '''
+
+        self.file = output_file_opening(self.temporary_file_path, binary=True)
+
+        if (self.file == PlaceHolder.get_place_holder()):
+            return False
+
+        self.write(MAGIC)
+        self.offset = len(MAGIC)
+
+        return True
+
+    def write_playlist(self, playlist: dict) -> None:
+        '''
+        This method appends one playlist to the archive.
+
+        Params:
+            The JSON representation of the playlist.
+        '''
+
+        block = encode_playlist(playlist)
+
+        self.write(block)
+
+        self.index.append((playlist["id"], self.offset, len(block)))
+        self.offset += len(block)
+
+    def write(self, data: bytes) -> None:
+        self.checksum.update(data)
+        self.file.write(data)
+
+    def finish(self) -> None:
+        '''
+        This method writes the index then moves the archive to the output 
+        file.
+        '''
+
+        parts = [pack_str(self.time_str), struct.pack("<I", len(self.index))]
+
+        for playlist_id, offset, size in self.index:
+            parts.append(pack_str(playlist_id) + struct.pack("<QI", offset, size))
+
+        self.write(b"".join(parts))
+        self.file.write(self.checksum.digest())
+        self.file.write(struct.pack("<Q", self.offset) + MAGIC)
+
+        self.file.close()
+
+        os.replace(self.temporary_file_path, self.output_file_path)
+
+        self.finished = True
+
+    def close(self) -> None:
+        '''
+        This method closes the temporary file, and removes it if the archive 
+        was not finished.
+        '''
+
+        self.file.close()
+
+        if (not self.finished and self.temporary_file_path.exists()):
+            os.remove(self.temporary_file_path)
+
+
+class BinaryArchiveReader:
+    '''
+    This class reads an archive in the binary format. It can be used in 
+    place of ArchiveReader (see ArchiveReader.py), but since the index is at 
+    the end of the file, the time and where each playlist is are known right 
+    away, and read_playlist() works without going through the archive first.
+    '''
+
+    def __init__(self, file):
+        '''
+        Params:
+            file: the archive, opened for reading in binary mode.
+
+        Raises:
+            ValueError if the file is not a binary archive or its index is 
+            corrupted.
+        '''
+
+        self.file = file
+
+        self.time: Any = None
+
+        # Playlist id -> (offset, size) of its block.
+        self.blocks: Dict[str, Tuple[int, int]] = {}
+
+        # Playlist id -> offset of its block, like ArchiveReader.offsets.
+        self.offsets: Dict[str, int] = {}
+
+        # The digest at the end of the index and how many bytes it covers, 
+        # None if the archive has none.
+        self.checksum: Union[bytes, None] = None
+        self.checksum_offset: int = 0
+
+        self.read_index()
+
+    def read_index(self) -> None:
+
+        footer_size = struct.calcsize("<Q") + len(MAGIC)
+
+        self.file.seek(0, os.SEEK_END)
+        file_size = self.file.tell()
+
+        if (file_size < len(MAGIC) + footer_size):
+            raise ValueError("The file is too small to be a binary archive")
+
+        self.file.seek(0)
+        header = self.file.read(len(MAGIC))
+
+        self.file.seek(file_size - footer_size)
+        footer = self.file.read(footer_size)
+
+        if (header != MAGIC or footer[-len(MAGIC):] != MAGIC):
+            raise ValueError("The file is not a binary archive or is cut off")
+
+        index_offset, = struct.unpack_from("<Q", footer)
+
+        if not (len(MAGIC) <= index_offset <= file_size - footer_size):
+            raise ValueError("The index of the binary archive is corrupted")
+
+        self.file.seek(index_offset)
+        reader = BufferReader(self.file.read(file_size - footer_size - index_offset))
+
+        try:
+            self.time = reader.read_str()
+
+            count, = reader.read_struct("<I")
+
+            for _ in range(count):
+                playlist_id = reader.read_str()
+                offset, size = reader.read_struct("<QI")
+
+                self.blocks[playlist_id] = (offset, size)
+                self.offsets[playlist_id] = offset
+
+            if (len(reader.data) - reader.position == hashlib.sha256().digest_size):
+                self.checksum_offset = index_offset + reader.position
+                self.checksum = reader.read_bytes(hashlib.sha256().digest_size)
+
+        except (struct.error, UnicodeDecodeError) as error:
+            raise ValueError(f"The index of the binary archive is corrupted: {error}")
+
+    def read_time(self) -> Any:
+        return self.time
+
+    def find_playlists(self) -> None:
+        '''
+        This method does nothing, it is only there to work like 
+        ArchiveReader.find_playlists() since the index already says where 
+        each playlist is.
+        '''
+
+        pass
+
+    def verify_checksum(self) -> bool:
+        '''
+        This method checks the digest at the end of the index, without 
+        decompressing anything.
+
+        Returns:
+            True if the archive has a digest and it matches, False otherwise.
+        '''
+
+        if (self.checksum == None):
+            return False
+
+        return hash_file(self.file, self.checksum_offset) == self.checksum
+
+    def iterate(self) -> Iterator[Tuple[str, dict]]:
+        '''
+        Yields:
+            (playlist id, playlist) for each playlist, in the order they were 
+            written.
+        '''
+
+        for playlist_id in self.blocks:
+            yield playlist_id, self.read_playlist(playlist_id)
+
+    def read_playlist(self, playlist_id: str) -> dict:
+        '''
+        This method reads a single playlist.
+
+        Params:
+            The id of the playlist.
+
+        Returns:
+            The JSON representation of the playlist.
+        '''
+
+        offset, size = self.blocks[playlist_id]
+
+        self.file.seek(offset)
+
+        return decode_playlist(self.file.read(size))
+
+
+def create_archive_reader(file):
+    '''
+    This function makes the right reader for the given archive, no matter 
+    which format it is in.
+
+    Params:
+        The archive, opened for reading in binary mode.
+
+    Returns:
+        A BinaryArchiveReader if it is a binary archive, an ArchiveReader 
+        otherwise.
+
+    Raises:
+        ValueError if it looks like a binary archive but is corrupted.
+    '''
+
+    # Imported here since ArchiveReader is not needed for binary archives.
+    from ArchiveReader import ArchiveReader
+
+    if (is_binary_archive(file)):
+        return BinaryArchiveReader(file)
+
+    return ArchiveReader(file)
@@ -0,0 +1,120 @@
+# Python
+import threading
+import time
+
+# Internal
+from configuration import SLOW_REQUEST_LATENCY, MAX_CONCURRENT_FETCHES
+
+
+class ConcurrencyController:
+    '''
+    This class limits how many requests can be in flight at the same time, 
+    and adjusts the limit by itself the same way TCP adjusts its congestion 
+    window (AIMD):
+        - every time as many requests as the current limit succeed in a row, 
+        the limit goes up by 1 (additive increase), until it reaches the 
+        maximum.
+        - every time a request is throttled, fails with a server error or 
+        takes longer than SLOW_REQUEST_LATENCY, the limit is halved 
+        (multiplicative decrease), at most once per average request latency 
+        so that a burst of failures from the same moment only counts once.
+
+    This way the program stays close to the most requests the API is happy 
+    with, without causing a storm of throttled requests.
+
+    There is supposed to be only one of it per process, use get_controller() 
+    to get it.
+    '''
+
+    _main_object = None
+    _main_object_lock = threading.Lock()
+
+    def __init__(
+        self, 
+        maximum: int = MAX_CONCURRENT_FETCHES, 
+        slow_latency: float = SLOW_REQUEST_LATENCY
+    ):
+        self.maximum: int = max(1, maximum)
+        self.limit: int = self.maximum
+        self.slow_latency: float = slow_latency
+
+        self.in_flight: int = 0
+        self.successes_in_a_row: int = 0
+
+        # Moving average of the latency, used as the length of a "round" 
+        # between two decreases.
+        self.average_latency: float = 0.0
+        self.last_decrease: float = 0.0
+
+        self.condition = threading.Condition()
+
+    def set_maximum(self, maximum: int) -> None:
+
+        with self.condition:
+            self.maximum = max(1, maximum)
+            self.limit = self.maximum
+
+            self.condition.notify_all()
+
+    def acquire(self) -> None:
+        '''
+        This method blocks until there is room for one more request in 
+        flight, then takes it.
+        '''
+
+        with self.condition:
+
+            while (self.in_flight >= self.limit):
+                self.condition.wait()
+
+            self.in_flight += 1
+
+    def release(self, succeeded: bool, latency: float) -> None:
+        '''
+        This method has to be called once the request started with acquire() 
+        is done, it adjusts the limit based on how it went.
+
+        Params:
+            succeeded: False if the request was throttled or failed in a way 
+            that may go away by itself (server error, timeout...).
+            latency: how long the request took in seconds.
+        '''
+
+        with self.condition:
+            self.in_flight -= 1
+
+            if (self.average_latency == 0):
+                self.average_latency = latency
+
+            else:
+                self.average_latency = 0.8*self.average_latency + 0.2*latency
+
+            now = time.monotonic()
+
+            if (succeeded and latency <= self.slow_latency):
+                self.successes_in_a_row += 1
+
+                if (self.successes_in_a_row >= self.limit and 
+                    self.limit < self.maximum):
+
+                    self.limit += 1
+                    self.successes_in_a_row = 0
+
+            else:
+                self.successes_in_a_row = 0
+
+                if (now - self.last_decrease >= self.average_latency):
+                    self.limit = max(1, self.limit//2)
+                    self.last_decrease = now
+
+            self.condition.notify_all()
+
+    @classmethod
+    def get_controller(cls) -> 'ConcurrencyController':
+
+        with cls._main_object_lock:
+
+            if (cls._main_object == None):
+                cls._main_object = ConcurrencyController()
+
+        return cls._main_object
@@ -0,0 +1,391 @@
+# Python
+from typing import Deque, Dict, Iterator, List, Tuple, Union
+from contextlib import contextmanager
+from collections import deque
+import threading
+import bisect
+import time
+import json
+import pathlib
+import os
+
+# Internal
+from configuration import METRICS_PREFIX, METRICS_DURATION_BUCKETS, METRICS_MAX_SPANS
+
+
+class Histogram:
+    '''
+    This class counts observations (durations, in seconds) in fixed buckets,
+    like a Prometheus histogram, so recording one is a binary search and an
+    increment no matter how many there are.
+    '''
+
+    __slots__ = ("bounds", "bucket_counts", "count", "sum")
+
+    def __init__(self, bounds: List[float] = METRICS_DURATION_BUCKETS):
+        self.bounds: List[float] = bounds
+
+        # The last bucket is for the observations above every bound.
+        self.bucket_counts: List[int] = [0]*(len(bounds) + 1)
+
+        self.count: int = 0
+        self.sum: float = 0.0
+
+    def observe(self, value: float) -> None:
+        self.bucket_counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def get_quantile(self, quantile: float) -> Union[float, None]:
+        '''
+        This method estimates a quantile from the buckets, assuming the
+        observations are spread evenly within their bucket (like
+        histogram_quantile() of Prometheus).
+
+        Returns:
+            The estimate, None if there is no observation. Quantiles that fall
+            in the last bucket are given as its lower bound.
+        '''
+
+        if (self.count == 0):
+            return None
+
+        rank = quantile*self.count
+        seen = 0
+
+        for index, bucket_count in enumerate(self.bucket_counts):
+
+            if (seen + bucket_count >= rank and bucket_count > 0):
+
+                if (index == len(self.bounds)):
+                    return self.bounds[-1]
+
+                lower = self.bounds[index - 1] if (index > 0) else 0.0
+
+                return lower + (self.bounds[index] - lower)*(rank - seen)/bucket_count
+
+            seen += bucket_count
+
+        return self.bounds[-1]
+
+
+class Span:
+    '''
+    This class is a timed piece of work (like fetching one playlist), with
+    the counts of what was done during it (like pages and bytes).
+    '''
+
+    __slots__ = ("name", "labels", "start", "duration", "counts")
+
+    def __init__(self, name: str, labels: Tuple[Tuple[str, str], ...]):
+        self.name: str = name
+        self.labels: Tuple[Tuple[str, str], ...] = labels
+
+        self.start: float = time.perf_counter()
+        self.duration: float = 0.0
+
+        self.counts: Dict[str, float] = {}
+
+
+class Metrics:
+    '''
+    This class records what the program does (counters, gauges, histograms
+    of durations and spans) and exports it as a JSON summary or in the
+    Prometheus text format.
+
+    Recording is a dictionary lookup and an increment under a lock, so it is
+    always on and only exporting has to be asked for.
+
+    A metric is identified by its name and its labels (keyword arguments,
+    like status=200). Spans are per thread: what is added with add_to_span()
+    goes to the span the current thread is in, if any. Only the last
+    METRICS_MAX_SPANS spans are kept.
+
+    There is supposed to be only one of it per process, use get_metrics() to
+    get it.
+    '''
+
+    _main_object = None
+    _main_object_lock = threading.Lock()
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.local = threading.local()
+
+        self.start: float = time.perf_counter()
+
+        self.counters: Dict[Tuple[str, tuple], float] = {}
+        self.gauges: Dict[Tuple[str, tuple], float] = {}
+        self.histograms: Dict[Tuple[str, tuple], Histogram] = {}
+
+        self.spans: Deque[Span] = deque(maxlen=METRICS_MAX_SPANS)
+
+    def increment(self, name: str, value: float = 1, **labels) -> None:
+        key = (name, tuple(sorted(labels.items())))
+
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def set_gauge(self, name: str, value: float, **labels) -> None:
+        key = (name, tuple(sorted(labels.items())))
+
+        with self.lock:
+            self.gauges[key] = value
+
+    def observe(self, name: str, value: float, **labels) -> None:
+        key = (name, tuple(sorted(labels.items())))
+
+        with self.lock:
+            histogram = self.histograms.get(key)
+
+            if (histogram == None):
+                histogram = self.histograms[key] = Histogram()
+
+            histogram.observe(value)
+
+    @contextmanager
+    def span(self, name: str, **labels) -> Iterator[Span]:
+        '''
+        This method times the work done in a with block as a span, its
+        duration is also observed in the <name>_seconds histogram.
+        '''
+
+        span = Span(name, tuple(sorted(labels.items())))
+
+        parent = getattr(self.local, "span", None)
+        self.local.span = span
+
+        try:
+            yield span
+
+        finally:
+            self.local.span = parent
+            span.duration = time.perf_counter() - span.start
+
+            self.observe(f"{name}_seconds", span.duration)
+
+            with self.lock:
+                self.spans.append(span)
+
+    def add_to_span(self, name: str, value: float = 1) -> None:
+        '''
+        This method adds to a count of the span the current thread is in, it
+        does nothing outside of a span.
+        '''
+
+        span = getattr(self.local, "span", None)
+
+        if (span != None):
+            span.counts[name] = span.counts.get(name, 0) + value
+
+    def get_counter(self, name: str) -> float:
+        '''
+        Returns:
+            The value of a counter, summed over all of its labels.
+        '''
+
+        with self.lock:
+            return sum(
+                value for (counter_name, _), value in self.counters.items()
+                if (counter_name == name)
+            )
+
+    def get_histogram(self, name: str) -> Histogram:
+        '''
+        Returns:
+            The histogram of the given name, with the observations of all of
+            its labels merged.
+        '''
+
+        merged = Histogram()
+
+        with self.lock:
+            for (histogram_name, _), histogram in self.histograms.items():
+
+                if (histogram_name != name):
+                    continue
+
+                for index, bucket_count in enumerate(histogram.bucket_counts):
+                    merged.bucket_counts[index] += bucket_count
+
+                merged.count += histogram.count
+                merged.sum += histogram.sum
+
+        return merged
+
+    def to_json(self) -> dict:
+        '''
+        Returns:
+            Everything recorded, as the JSON summary.
+        '''
+
+        with self.lock:
+            histograms = []
+
+            for (name, labels), histogram in self.histograms.items():
+                histograms.append({
+                    "name": name,
+                    "labels": dict(labels),
+                    "count": histogram.count,
+                    "sum": histogram.sum,
+                    "mean": histogram.sum/histogram.count if (histogram.count) else None,
+                    "p50": histogram.get_quantile(0.5),
+                    "p95": histogram.get_quantile(0.95),
+                    "p99": histogram.get_quantile(0.99),
+                    "buckets": dict(zip(
+                        [str(bound) for bound in histogram.bounds] + ["+Inf"],
+                        histogram.bucket_counts
+                    ))
+                })
+
+            return {
+                "elapsed_seconds": time.perf_counter() - self.start,
+                "counters": [
+                    {"name": name, "labels": dict(labels), "value": value}
+                    for (name, labels), value in self.counters.items()
+                ],
+                "gauges": [
+                    {"name": name, "labels": dict(labels), "value": value}
+                    for (name, labels), value in self.gauges.items()
+                ],
+                "histograms": histograms,
+                "spans": [
+                    dict(
+                        {"name": span.name, "labels": dict(span.labels), "seconds": span.duration},
+                        **span.counts
+                    )
+                    for span in self.spans
+                ]
+            }
+
+    def to_prometheus(self) -> str:
+        '''
+        Returns:
+            Everything recorded, in the Prometheus text format. Every name
+            gets METRICS_PREFIX, and the last span of every name and labels
+            becomes gauges of its duration and counts
+            (<name>_duration_seconds, <name>_<count>) labelled like it.
+        '''
+
+        lines: List[str] = []
+
+        # Name -> lines of every label set, so each name has one TYPE line.
+        families: Dict[str, Tuple[str, List[str]]] = {}
+
+        def add(name: str, kind: str, labels: tuple, value: float, suffix: str = "") -> None:
+            family = families.setdefault(METRICS_PREFIX + name, (kind, []))
+            family[1].append(
+                f"{METRICS_PREFIX}{name}{suffix}{format_labels(labels)} {value!r}"
+            )
+
+        with self.lock:
+
+            for (name, labels), value in self.counters.items():
+                add(name, "counter", labels, value)
+
+            for (name, labels), value in self.gauges.items():
+                add(name, "gauge", labels, value)
+
+            for (name, labels), histogram in self.histograms.items():
+                cumulative = 0
+
+                for bound, bucket_count in zip(histogram.bounds, histogram.bucket_counts):
+                    cumulative += bucket_count
+                    add(name, "histogram", labels + (("le", repr(bound)),), cumulative, "_bucket")
+
+                add(name, "histogram", labels + (("le", "+Inf"),), histogram.count, "_bucket")
+                add(name, "histogram", labels, histogram.sum, "_sum")
+                add(name, "histogram", labels, histogram.count, "_count")
+
+            # A later span of the same labels (the same playlist fetched
+            # again) replaces the earlier one, a series can only have one
+            # value.
+            last_spans = {(span.name, span.labels): span for span in self.spans}
+
+            for span in last_spans.values():
+                add(f"{span.name}_duration_seconds", "gauge", span.labels, span.duration)
+
+                for count_name, value in span.counts.items():
+                    add(f"{span.name}_{count_name}", "gauge", span.labels, value)
+
+        for name, (kind, family_lines) in families.items():
+            lines.append(f"# TYPE {name} {kind}")
+            lines.extend(family_lines)
+
+        return "\n".join(lines) + "\n"
+
+    def get_summary(self) -> str:
+        requests = self.get_counter("requests_total")
+
+        if (requests == 0):
+            return "Requests: none sent"
+
+        latency = self.get_histogram("request_seconds")
+        elapsed = time.perf_counter() - self.start
+
+        return (
+            f"Requests: {requests:.0f} in {elapsed:.1f} s ({requests/elapsed:.1f}/s), "
+            f"latency p50 {latency.get_quantile(0.5)*1000:.0f} ms, "
+            f"p95 {latency.get_quantile(0.95)*1000:.0f} ms, "
+            f"{self.get_counter('retries_total'):.0f} retried, "
+            f"{self.get_counter('downloaded_bytes_total')/1024/1024:.1f} MiB downloaded"
+        )
+
+    def write(
+        self,
+        json_file_path: Union[pathlib.Path, None] = None,
+        prometheus_file_path: Union[pathlib.Path, None] = None
+    ) -> bool:
+        '''
+        This method writes the JSON summary and/or the Prometheus text file,
+        each is written to a temporary file first so that a scraper never
+        reads half of one.
+
+        Returns:
+            True if successful, False otherwise.
+        '''
+
+        outputs = []
+
+        if (json_file_path != None):
+            outputs.append((json_file_path, json.dumps(self.to_json(), indent=4)))
+
+        if (prometheus_file_path != None):
+            outputs.append((prometheus_file_path, self.to_prometheus()))
+
+        try:
+            for path, content in outputs:
+                temporary_path = path.with_name(path.name + ".tmp")
+
+                with temporary_path.open("w", encoding="utf-8") as file:
+                    file.write(content)
+
+                os.replace(temporary_path, path)
+
+        except OSError:
+            return False
+
+        return True
+
+    @classmethod
+    def get_metrics(cls) -> 'Metrics':
+
+        with cls._main_object_lock:
+
+            if (cls._main_object == None):
+                cls._main_object = Metrics()
+
+        return cls._main_object
+
+
+def format_labels(labels: tuple) -> str:
+
+    if not (labels):
+        return ""
+
+    escaped = (
+        (name, str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n"))
+        for name, value in labels
+    )
+
+    return "{" + ",".join(f"{name}=\"{value}\"" for name, value in escaped) + "}"
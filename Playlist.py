@@ -1,5 +1,6 @@
-from typing import *
-from Video import Video
+from typing import Dict, List, Union
+from Video import Video, YOUTUBE_VIDEO_PREFIX
+import sys
 import json
 
 # internal
@@ -8,16 +9,46 @@ from configuration import YOUTUBE_PLAYLIST_PREFIX
 
 class Playlist:
 
+    # The videos are kept as one list per attribute (id, name and channel) 
+    # instead of a list of Video objects, so a video only costs 3 references 
+    # instead of a whole object. The Video objects are only made when asked 
+    # for (see the videos property).
+    __slots__ = ("id", "video_ids", "video_names", "video_channels", "pages")
+
     def __init__(self, id: str):
-        self.videos: List[Video] = []
         self.id: str = id
-        self.link: str = YOUTUBE_PLAYLIST_PREFIX + self.id
+
+        self.video_ids: List[str] = []
+        self.video_names: List[str] = []
+        self.video_channels: List[str] = []
+
+        # The pages the playlist was fetched in, used by the archiver to 
+        # make conditional requests next time. See README for the format.
+        self.pages: List[Dict[str, Union[str, int, None]]] = []
+
+    @property
+    def link(self) -> str:
+        return YOUTUBE_PLAYLIST_PREFIX + self.id
+
+    @property
+    def videos(self) -> List[Video]:
+        return [
+            Video(name, channel, video_id) 
+            for video_id, name, channel in zip(
+                self.video_ids, self.video_names, self.video_channels
+            )
+        ]
 
     def get_id(self) -> str:
         return self.id
 
     def add_video(self, video: Video) -> None:
-        self.videos.append(video)
+        self.video_ids.append(video.get_id())
+        self.video_names.append(video.get_name())
+        self.video_channels.append(sys.intern(video.get_channel()))
+
+    def add_page(self, page: Dict[str, Union[str, int, None]]) -> None:
+        self.pages.append(page)
 
     def construct_json_obj(self) -> dict:
         '''
@@ -33,17 +64,34 @@ class Playlist:
             "videos": {
                 video_id: video
             }
-            "link": str
+            "link": str,
+            "pages": [page] (only if the playlist has pages)
         }
 
         Returns:
             The dictionary representation of the JSON.
         '''
 
+        # Same as Video.construct_json_obj() but straight from the columns.
+        videos = {
+            video_id: {
+                "id": video_id,
+                "name": name,
+                "channel": channel,
+                "link": YOUTUBE_VIDEO_PREFIX + video_id,
+            }
+            for video_id, name, channel in zip(
+                self.video_ids, self.video_names, self.video_channels
+            )
+        }
+
         result = {
             "id": self.id, 
             "link": self.link, 
-            "videos": {x.get_id() : x.construct_json_obj() for x in self.videos}
+            "videos": videos
             }
 
+        if (len(self.pages) != 0):
+            result["pages"] = self.pages
+
         return result
\ No newline at end of file
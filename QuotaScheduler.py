@@ -0,0 +1,280 @@
+# Python
+import threading
+import pathlib
+import json
+import time
+import os
+
+# Internal
+from configuration import (
+    QUOTA_DAILY_BUDGET, 
+    QUOTA_COST_PER_REQUEST, 
+    QUOTA_STATE_FILE, 
+    REQUESTS_PER_SECOND, 
+    REQUEST_BURST
+)
+
+
+class QuotaScheduler:
+    '''
+    This class keeps track of how much of the daily API quota the program 
+    has used and how fast it sends requests.
+
+    Every request to the API has to go through acquire() first, which:
+        - charges QUOTA_COST_PER_REQUEST units against the daily budget, and 
+        refuses the request once the budget is used up.
+        - waits for a token of a token bucket that refills at 
+        REQUESTS_PER_SECOND and holds at most REQUEST_BURST tokens.
+
+    So that a run that runs out of quota ends up with complete playlists 
+    rather than half fetched ones, a playlist has to reserve the quota it is 
+    expected to need (see begin_playlist()) before it starts. A playlist 
+    whose reservation cannot be made is skipped instead of being started. The 
+    reservation is per thread since each playlist is fetched by one worker 
+    from start to finish.
+
+    The quota used is saved to QUOTA_STATE_FILE so that it adds up across 
+    the runs of the same (local) day, unless the scheduler is made not 
+    persistent (see set_persistent()). A process that runs past midnight 
+    (like watcher.py) starts the new day with nothing used.
+
+    Once stop() is called, no more requests are let through and the waits 
+    before retries (see wait()) end right away, so a process that is asked to 
+    stop does not have to wait for its retries.
+
+    There is supposed to be only one of it per process, use get_scheduler() 
+    to get it.
+    '''
+
+    _main_object = None
+    _main_object_lock = threading.Lock()
+
+    def __init__(
+        self, 
+        budget: int = QUOTA_DAILY_BUDGET, 
+        rate: float = REQUESTS_PER_SECOND, 
+        burst: int = REQUEST_BURST, 
+        state_file: str = QUOTA_STATE_FILE
+    ):
+        self.budget: int = budget
+        self.rate: float = rate
+        self.burst: int = max(1, burst)
+
+        self.state_file_path: pathlib.Path = pathlib.Path(state_file).expanduser()
+        self.persistent: bool = True
+
+        self.lock = threading.Lock()
+
+        # Quota used today, including the runs before this one.
+        self.used: int = 0
+        self.today: str = time.strftime("%Y-%m-%d")
+
+        # Quota set aside by the playlists being fetched but not used yet.
+        self.reserved: int = 0
+
+        # Reservation of the playlist the current thread is fetching.
+        self.local = threading.local()
+
+        self.tokens: float = float(self.burst)
+        self.last_refill: float = time.monotonic()
+
+        self.stopped = threading.Event()
+
+        self.load_state()
+
+    def set_budget(self, budget: int) -> None:
+        self.budget = budget
+
+    def set_rate(self, rate: float) -> None:
+        self.rate = rate
+
+    def set_persistent(self, persistent: bool) -> None:
+        '''
+        This method sets whether the quota used is read from and saved to the 
+        state file. When it is not, the quota only counts the requests of 
+        this run, which is what is wanted when the requests do not go to 
+        Youtube (like with the mock API server).
+        '''
+
+        self.persistent = persistent
+
+        if (persistent):
+            self.load_state()
+
+        else:
+            with self.lock:
+                self.used = 0
+
+    def load_state(self) -> None:
+        '''
+        This method reads the quota already used today from the state file, 
+        a missing or unreadable file means nothing was used.
+        '''
+
+        try:
+            with self.state_file_path.open("r", encoding="utf-8") as file:
+                state = json.load(file)
+
+            if (state["date"] == self.today):
+                self.used = int(state["used"])
+
+        except (OSError, ValueError, KeyError, TypeError):
+            self.used = 0
+
+    def save_state(self) -> None:
+        '''
+        This method writes the quota used today to the state file.
+        '''
+
+        if not (self.persistent):
+            return
+
+        with self.lock:
+            state = {"date": self.today, "used": self.used}
+
+        try:
+            self.state_file_path.parent.mkdir(parents=True, exist_ok=True)
+
+            temporary_path = self.state_file_path.with_name(
+                self.state_file_path.name + ".tmp"
+            )
+
+            with temporary_path.open("w", encoding="utf-8") as file:
+                json.dump(state, file)
+
+            os.replace(temporary_path, self.state_file_path)
+
+        except OSError:
+            pass
+
+    def get_remaining(self) -> int:
+        '''
+        Returns:
+            The quota that is neither used nor reserved. Must be called with 
+            the lock held.
+        '''
+
+        today = time.strftime("%Y-%m-%d")
+
+        if (today != self.today):
+            self.today = today
+            self.used = 0
+
+        return self.budget - self.used - self.reserved
+
+    def begin_playlist(self, estimated_requests: int) -> bool:
+        '''
+        This method reserves the quota a playlist is expected to need for the 
+        current thread.
+
+        Params:
+            estimated_requests: the number of requests the playlist is expected 
+            to take.
+
+        Returns:
+            True if the quota is reserved and the playlist can be fetched, 
+            False if there is not enough quota left for it.
+        '''
+
+        cost = max(0, estimated_requests)*QUOTA_COST_PER_REQUEST
+
+        with self.lock:
+
+            if (self.get_remaining() < cost):
+                return False
+
+            self.reserved += cost
+
+        self.local.reservation = cost
+
+        return True
+
+    def end_playlist(self) -> None:
+        '''
+        This method gives back whatever is left of the reservation of the 
+        current thread.
+        '''
+
+        with self.lock:
+            self.reserved -= getattr(self.local, "reservation", 0)
+
+        self.local.reservation = 0
+
+    def acquire(self) -> bool:
+        '''
+        This method has to be called right before a request is sent. It 
+        charges the request against the quota (using the reservation of the 
+        current thread first) then blocks until the rate limit allows it.
+
+        Returns:
+            True if the request can be sent, False if the budget is used up 
+            or the scheduler is stopped.
+        '''
+
+        if (self.stopped.is_set()):
+            return False
+
+        with self.lock:
+            reservation = getattr(self.local, "reservation", 0)
+
+            from_reservation = min(reservation, QUOTA_COST_PER_REQUEST)
+            from_remaining = QUOTA_COST_PER_REQUEST - from_reservation
+
+            if (self.get_remaining() < from_remaining):
+                return False
+
+            self.local.reservation = reservation - from_reservation
+            self.reserved -= from_reservation
+            self.used += QUOTA_COST_PER_REQUEST
+
+        self.wait_for_token()
+
+        return True
+
+    def wait_for_token(self) -> None:
+        '''
+        This method blocks until the token bucket has a token then takes it.
+        '''
+
+        while True:
+
+            with self.lock:
+                now = time.monotonic()
+
+                self.tokens = min(
+                    self.burst, 
+                    self.tokens + (now - self.last_refill)*self.rate
+                )
+                self.last_refill = now
+
+                if (self.tokens >= 1):
+                    self.tokens -= 1
+                    return
+
+                wait = (1 - self.tokens)/self.rate
+
+            time.sleep(wait)
+
+    def wait(self, seconds: float) -> None:
+        '''
+        This method waits the given number of seconds (like before a retry), 
+        or until the scheduler is stopped.
+        '''
+
+        self.stopped.wait(seconds)
+
+    def stop(self) -> None:
+        self.stopped.set()
+
+    def get_summary(self) -> str:
+        return f"Quota: {self.used} of {self.budget} unit(s) used today"
+
+    @classmethod
+    def get_scheduler(cls) -> 'QuotaScheduler':
+
+        with cls._main_object_lock:
+
+            if (cls._main_object == None):
+                cls._main_object = QuotaScheduler()
+
+        return cls._main_object
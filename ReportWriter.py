@@ -0,0 +1,481 @@
+'''
+ReportWriter.py: writing the changes found by comparator.py in different
+formats.
+
+Every format is a subclass of ReportWriter, which buffers what is written and
+only writes to the file once REPORT_BUFFER_SIZE characters are buffered. The
+report is written one playlist at a time (write_playlist()) so a format never
+needs to know about the other playlists.
+
+The changes of a playlist are the tuple returned by compare_video_set() in
+comparator.py: (added videos, removed videos, [old video, new video] for each
+changed video). Videos moved or copied between playlists (see find_moves() 
+in comparator.py) are written at the end, with write_moves().
+'''
+
+# Python
+from typing import Callable, Dict, Iterator, List, Tuple, Union
+import csv
+import json
+import time
+
+# Internal
+from Video import Video
+from configuration import YOUTUBE_PLAYLIST_PREFIX, TIME_FORMAT_STR
+
+# How many characters are buffered before they are written to the file.
+REPORT_BUFFER_SIZE: int = 1024*1024
+
+# The line between 2 playlists in the text format.
+TEXT_SEPARATOR: str = "\n\n" + "-"*156 + "\n\n"
+
+# json.dumps() with any option makes a new encoder every time, which is most 
+# of the time spent on a small object.
+JSON_ENCODER = json.JSONEncoder(ensure_ascii=False)
+
+# A Python str -> a JSON string, like JSON_ENCODER.encode() but only for str.
+encode_string: Callable[[str], str] = json.encoder.encode_basestring
+
+CSV_HEADER: List[str] = [
+    "playlist_id",
+    "change",
+    "video_id",
+    "old_name",
+    "old_channel",
+    "new_name",
+    "new_channel",
+    "other_playlist_id"
+]
+
+
+class ReportWriter:
+    '''
+    The base of every format, which only does the buffering.
+
+    A format adds the changes of one playlist to the report with 
+    write_playlist(playlist_id, changes), and the videos moved or copied 
+    between playlists (as returned by find_moves() in comparator.py) after 
+    every playlist with write_moves(moves).
+    '''
+
+    def __init__(self, file):
+        '''
+        Params:
+            file: the output file, opened for writing as text.
+        '''
+
+        self.file = file
+
+        self.buffer: List[str] = []
+        self.buffered_size: int = 0
+
+        self.playlist_count: int = 0
+
+    def write(self, text: str) -> None:
+        self.buffer.append(text)
+        self.buffered_size += len(text)
+
+        if (self.buffered_size >= REPORT_BUFFER_SIZE):
+            self.flush()
+
+    def flush(self) -> None:
+        self.file.write("".join(self.buffer))
+
+        self.buffer.clear()
+        self.buffered_size = 0
+
+    def begin(
+        self,
+        old_date: time.struct_time,
+        new_date: time.struct_time,
+        time_apart: Tuple[int, int, int, int]
+    ) -> None:
+        '''
+        This method starts the report.
+
+        Params:
+            The time of the old and new archives, and how far apart they are
+            (see get_time_apart() in comparator.py).
+        '''
+
+        pass
+
+    def finish(self) -> None:
+        '''
+        This method ends the report and writes everything still buffered.
+        '''
+
+        self.flush()
+
+
+def iterate_changed_videos(
+    changes: tuple
+) -> Iterator[Tuple[str, str, Union[Video, None], Union[Video, None]]]:
+    '''
+    This function goes through the changes of a playlist one video at a time,
+    for the formats with one record per video.
+
+    Yields:
+        (change, video id, old video, new video) where change is "added",
+        "removed", "deleted" or "restored", and old video (new video) is None
+        for an added (removed) video.
+    '''
+
+    added, removed, changed = changes
+
+    for video in added:
+        yield "added", video.id, None, video
+
+    for video in removed:
+        yield "removed", video.id, video, None
+
+    for old_video, new_video in changed:
+        change = "restored" if old_video.is_deleted() else "deleted"
+
+        yield change, old_video.id, old_video, new_video
+
+
+class TextReportWriter(ReportWriter):
+    '''
+    The original format of comparator.py, made to be read by people.
+    '''
+
+    def __init__(self, file):
+        super().__init__(file)
+
+        self.header: str = ""
+
+        # The separator goes between 2 playlists, so it is only written once
+        # it is known that another playlist follows.
+        self.separator_pending: bool = False
+
+    def begin(
+        self,
+        old_date: time.struct_time,
+        new_date: time.struct_time,
+        time_apart: Tuple[int, int, int, int]
+    ) -> None:
+
+        # Only written if there is at least one playlist.
+        self.header = f"Reporting the changes of the mutual playlists between the 2 archives after {time_apart[0]} days, {time_apart[1]} hours, {time_apart[2]} minutes, {time_apart[3]} seconds\n\n"
+
+    def write_playlist(self, playlist_id: str, changes: tuple) -> None:
+
+        if (self.playlist_count == 0):
+            self.write(self.header)
+
+        if (self.separator_pending):
+            self.write(TEXT_SEPARATOR)
+
+        self.playlist_count += 1
+
+        added, removed, changed = changes
+
+        if (len(added) == 0 and len(removed) == 0 and len(changed) == 0):
+            self.write(f"0 changes for playlist with id {playlist_id} ({YOUTUBE_PLAYLIST_PREFIX}{playlist_id}) \n\n")
+
+            self.separator_pending = False
+            return
+
+        self.write(f"The changes in playlist with id {playlist_id} ({YOUTUBE_PLAYLIST_PREFIX}{playlist_id}):\n\n")
+
+        self.write(f"Added ({len(added)} video(s) added):\n")
+        self.write(
+            "\n".join(
+                f"+ \"{video.name}\" by channel \"{video.channel}\""
+                for video in added
+            ) + "\n\n" if (len(added) != 0) else "None\n\n"
+        )
+
+        self.write(f"Removed ({len(removed)} video(s) removed):\n")
+        self.write(
+            "\n".join(
+                f"- \"{video.name}\" by channel \"{video.channel}\""
+                for video in removed
+            ) + "\n\n" if (len(removed) != 0) else "None\n\n"
+        )
+
+        self.write(f"Changed ({len(changed)} video(s) changed):\n")
+        self.write(
+            "\n".join(
+                f"{old_video.name} --> \"{new_video.name}\" by channel \"{new_video.channel}\""
+                if (old_video.is_deleted()) else
+                f"\"{old_video.name}\" by \"{old_video.channel}\" --> {new_video.name}"
+                for old_video, new_video in changed
+            ) if (len(changed) != 0) else "None"
+        )
+
+        self.separator_pending = True
+
+    def write_moves(self, moves: List[tuple]) -> None:
+
+        if (self.playlist_count == 0 and len(moves) == 0):
+            return
+
+        if (self.separator_pending):
+            self.write(TEXT_SEPARATOR)
+
+        self.write(f"Moved or copied between playlists ({len(moves)} video(s) moved or copied):\n")
+        self.write(
+            "\n".join(
+                f"~ \"{(new_video or old_video).name}\" by channel \"{(new_video or old_video).channel}\" {kind} from playlist {from_id} to playlist {to_id}"
+                for kind, from_id, to_id, old_video, new_video in moves
+            ) if (len(moves) != 0) else "None"
+        )
+
+        self.separator_pending = False
+
+
+class JSONReportWriter(ReportWriter):
+    '''
+    A single JSON object:
+
+        {
+            "old_time": str,
+            "new_time": str,
+            "playlists": {
+                playlist_id: {
+                    "id": str,
+                    "link": str,
+                    "added": [video],
+                    "removed": [video],
+                    "changed": [{"old": video, "new": video}]
+                }
+            },
+            "moves": [
+                {
+                    "kind": "moved" or "copied",
+                    "from_playlist_id": str,
+                    "to_playlist_id": str,
+                    "old": video or null,
+                    "new": video or null
+                }
+            ]
+        }
+
+    where video is the JSON representation of a video (see README), and 
+    moves is only there if write_moves() was used. Each playlist (and each 
+    move) is on a line of its own, without indentation, since json.dumps() is 
+    many times slower with it.
+    '''
+
+    def __init__(self, file):
+        super().__init__(file)
+
+        self.moves_written: bool = False
+
+    def begin(
+        self,
+        old_date: time.struct_time,
+        new_date: time.struct_time,
+        time_apart: Tuple[int, int, int, int]
+    ) -> None:
+
+        old_time = JSON_ENCODER.encode(time.strftime(TIME_FORMAT_STR, old_date))
+        new_time = JSON_ENCODER.encode(time.strftime(TIME_FORMAT_STR, new_date))
+
+        self.write(
+            "{\n"
+            f"    \"old_time\": {old_time},\n"
+            f"    \"new_time\": {new_time},\n"
+            "    \"playlists\": {"
+        )
+
+    def write_playlist(self, playlist_id: str, changes: tuple) -> None:
+
+        if (self.playlist_count != 0):
+            self.write(",")
+
+        self.playlist_count += 1
+
+        added, removed, changed = changes
+
+        playlist = {
+            "id": playlist_id,
+            "link": YOUTUBE_PLAYLIST_PREFIX + playlist_id,
+            "added": [video.construct_json_obj() for video in added],
+            "removed": [video.construct_json_obj() for video in removed],
+            "changed": [
+                {
+                    "old": old_video.construct_json_obj(),
+                    "new": new_video.construct_json_obj()
+                }
+                for old_video, new_video in changed
+            ]
+        }
+
+        self.write(
+            f"\n        {JSON_ENCODER.encode(playlist_id)}: "
+            + JSON_ENCODER.encode(playlist)
+        )
+
+    def write_moves(self, moves: List[tuple]) -> None:
+
+        self.write("\n    },\n    \"moves\": [" if (self.playlist_count != 0) else "},\n    \"moves\": [")
+
+        self.write(",".join(
+            "\n        " + JSON_ENCODER.encode({
+                "kind": kind,
+                "from_playlist_id": from_id,
+                "to_playlist_id": to_id,
+                "old": old_video.construct_json_obj() if (old_video != None) else None,
+                "new": new_video.construct_json_obj() if (new_video != None) else None
+            })
+            for kind, from_id, to_id, old_video, new_video in moves
+        ))
+
+        self.write("\n    ]" if (len(moves) != 0) else "]")
+
+        self.moves_written = True
+
+    def finish(self) -> None:
+
+        if (self.moves_written):
+            self.write("\n}\n")
+
+        elif (self.playlist_count != 0):
+            self.write("\n    }\n}\n")
+
+        else:
+            self.write("}\n}\n")
+
+        self.flush()
+
+
+class CSVReportWriter(ReportWriter):
+    '''
+    One row per video that changed, with the columns in CSV_HEADER. The old
+    (new) columns are empty for an added (removed) video. Playlists without
+    changes have no rows.
+
+    A video moved or copied has "moved" or "copied" as change, the playlist 
+    it went to as playlist_id and the one it came from as other_playlist_id 
+    (which is empty for every other row).
+    '''
+
+    def __init__(self, file):
+        super().__init__(file)
+
+        # The rows are written to the buffer (through write()).
+        self.csv_writer = csv.writer(self, lineterminator="\n")
+
+    def begin(
+        self,
+        old_date: time.struct_time,
+        new_date: time.struct_time,
+        time_apart: Tuple[int, int, int, int]
+    ) -> None:
+
+        self.csv_writer.writerow(CSV_HEADER)
+
+    def write_playlist(self, playlist_id: str, changes: tuple) -> None:
+
+        self.playlist_count += 1
+
+        self.csv_writer.writerows(
+            [
+                playlist_id,
+                change,
+                video_id,
+                old_video.name if (old_video != None) else "",
+                old_video.channel if (old_video != None) else "",
+                new_video.name if (new_video != None) else "",
+                new_video.channel if (new_video != None) else "",
+                ""
+            ]
+            for change, video_id, old_video, new_video in iterate_changed_videos(changes)
+        )
+
+    def write_moves(self, moves: List[tuple]) -> None:
+
+        self.csv_writer.writerows(
+            [
+                to_id,
+                kind,
+                (new_video or old_video).id,
+                old_video.name if (old_video != None) else "",
+                old_video.channel if (old_video != None) else "",
+                new_video.name if (new_video != None) else "",
+                new_video.channel if (new_video != None) else "",
+                from_id
+            ]
+            for kind, from_id, to_id, old_video, new_video in moves
+        )
+
+
+def encode_ndjson_video(video: Union[Video, None]) -> str:
+
+    if (video == None):
+        return "null"
+
+    return f"{{\"name\": {encode_string(video.name)}, \"channel\": {encode_string(video.channel)}}}"
+
+
+class NDJSONReportWriter(ReportWriter):
+    '''
+    One JSON object per line for each video that changed:
+
+        {"playlist_id": str, "change": str, "video_id": str, "old": {"name": str, "channel": str}, "new": ...}
+
+    where "old" ("new") is null for an added (removed) video. Playlists
+    without changes have no lines.
+
+    A video moved or copied has "moved" or "copied" as change, the playlist 
+    it went to as playlist_id, and an "other_playlist_id" with the one it 
+    came from.
+    '''
+
+    def write_playlist(self, playlist_id: str, changes: tuple) -> None:
+
+        self.playlist_count += 1
+
+        # The lines are put together by hand, only the strings go through the 
+        # (C) JSON encoder, which is a lot faster than encoding a dictionary 
+        # per line.
+        start = f"{{\"playlist_id\": {encode_string(playlist_id)}, \"change\": \""
+
+        lines = [
+            f"{start}{change}\", \"video_id\": {encode_string(video_id)}, " 
+            f"\"old\": {encode_ndjson_video(old_video)}, " 
+            f"\"new\": {encode_ndjson_video(new_video)}}}"
+            for change, video_id, old_video, new_video in iterate_changed_videos(changes)
+        ]
+
+        if (len(lines) != 0):
+            self.write("\n".join(lines) + "\n")
+
+    def write_moves(self, moves: List[tuple]) -> None:
+
+        lines = [
+            f"{{\"playlist_id\": {encode_string(to_id)}, \"change\": \"{kind}\", " 
+            f"\"video_id\": {encode_string((new_video or old_video).id)}, " 
+            f"\"old\": {encode_ndjson_video(old_video)}, " 
+            f"\"new\": {encode_ndjson_video(new_video)}, " 
+            f"\"other_playlist_id\": {encode_string(from_id)}}}"
+            for kind, from_id, to_id, old_video, new_video in moves
+        ]
+
+        if (len(lines) != 0):
+            self.write("\n".join(lines) + "\n")
+
+
+REPORT_WRITERS: Dict[str, type] = {
+    "text": TextReportWriter,
+    "json": JSONReportWriter,
+    "csv": CSVReportWriter,
+    "ndjson": NDJSONReportWriter
+}
+
+def create_report_writer(report_format: str, file) -> ReportWriter:
+    '''
+    This function makes the report writer of the given format.
+
+    Params:
+        report_format: one of the keys of REPORT_WRITERS.
+        file: the output file, opened for writing as text.
+
+    Returns:
+        The report writer.
+    '''
+
+    return REPORT_WRITERS[report_format](file)
@@ -0,0 +1,261 @@
+# Python
+from typing import Tuple, Union
+from collections import OrderedDict
+import threading
+import hashlib
+import pathlib
+import json
+import time
+import os
+
+# Internal
+from configuration import CACHE_DIRECTORY, CACHE_TTL, CACHE_MAX_SIZE
+
+
+class ResponseCache:
+    '''
+    This class is an on-disk cache of the playlistItems pages the archiver 
+    fetched, so that a run that died halfway (or a run with a slightly 
+    different input file) does not have to download everything again.
+
+    A page is keyed by (playlistId, pageToken, fields), plus the API url 
+    when it is not the Youtube API (see request_playlist_page() in 
+    archiver.py), and is stored as one JSON file in the cache directory. 
+    Pages older than the TTL are treated as missing, and once the cache grows 
+    past its size cap the least recently used pages are removed first (the 
+    modification time of a file is bumped every time it is used).
+
+    The cache is best effort, if something goes wrong when reading or writing 
+    it, the page is simply fetched from the API like usual.
+
+    There is supposed to be only one of it per process, use get_cache() to 
+    get it.
+    '''
+
+    _main_object = None
+    _main_object_lock = threading.Lock()
+
+    def __init__(
+        self, 
+        directory: str = CACHE_DIRECTORY, 
+        ttl: float = CACHE_TTL, 
+        max_size: int = CACHE_MAX_SIZE
+    ):
+        self.directory: pathlib.Path = pathlib.Path(directory).expanduser()
+        self.ttl: float = ttl
+        self.max_size: int = max_size
+
+        self.enabled: bool = True
+
+        self.hits: int = 0
+        self.misses: int = 0
+
+        self.lock = threading.Lock()
+
+        # File name -> size in bytes, from least to most recently used. It is 
+        # only built once the cache is first used.
+        self.entries: 'OrderedDict[str, int]' = None
+        self.total_size: int = 0
+
+    def set_enabled(self, enabled: bool) -> None:
+        self.enabled = enabled
+
+    def load_entries(self) -> None:
+        '''
+        This method scans the cache directory to find out what is in it and 
+        in which order the entries were used. Must be called with the lock 
+        held.
+        '''
+
+        if (self.entries != None):
+            return
+
+        self.entries = OrderedDict()
+        self.total_size = 0
+
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+
+            files = [
+                (entry.name, entry.stat()) 
+                for entry in os.scandir(self.directory) 
+                if entry.name.endswith(".json")
+            ]
+
+        except OSError:
+            self.enabled = False
+            return
+
+        files.sort(key=lambda file: file[1].st_mtime)
+
+        for name, stat in files:
+            self.entries[name] = stat.st_size
+            self.total_size += stat.st_size
+
+    def get_file_name(self, key: Tuple[str, ...]) -> str:
+        return hashlib.sha1("\0".join(key).encode("utf-8")).hexdigest() + ".json"
+
+    def forget_entry(self, name: str) -> None:
+        '''
+        This method removes an entry from the index, the file itself is left 
+        for delete_file() so that the disk is not touched with the lock held. 
+        Must be called with the lock held.
+        '''
+
+        self.total_size -= self.entries.pop(name, 0)
+
+    def delete_file(self, name: str) -> None:
+
+        try:
+            os.remove(self.directory / name)
+
+        except OSError:
+            pass
+
+    def get(
+        self, 
+        key: Tuple[str, ...]
+    ) -> Union[Tuple[dict, Union[str, None]], None]:
+        '''
+        This method looks up a page in the cache.
+
+        Params:
+            key: (playlistId, pageToken, fields) of the page, followed by 
+            the API url if it is not API_URL.
+
+        Returns:
+            A tuple of (JSON body, ETag) of the page if it is in the cache and 
+            is not older than the TTL.
+
+            None otherwise.
+        '''
+
+        if not (self.enabled):
+            return None
+
+        name = self.get_file_name(key)
+
+        with self.lock:
+            self.load_entries()
+
+            if (not self.enabled or name not in self.entries):
+                self.misses += 1
+                return None
+
+        # The lock only guards the index, the file is read without it so 
+        # that the fetch workers do not wait on each other's disk reads. If 
+        # another worker removes the file in the meantime, it is a miss.
+        path = self.directory / name
+
+        try:
+            with path.open("r", encoding="utf-8") as file:
+                entry = json.load(file)
+
+            fresh = (
+                entry["key"] == list(key) and 
+                time.time() - entry["time"] <= self.ttl
+            )
+
+        except (OSError, ValueError, KeyError, TypeError):
+            fresh = False
+
+        if not (fresh):
+
+            with self.lock:
+                self.forget_entry(name)
+                self.misses += 1
+
+            self.delete_file(name)
+
+            return None
+
+        try:
+            os.utime(path)
+
+        except OSError:
+            pass
+
+        with self.lock:
+
+            if (name in self.entries):
+                self.entries.move_to_end(name)
+
+            self.hits += 1
+
+        return entry["body"], entry["etag"]
+
+    def put(
+        self, 
+        key: Tuple[str, ...], 
+        body: dict, 
+        etag: Union[str, None]
+    ) -> None:
+        '''
+        This method stores a page in the cache, evicting the least recently 
+        used pages if the cache becomes bigger than its size cap.
+
+        Params:
+            key: (playlistId, pageToken, fields) of the page, followed by 
+            the API url if it is not API_URL.
+            body: the JSON body of the response.
+            etag: the ETag of the page.
+        '''
+
+        if not (self.enabled):
+            return
+
+        name = self.get_file_name(key)
+
+        data = json.dumps({
+            "key": list(key),
+            "time": time.time(),
+            "etag": etag,
+            "body": body
+        }, ensure_ascii=False).encode("utf-8")
+
+        with self.lock:
+            self.load_entries()
+
+            if not (self.enabled):
+                return
+
+        path = self.directory / name
+
+        # Written to a temporary file first so that a crash never leaves a 
+        # half written entry behind. The temporary file is named after the 
+        # thread, in case 2 workers write the same page at the same time.
+        temporary_path = self.directory / f"{name}.{threading.get_ident()}.tmp"
+
+        try:
+            temporary_path.write_bytes(data)
+            os.replace(temporary_path, path)
+
+        except OSError:
+            return
+
+        evicted = []
+
+        with self.lock:
+            self.forget_entry(name)
+            self.entries[name] = len(data)
+            self.total_size += len(data)
+
+            while (self.total_size > self.max_size and len(self.entries) != 0):
+                evicted.append(next(iter(self.entries)))
+                self.forget_entry(evicted[-1])
+
+        for evicted_name in evicted:
+            self.delete_file(evicted_name)
+
+    def get_summary(self) -> str:
+        return f"Response cache: {self.hits} hit(s), {self.misses} miss(es)"
+
+    @classmethod
+    def get_cache(cls) -> 'ResponseCache':
+
+        with cls._main_object_lock:
+
+            if (cls._main_object == None):
+                cls._main_object = ResponseCache()
+
+        return cls._main_object
@@ -0,0 +1,643 @@
+# Python
+from typing import Callable, Dict, Iterator, List, Tuple, Union
+from collections import OrderedDict
+import pathlib
+import json
+import zlib
+import os
+
+# Internal
+from Video import Video, UNKNOWN_CHANNEL
+from BinaryArchive import BinaryArchiveWriter, BinaryArchiveReader
+from configuration import KEYFRAME_INTERVAL, CHAIN_CACHED_DELTAS, CHAIN_OPEN_KEYFRAMES
+
+
+class SnapshotChain:
+    '''
+    This class keeps the history of archives in a directory as a chain of 
+    snapshots, most of which are only stored as the difference (delta) from 
+    the snapshot before them, since consecutive archives are almost the same.
+
+    Every snapshot but the first has a delta, and every KEYFRAME_INTERVAL-th 
+    snapshot (starting with the first) is also stored in full as a binary 
+    archive (a keyframe). So any snapshot can be rebuilt from its keyframe 
+    with at most KEYFRAME_INTERVAL - 1 deltas, and the changes between any 2 
+    snapshots can be worked out from the deltas in between, only rebuilding 
+    the playlists that changed to put their videos in order.
+
+    The directory contains:
+        chain.json: the list of snapshots, each with its time, its delta 
+        file and its keyframe file (if it has one).
+        <n>.delta: the delta of snapshot n, zlib compressed JSON.
+        <n>.bin: the keyframe of snapshot n, a binary archive.
+
+    A delta is of the form:
+
+    {
+        "time": str,
+        "added_playlists": {playlist_id: playlist},
+        "removed_playlists": {playlist_id: playlist},
+        "playlists": {playlist_id: playlist_delta},
+        "order": [playlist_id] (only if the playlists were reordered)
+    }
+
+    and holds the playlists that were removed in full so that the changes 
+    can be worked out from the deltas alone. A playlist_delta holds the same 
+    added, removed and changed sets compare_video_set() in comparator.py 
+    gives, except that changed has every video whose attributes changed (not 
+    only the deleted ones) so that nothing is lost:
+
+    {
+        "added": {video_id: video},
+        "removed": {video_id: video},
+        "changed": {video_id: [old video, new video]},
+        "attributes": {...}, "keys": [key] (only if an attribute other 
+        than videos changed, or the attributes are in a different order),
+        "order": [video_id] (only if the videos were reordered)
+    }
+    '''
+
+    def __init__(self, directory: pathlib.Path):
+        '''
+        Params:
+            The directory of the chain, it is created if it does not exist.
+
+        Raises:
+            OSError if the directory cannot be created or read.
+            ValueError if chain.json is corrupted.
+        '''
+
+        self.directory: pathlib.Path = directory
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+        self.chain_file_path: pathlib.Path = self.directory / "chain.json"
+
+        # One entry per snapshot: {"time": str, "delta": str or None, 
+        # "keyframe": str or None}
+        self.snapshots: List[Dict[str, Union[str, None]]] = []
+
+        if (self.chain_file_path.exists()):
+
+            with self.chain_file_path.open("r", encoding="utf-8") as file:
+                self.snapshots = json.load(file)["snapshots"]
+
+        # The deltas read and the keyframes opened, keyed by the index of 
+        # their snapshot, from least to most recently used (see 
+        # CHAIN_CACHED_DELTAS and CHAIN_OPEN_KEYFRAMES).
+        self.delta_cache: 'OrderedDict[int, dict]' = OrderedDict()
+        self.keyframe_readers: 'OrderedDict[int, BinaryArchiveReader]' = OrderedDict()
+
+    def close(self) -> None:
+
+        for reader in self.keyframe_readers.values():
+            reader.file.close()
+
+        self.keyframe_readers = OrderedDict()
+
+    def save(self) -> None:
+        temporary_path = self.directory / "chain.json.tmp"
+
+        with temporary_path.open("w", encoding="utf-8") as file:
+            json.dump({"snapshots": self.snapshots}, file, ensure_ascii=False, indent=4)
+
+        os.replace(temporary_path, self.chain_file_path)
+
+    def get_delta(self, index: int) -> dict:
+        '''
+        Returns:
+            The delta of the snapshot at the given index.
+        '''
+
+        if (index in self.delta_cache):
+            self.delta_cache.move_to_end(index)
+
+            return self.delta_cache[index]
+
+        path = self.directory / self.snapshots[index]["delta"]
+
+        try:
+            delta = json.loads(
+                zlib.decompress(path.read_bytes()).decode("utf-8")
+            )
+
+        except zlib.error as error:
+            raise ValueError(f"The delta {path.name} is corrupted: {error}")
+
+        self.delta_cache[index] = delta
+
+        if (len(self.delta_cache) > CHAIN_CACHED_DELTAS):
+            self.delta_cache.popitem(last=False)
+
+        return delta
+
+    def get_keyframe_reader(self, index: int) -> BinaryArchiveReader:
+        '''
+        Returns:
+            The reader of the keyframe of the snapshot at the given index. It 
+            may be closed by the next call, so it must not be kept.
+        '''
+
+        if (index in self.keyframe_readers):
+            self.keyframe_readers.move_to_end(index)
+
+            return self.keyframe_readers[index]
+
+        path = self.directory / self.snapshots[index]["keyframe"]
+
+        reader = BinaryArchiveReader(path.open("rb"))
+
+        self.keyframe_readers[index] = reader
+
+        if (len(self.keyframe_readers) > CHAIN_OPEN_KEYFRAMES):
+            self.keyframe_readers.popitem(last=False)[1].file.close()
+
+        return reader
+
+    def get_keyframe_index(self, index: int) -> int:
+        '''
+        Returns:
+            The index of the closest keyframe at or before the given index.
+        '''
+
+        while (self.snapshots[index]["keyframe"] == None):
+            index -= 1
+
+        return index
+
+    def get_playlist_ids(self, index: int) -> List[str]:
+        '''
+        Returns:
+            The ids of the playlists of the snapshot at the given index, in 
+            order.
+        '''
+
+        keyframe_index = self.get_keyframe_index(index)
+
+        playlist_ids = list(self.get_keyframe_reader(keyframe_index).blocks)
+
+        for delta_index in range(keyframe_index + 1, index + 1):
+            playlist_ids = apply_order_delta(
+                playlist_ids, self.get_delta(delta_index)
+            )
+
+        return playlist_ids
+
+    def read_playlist(self, index: int, playlist_id: str) -> Union[dict, None]:
+        '''
+        This method rebuilds one playlist of a snapshot.
+
+        Params:
+            index: the index of the snapshot.
+            playlist_id: the id of the playlist.
+
+        Returns:
+            The JSON representation of the playlist, None if the snapshot 
+            does not have it.
+        '''
+
+        keyframe_index = self.get_keyframe_index(index)
+        keyframe_reader = self.get_keyframe_reader(keyframe_index)
+
+        playlist = None
+
+        if (playlist_id in keyframe_reader.blocks):
+            playlist = keyframe_reader.read_playlist(playlist_id)
+
+        for delta_index in range(keyframe_index + 1, index + 1):
+            delta = self.get_delta(delta_index)
+
+            if (playlist_id in delta["removed_playlists"]):
+                playlist = None
+
+            elif (playlist_id in delta["added_playlists"]):
+                playlist = delta["added_playlists"][playlist_id]
+
+            elif (playlist_id in delta["playlists"]):
+                playlist = apply_playlist_delta(
+                    playlist, delta["playlists"][playlist_id]
+                )
+
+        return playlist
+
+    def iterate(self, index: int) -> Iterator[Tuple[str, dict]]:
+        '''
+        Yields:
+            (playlist id, playlist) for each playlist of the snapshot at the 
+            given index, in order.
+        '''
+
+        for playlist_id in self.get_playlist_ids(index):
+            yield playlist_id, self.read_playlist(index, playlist_id)
+
+    def append(
+        self, 
+        reader, 
+        check_playlist: Callable[[dict], bool], 
+        check_time: Callable[[str], bool],
+        previous_playlists: Union[Dict[str, dict], None] = None
+    ) -> int:
+        '''
+        This method adds an archive to the end of the chain, one playlist at 
+        a time.
+
+        Params:
+            reader: an ArchiveReader or BinaryArchiveReader of the archive 
+            (or anything with the same time and iterate()).
+            check_playlist: the function that checks a playlist is of correct 
+            format (check_format_of_playlist() in comparator.py).
+            check_time: the function that checks the time of the archive is 
+            of correct format (check_time_format() in comparator.py).
+            previous_playlists: the playlists of the last snapshot of the 
+            chain keyed by their id, in order, if the caller has them in 
+            memory (like watcher.py). The delta is then worked out from them 
+            instead of rebuilding the last snapshot from the chain.
+
+        Returns:
+            The index of the new snapshot.
+
+        Raises:
+            ValueError if the archive is not of correct format, in which case 
+            the chain is left as it was.
+        '''
+
+        index = len(self.snapshots)
+        previous_index = index - 1
+
+        is_keyframe = (index % KEYFRAME_INTERVAL == 0)
+
+        keyframe_writer = None
+        delta = None
+
+        if (is_keyframe):
+            keyframe_writer = BinaryArchiveWriter(
+                self.directory / f"{index}.bin", ""
+            )
+
+            if not (keyframe_writer.open()):
+                raise OSError(f"Could not write the keyframe of snapshot {index}")
+
+        def read_previous_playlist(playlist_id: str) -> dict:
+
+            if (previous_playlists != None):
+                return previous_playlists[playlist_id]
+
+            return self.read_playlist(previous_index, playlist_id)
+
+        if (previous_index >= 0):
+
+            if (previous_playlists != None):
+                previous_ids = list(previous_playlists)
+
+            else:
+                previous_ids = self.get_playlist_ids(previous_index)
+
+            previous_id_set = set(previous_ids)
+
+            delta = {
+                "time": None,
+                "added_playlists": {},
+                "removed_playlists": {},
+                "playlists": {}
+            }
+
+        playlist_ids: List[str] = []
+
+        try:
+            for playlist_id, playlist in reader.iterate():
+
+                if not (check_playlist(playlist)):
+                    raise ValueError(f"The playlist {playlist_id} is not valid")
+
+                playlist_ids.append(playlist_id)
+
+                if (keyframe_writer != None):
+                    keyframe_writer.write_playlist(playlist)
+
+                if (delta == None):
+                    continue
+
+                if (playlist_id not in previous_id_set):
+                    delta["added_playlists"][playlist_id] = playlist
+                    continue
+
+                playlist_delta = compute_playlist_delta(
+                    read_previous_playlist(playlist_id), playlist
+                )
+
+                if (playlist_delta != None):
+                    delta["playlists"][playlist_id] = playlist_delta
+
+            if (not isinstance(reader.time, str) or 
+                not check_time(reader.time)):
+
+                raise ValueError("The time of the archive is not valid")
+
+            if (delta != None):
+                delta["time"] = reader.time
+
+                current_id_set = set(playlist_ids)
+
+                for playlist_id in previous_ids:
+
+                    if (playlist_id not in current_id_set):
+                        delta["removed_playlists"][playlist_id] = read_previous_playlist(
+                            playlist_id
+                        )
+
+                if (apply_order_delta(previous_ids, delta) != playlist_ids):
+                    delta["order"] = playlist_ids
+
+                delta_path = self.directory / f"{index}.delta"
+                delta_path.write_bytes(zlib.compress(
+                    json.dumps(delta, ensure_ascii=False).encode("utf-8")
+                ))
+
+            if (keyframe_writer != None):
+                keyframe_writer.time_str = reader.time
+                keyframe_writer.finish()
+
+        finally:
+            if (keyframe_writer != None):
+                keyframe_writer.close()
+
+        self.snapshots.append({
+            "time": reader.time,
+            "delta": f"{index}.delta" if (delta != None) else None,
+            "keyframe": f"{index}.bin" if is_keyframe else None
+        })
+
+        self.save()
+
+        return index
+
+    def compare(
+        self, 
+        old_index: int, 
+        new_index: int
+    ) -> Dict[str, tuple]:
+        '''
+        This method finds the changes between 2 snapshots from the deltas in 
+        between, only rebuilding the playlists that changed to put the videos 
+        in order.
+
+        Params:
+            The indexes of the old and the new snapshot.
+
+        Returns:
+            A dictionary from the id of each mutual playlist (in the order of 
+            the old snapshot) to the same tuple of (added, removed, changed) 
+            that compare_video_set() in comparator.py gives, in the same 
+            order.
+        '''
+
+        # The deltas only go forward, so going back is going forward with 
+        # everything the other way around.
+        if (old_index > new_index):
+            backward_changes = self.compare_deltas(new_index, old_index)
+
+            old_ids = self.get_playlist_ids(old_index)
+
+            changes = {
+                playlist_id: (
+                    backward_changes[playlist_id][1], 
+                    backward_changes[playlist_id][0], 
+                    [[new, old] for old, new in backward_changes[playlist_id][2]]
+                )
+                for playlist_id in old_ids 
+                if playlist_id in backward_changes
+            }
+
+        else:
+            changes = self.compare_deltas(old_index, new_index)
+
+        # The deltas give the videos in the order they were first touched, 
+        # while compare_video_set() gives the removed and changed videos in 
+        # the order of the old playlist and the added ones in the order of 
+        # the new playlist.
+        for playlist_id, (added, removed, changed) in changes.items():
+
+            if (len(removed) + len(changed) > 1):
+                old_positions = {
+                    video_id: position 
+                    for position, video_id in enumerate(
+                        self.read_playlist(old_index, playlist_id)["videos"]
+                    )
+                }
+
+                removed.sort(key=lambda video: old_positions[video.get_id()])
+                changed.sort(key=lambda pair: old_positions[pair[0].get_id()])
+
+            if (len(added) > 1):
+                new_positions = {
+                    video_id: position 
+                    for position, video_id in enumerate(
+                        self.read_playlist(new_index, playlist_id)["videos"]
+                    )
+                }
+
+                added.sort(key=lambda video: new_positions[video.get_id()])
+
+        return changes
+
+    def compare_deltas(
+        self, 
+        old_index: int, 
+        new_index: int
+    ) -> Dict[str, tuple]:
+        '''
+        This method finds the changes between 2 snapshots from the deltas in 
+        between alone, see compare().
+
+        Params:
+            The indexes of the old and the new snapshot, the old one first.
+
+        Returns:
+            The same dictionary as compare(), but with the videos of each 
+            list in the order the deltas first touched them.
+        '''
+
+        new_id_set = set(self.get_playlist_ids(new_index))
+
+        mutual_ids = [
+            playlist_id 
+            for playlist_id in self.get_playlist_ids(old_index) 
+            if playlist_id in new_id_set
+        ]
+
+        # (playlist id, video id) -> [video in the old snapshot, video in the 
+        # new snapshot], None meaning it is not there. The old video is the 
+        # one before the first delta that touched it and the new video the 
+        # one after the last.
+        net_changes: Dict[Tuple[str, str], list] = {}
+
+        def record(playlist_id: str, video_id: str, old, new) -> None:
+            key = (playlist_id, video_id)
+
+            if (key in net_changes):
+                net_changes[key][1] = new
+
+            else:
+                net_changes[key] = [old, new]
+
+        for index in range(old_index + 1, new_index + 1):
+            delta = self.get_delta(index)
+
+            for playlist_id, playlist in delta["removed_playlists"].items():
+                for video_id, video in playlist["videos"].items():
+                    record(playlist_id, video_id, video, None)
+
+            for playlist_id, playlist in delta["added_playlists"].items():
+                for video_id, video in playlist["videos"].items():
+                    record(playlist_id, video_id, None, video)
+
+            for playlist_id, playlist_delta in delta["playlists"].items():
+                for video_id, video in playlist_delta["removed"].items():
+                    record(playlist_id, video_id, video, None)
+
+                for video_id, video in playlist_delta["added"].items():
+                    record(playlist_id, video_id, None, video)
+
+                for video_id, (old, new) in playlist_delta["changed"].items():
+                    record(playlist_id, video_id, old, new)
+
+        changes: Dict[str, tuple] = {
+            playlist_id: ([], [], []) for playlist_id in mutual_ids
+        }
+
+        for (playlist_id, video_id), (old, new) in net_changes.items():
+
+            if (playlist_id not in changes):
+                continue
+
+            this_playlist_changes = changes[playlist_id]
+
+            if (old == None and new != None):
+                this_playlist_changes[0].append(Video.initiate_video_from_json(new))
+
+            elif (old != None and new == None):
+                this_playlist_changes[1].append(Video.initiate_video_from_json(old))
+
+            elif (old != None and 
+                  (old["channel"] == UNKNOWN_CHANNEL) != 
+                  (new["channel"] == UNKNOWN_CHANNEL)):
+
+                this_playlist_changes[2].append([
+                    Video.initiate_video_from_json(old), 
+                    Video.initiate_video_from_json(new)
+                ])
+
+        return changes
+
+
+def compute_playlist_delta(old: dict, new: dict) -> Union[dict, None]:
+    '''
+    This function finds the delta between 2 versions of a playlist.
+
+    Params:
+        The JSON representations of the old and the new playlist.
+
+    Returns:
+        The playlist delta (see SnapshotChain), None if they are the same.
+    '''
+
+    old_videos = old["videos"]
+    new_videos = new["videos"]
+
+    playlist_delta = {
+        "added": {
+            video_id: video 
+            for video_id, video in new_videos.items() 
+            if video_id not in old_videos
+        },
+        "removed": {
+            video_id: video 
+            for video_id, video in old_videos.items() 
+            if video_id not in new_videos
+        },
+        "changed": {
+            video_id: [video, new_videos[video_id]] 
+            for video_id, video in old_videos.items() 
+            if video_id in new_videos and video != new_videos[video_id]
+        }
+    }
+
+    old_attributes = {key: value for key, value in old.items() if key != "videos"}
+    new_attributes = {key: value for key, value in new.items() if key != "videos"}
+
+    if (old_attributes != new_attributes or list(old) != list(new)):
+        playlist_delta["attributes"] = new_attributes
+        playlist_delta["keys"] = list(new)
+
+    # The order the videos would end up in without an explicit order.
+    if (list(apply_playlist_delta(old, playlist_delta)["videos"]) != list(new_videos)):
+        playlist_delta["order"] = list(new_videos)
+
+    if (len(playlist_delta["added"]) == 0 and 
+        len(playlist_delta["removed"]) == 0 and 
+        len(playlist_delta["changed"]) == 0 and 
+        "attributes" not in playlist_delta and 
+        "order" not in playlist_delta):
+
+        return None
+
+    return playlist_delta
+
+def apply_playlist_delta(old: dict, playlist_delta: dict) -> dict:
+    '''
+    This function applies a playlist delta to the playlist it was computed 
+    from.
+
+    Params:
+        The JSON representation of the old playlist and the playlist delta.
+
+    Returns:
+        The JSON representation of the new playlist, old is not modified.
+    '''
+
+    removed = playlist_delta["removed"]
+    changed = playlist_delta["changed"]
+
+    videos = {}
+
+    for video_id, video in old["videos"].items():
+
+        if (video_id in removed):
+            continue
+
+        if (video_id in changed):
+            video = changed[video_id][1]
+
+        videos[video_id] = video
+
+    videos.update(playlist_delta["added"])
+
+    if ("order" in playlist_delta):
+        videos = {video_id: videos[video_id] for video_id in playlist_delta["order"]}
+
+    attributes = playlist_delta.get("attributes", old)
+
+    return {
+        key: videos if (key == "videos") else attributes[key] 
+        for key in playlist_delta.get("keys", old)
+    }
+
+def apply_order_delta(playlist_ids: List[str], delta: dict) -> List[str]:
+    '''
+    This function works out the order of the playlists after a delta.
+
+    Params:
+        The ids of the playlists before the delta, in order, and the delta.
+
+    Returns:
+        The ids of the playlists after the delta, in order.
+    '''
+
+    if ("order" in delta):
+        return list(delta["order"])
+
+    return [
+        playlist_id 
+        for playlist_id in playlist_ids 
+        if playlist_id not in delta["removed_playlists"]
+    ] + list(delta["added_playlists"])
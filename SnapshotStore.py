@@ -0,0 +1,262 @@
+# Python
+from typing import Dict, List, Tuple, Union
+import sqlite3
+import pathlib
+
+# Internal
+from Video import Video, UNKNOWN_CHANNEL
+
+
+class SnapshotStore:
+    '''
+    This class keeps the history of archives in a SQLite database, one 
+    snapshot per archive, so that any two of them can be compared without 
+    loading them.
+
+    The tables are:
+        snapshots (id, time)
+        playlists (snapshot_id, playlist_id, position)
+        videos (snapshot_id, playlist_id, position, video_id, name, channel)
+
+    position keeps the order of the playlists in the archive and of the 
+    videos in their playlist. The links are left out since they can be 
+    worked out from the ids.
+
+    A snapshot is written in a single transaction: begin_snapshot(), then 
+    add_playlist() for each playlist (each is one bulk insert), then 
+    commit_snapshot(). A snapshot that is not committed is never seen.
+    '''
+
+    def __init__(self, database_path: pathlib.Path):
+        '''
+        Params:
+            The path to the database, it is created if it does not exist.
+
+        Raises:
+            sqlite3.Error if the database cannot be opened.
+        '''
+
+        # Transactions are started and ended by hand.
+        self.connection = sqlite3.connect(
+            str(database_path), isolation_level=None
+        )
+
+        self.connection.executescript("""
+            CREATE TABLE IF NOT EXISTS snapshots (
+                id INTEGER PRIMARY KEY,
+                time TEXT NOT NULL
+            );
+
+            CREATE TABLE IF NOT EXISTS playlists (
+                snapshot_id INTEGER NOT NULL REFERENCES snapshots(id),
+                playlist_id TEXT NOT NULL,
+                position INTEGER NOT NULL,
+                PRIMARY KEY (snapshot_id, playlist_id)
+            );
+
+            CREATE TABLE IF NOT EXISTS videos (
+                snapshot_id INTEGER NOT NULL,
+                playlist_id TEXT NOT NULL,
+                position INTEGER NOT NULL,
+                video_id TEXT NOT NULL,
+                name TEXT NOT NULL,
+                channel TEXT NOT NULL,
+                PRIMARY KEY (snapshot_id, playlist_id, video_id)
+            );
+
+            CREATE INDEX IF NOT EXISTS videos_video_id ON videos (video_id);
+            CREATE INDEX IF NOT EXISTS videos_playlist_id ON videos (playlist_id);
+            CREATE INDEX IF NOT EXISTS playlists_playlist_id ON playlists (playlist_id);
+        """)
+
+        self.playlist_count: int = 0
+
+    def close(self) -> None:
+        self.connection.close()
+
+    def begin_snapshot(self, time_str: str) -> int:
+        '''
+        This method starts a new snapshot.
+
+        Params:
+            The time attribute of the archive.
+
+        Returns:
+            The id of the new snapshot.
+        '''
+
+        self.connection.execute("BEGIN")
+
+        cursor = self.connection.execute(
+            "INSERT INTO snapshots (time) VALUES (?)", (time_str,)
+        )
+
+        self.playlist_count = 0
+
+        return cursor.lastrowid
+
+    def add_playlist(self, snapshot_id: int, playlist: dict) -> None:
+        '''
+        This method adds a playlist to a snapshot that was begun.
+
+        Params:
+            snapshot_id: the id given by begin_snapshot().
+            playlist: the JSON representation of the playlist.
+
+        Raises:
+            sqlite3.IntegrityError if the snapshot already has the playlist, 
+            or if the playlist has the same video id twice (its videos are 
+            keyed by something else than their id). The snapshot has to be 
+            rolled back then.
+        '''
+
+        playlist_id = playlist["id"]
+
+        self.connection.execute(
+            "INSERT INTO playlists (snapshot_id, playlist_id, position) VALUES (?, ?, ?)",
+            (snapshot_id, playlist_id, self.playlist_count)
+        )
+
+        self.connection.executemany(
+            "INSERT INTO videos (snapshot_id, playlist_id, position, video_id, name, channel) VALUES (?, ?, ?, ?, ?, ?)",
+            (
+                (snapshot_id, playlist_id, position, video["id"], video["name"], video["channel"]) 
+                for position, video in enumerate(playlist["videos"].values())
+            )
+        )
+
+        self.playlist_count += 1
+
+    def set_snapshot_time(self, snapshot_id: int, time_str: str) -> None:
+        '''
+        This method changes the time of a snapshot that was begun, for when 
+        the time is only known after the playlists.
+        '''
+
+        self.connection.execute(
+            "UPDATE snapshots SET time = ? WHERE id = ?", (time_str, snapshot_id)
+        )
+
+    def commit_snapshot(self) -> None:
+        self.connection.execute("COMMIT")
+
+    def rollback_snapshot(self) -> None:
+
+        if (self.connection.in_transaction):
+            self.connection.execute("ROLLBACK")
+
+    def get_snapshots(self) -> List[Tuple[int, str, int, int]]:
+        '''
+        Returns:
+            (id, time, number of playlists, number of videos) of every 
+            snapshot, from the oldest to the newest.
+        '''
+
+        return self.connection.execute("""
+            SELECT s.id, s.time,
+                (SELECT COUNT(*) FROM playlists p WHERE p.snapshot_id = s.id),
+                (SELECT COUNT(*) FROM videos v WHERE v.snapshot_id = s.id)
+            FROM snapshots s
+            ORDER BY s.id
+        """).fetchall()
+
+    def get_snapshot_time(self, snapshot_id: int) -> Union[str, None]:
+        '''
+        Returns:
+            The time attribute of the snapshot, None if there is no snapshot 
+            with that id.
+        '''
+
+        row = self.connection.execute(
+            "SELECT time FROM snapshots WHERE id = ?", (snapshot_id,)
+        ).fetchone()
+
+        if (row == None):
+            return None
+
+        return row[0]
+
+    def compare_snapshots(
+        self, 
+        old_snapshot_id: int, 
+        new_snapshot_id: int
+    ) -> Dict[str, tuple]:
+        '''
+        This method compares the mutual playlists of 2 snapshots, all in SQL.
+
+        Params:
+            The ids of the old and the new snapshot.
+
+        Returns:
+            A dictionary from the id of each mutual playlist (in the order of 
+            the old snapshot) to the same tuple of (added, removed, changed) 
+            that compare_video_set() in comparator.py gives.
+        '''
+
+        changes: Dict[str, tuple] = {}
+
+        mutual_playlists = self.connection.execute("""
+            SELECT o.playlist_id
+            FROM playlists o
+            JOIN playlists n
+                ON n.snapshot_id = ? AND n.playlist_id = o.playlist_id
+            WHERE o.snapshot_id = ?
+            ORDER BY o.position
+        """, (new_snapshot_id, old_snapshot_id)).fetchall()
+
+        for (playlist_id,) in mutual_playlists:
+            changes[playlist_id] = ([], [], [])
+
+        # Videos of one snapshot that are not in the same playlist of the 
+        # other, which are the added videos one way and the removed videos 
+        # the other way.
+        difference_query = """
+            SELECT a.playlist_id, a.video_id, a.name, a.channel
+            FROM videos a
+            JOIN playlists p
+                ON p.snapshot_id = :other AND p.playlist_id = a.playlist_id
+            WHERE a.snapshot_id = :this AND NOT EXISTS (
+                SELECT 1 FROM videos b
+                WHERE b.snapshot_id = :other 
+                    AND b.playlist_id = a.playlist_id 
+                    AND b.video_id = a.video_id
+            )
+            ORDER BY a.playlist_id, a.position
+        """
+
+        for index, (this, other) in enumerate((
+            (new_snapshot_id, old_snapshot_id), 
+            (old_snapshot_id, new_snapshot_id)
+        )):
+            rows = self.connection.execute(
+                difference_query, {"this": this, "other": other}
+            )
+
+            for playlist_id, video_id, name, channel in rows:
+                changes[playlist_id][index].append(Video(name, channel, video_id))
+
+        # Videos in both that went from deleted to not deleted or the other 
+        # way around.
+        rows = self.connection.execute("""
+            SELECT o.playlist_id, o.video_id, o.name, o.channel, n.name, n.channel
+            FROM videos o
+            JOIN videos n
+                ON n.snapshot_id = :new 
+                    AND n.playlist_id = o.playlist_id 
+                    AND n.video_id = o.video_id
+            WHERE o.snapshot_id = :old 
+                AND (o.channel = :unknown) <> (n.channel = :unknown)
+            ORDER BY o.playlist_id, o.position
+        """, {
+            "old": old_snapshot_id, 
+            "new": new_snapshot_id, 
+            "unknown": UNKNOWN_CHANNEL
+        })
+
+        for playlist_id, video_id, old_name, old_channel, new_name, new_channel in rows:
+            changes[playlist_id][2].append([
+                Video(old_name, old_channel, video_id), 
+                Video(new_name, new_channel, video_id)
+            ])
+
+        return changes
@@ -0,0 +1,675 @@
+'''
+TitleSearch.py: a trigram index of every name and channel ever archived, to
+find videos from a part of their name (or their channel) without going
+through any archive.
+
+Every different name or channel is an entry, which lists the ids of the
+videos that had it. Every trigram (3 characters in a row, after casefolding)
+has a posting list, which lists the entries that have the trigram. A search
+only reads the posting lists of the trigrams of the query.
+
+Layout of the index file (numbers, str and str columns are packed like in
+BinaryArchive.py):
+
+    MAGIC
+    an entry for each name or channel, numbered from 0: kind (u8, see the
+    KIND_ constants), text (str), ids of the videos (str column)
+    a posting list for each trigram: the entry numbers, as the difference
+    with the number before (u32 each), zlib compressed
+    offset of each entry (u64 each)
+    an entry slot for each entry, sorted by key: key (u64, see
+    make_entry_key()), entry number (u64)
+    a trigram slot for each trigram, sorted by key: key (u64, see
+    make_trigram_key()), number of entries (u32), offset (u64) and size (u32)
+    of its posting list
+    offset of the posting lists (u64), offset of the entry offsets (u64),
+    number of entries (u64), number of trigrams (u64), MAGIC
+
+Since new entries are numbered after the old ones, adding archives only
+appends to the posting lists, the posting lists of trigrams with no new
+entries are copied as they are.
+'''
+
+# Python
+from typing import Any, Callable, DefaultDict, Dict, Iterator, List, Set, Tuple, Union
+from array import array
+from collections import Counter, defaultdict
+import itertools
+import operator
+import hashlib
+import pathlib
+import struct
+import mmap
+import zlib
+import os
+
+# Internal
+from utilities import output_file_opening
+from PlaceHolder import PlaceHolder
+from Video import UNKNOWN_CHANNEL
+from BinaryArchive import BufferReader, pack_str, pack_str_column, to_little_endian
+
+MAGIC: bytes = b"YTTSRC01"
+
+KIND_NAME: int = 0
+KIND_CHANNEL: int = 1
+
+KIND_STRS: List[str] = ["name", "channel"]
+
+ENTRY_SLOT_FORMAT: str = "<QQ"
+ENTRY_SLOT_SIZE: int = struct.calcsize(ENTRY_SLOT_FORMAT)
+
+TRIGRAM_SLOT_FORMAT: str = "<QIQI"
+TRIGRAM_SLOT_SIZE: int = struct.calcsize(TRIGRAM_SLOT_FORMAT)
+
+FOOTER_FORMAT: str = "<QQQQ"
+FOOTER_SIZE: int = struct.calcsize(FOOTER_FORMAT) + len(MAGIC)
+
+# Queries shorter than this have no trigram to look up.
+MIN_QUERY_LENGTH: int = 3
+
+# How many results a search gives at most.
+SEARCH_LIMIT: int = 20
+
+# A fuzzy search only gives the entries that have at least this fraction of
+# the trigrams of the query.
+FUZZY_MIN_SIMILARITY: float = 0.5
+
+# How many parts are put together before being written.
+WRITE_BATCH_SIZE: int = 4096
+
+
+def make_entry_key(kind: int, text: str) -> int:
+    '''
+    This function turns an entry into the number the entry slots are sorted
+    by. It is the same on every run (unlike hash()).
+    '''
+
+    return int.from_bytes(
+        hashlib.blake2b(bytes([kind]) + text.encode("utf-8"), digest_size=8).digest(),
+        "little"
+    )
+
+def make_trigrams(text: str) -> Set[str]:
+    '''
+    This function finds the trigrams of a text, after casefolding it. A text
+    shorter than a trigram is its own trigram.
+    '''
+
+    folded = text.casefold()
+
+    if (len(folded) < 3):
+        return {folded} if (folded) else set()
+
+    # Done with zip() rather than slicing in a loop, it is a lot faster for
+    # millions of names.
+    return set(map("".join, zip(folded, folded[1:], folded[2:])))
+
+def make_trigram_key(trigram: str) -> int:
+    '''
+    This function turns a trigram into the number the trigram slots are
+    sorted by. Every code point fits in 21 bits, so different trigrams
+    always have different keys.
+    '''
+
+    key = 0
+
+    for character in trigram:
+        key = (key << 21) | ord(character)
+
+    return key << 21*(3 - len(trigram))
+
+def encode_postings(entry_numbers: List[int]) -> bytes:
+    '''
+    This function packs a posting list (entry numbers sorted from the
+    smallest).
+    '''
+
+    differences = array("I", entry_numbers[:1])
+    differences.extend(map(operator.sub, entry_numbers[1:], entry_numbers))
+
+    # The differences are mostly tiny, the fastest level already packs them
+    # about as small as the default one.
+    return zlib.compress(to_little_endian(differences).tobytes(), 1)
+
+def decode_postings(data: bytes) -> List[int]:
+
+    differences = array("I")
+    differences.frombytes(zlib.decompress(data))
+
+    return list(itertools.accumulate(to_little_endian(differences)))
+
+def pack_entry(kind: int, text: str, video_ids: List[str]) -> bytes:
+    return bytes([kind]) + pack_str(text) + pack_str_column(video_ids)
+
+
+class TitleSearch:
+    '''
+    This class reads, searches and updates a search index file (see the
+    layout above).
+
+    When archives are added, the whole index is written again to a temporary
+    file, which then replaces the index. The old entries and posting lists
+    are copied from the index, only the names and channels of the new
+    archives have to be in memory.
+    '''
+
+    def __init__(self, index_file_path: pathlib.Path):
+        '''
+        Params:
+            The path of the index file, which does not have to exist yet.
+
+        Raises:
+            ValueError if the file exists but is not a search index or is
+            corrupted.
+        '''
+
+        self.index_file_path: pathlib.Path = index_file_path
+
+        self.temporary_file_path: pathlib.Path = index_file_path.with_name(
+            f".{index_file_path.name}.tmp"
+        )
+
+        self.file = PlaceHolder.get_place_holder()
+        self.data: Union[mmap.mmap, bytes] = b""
+
+        self.postings_offset: int = len(MAGIC)
+        self.entry_offsets_offset: int = len(MAGIC)
+        self.entry_count: int = 0
+        self.trigram_count: int = 0
+
+        self.entry_slots_offset: int = len(MAGIC)
+        self.trigram_slots_offset: int = len(MAGIC)
+
+        if (self.index_file_path.exists()):
+            self.open()
+
+    def open(self) -> None:
+
+        self.file = self.index_file_path.open("rb")
+
+        try:
+            self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        except ValueError:
+            # An empty file cannot be mapped.
+            self.data = b""
+
+        if (len(self.data) < len(MAGIC) + FOOTER_SIZE or
+            self.data[:len(MAGIC)] != MAGIC or
+            self.data[-len(MAGIC):] != MAGIC):
+
+            self.close()
+            raise ValueError("The file is not a search index or is cut off")
+
+        (
+            self.postings_offset,
+            self.entry_offsets_offset,
+            self.entry_count,
+            self.trigram_count
+        ) = struct.unpack_from(FOOTER_FORMAT, self.data, len(self.data) - FOOTER_SIZE)
+
+        self.entry_slots_offset = self.entry_offsets_offset + self.entry_count*8
+        self.trigram_slots_offset = (
+            self.entry_slots_offset + self.entry_count*ENTRY_SLOT_SIZE
+        )
+
+        if (len(MAGIC) > self.postings_offset or
+            self.postings_offset > self.entry_offsets_offset or
+            self.trigram_slots_offset + self.trigram_count*TRIGRAM_SLOT_SIZE !=
+            len(self.data) - FOOTER_SIZE):
+
+            self.close()
+            raise ValueError("The footer of the search index is corrupted")
+
+    def close(self) -> None:
+
+        if (isinstance(self.data, mmap.mmap)):
+            self.data.close()
+
+        self.data = b""
+        self.file.close()
+        self.file = PlaceHolder.get_place_holder()
+
+    def read_entry_offsets(self) -> array:
+
+        offsets = array("Q")
+        offsets.frombytes(self.data[self.entry_offsets_offset:self.entry_slots_offset])
+
+        return to_little_endian(offsets)
+
+    def read_entry(self, entry_number: int) -> Tuple[int, str, List[str]]:
+        '''
+        Returns:
+            (kind, text, ids of the videos) of the given entry.
+        '''
+
+        offset, = struct.unpack_from("<Q", self.data, self.entry_offsets_offset + entry_number*8)
+
+        reader = BufferReader(self.data)
+        reader.position = offset
+
+        try:
+            kind, = reader.read_struct("<B")
+            text = reader.read_str()
+            video_ids = reader.read_str_column()
+
+        except (struct.error, UnicodeDecodeError) as error:
+            raise ValueError(f"The entries of the search index are corrupted: {error}")
+
+        return kind, text, video_ids
+
+    def iterate_entry_slots(self) -> Iterator[Tuple[int, int]]:
+        '''
+        Yields:
+            (key, entry number) of every entry, sorted by key.
+        '''
+
+        return struct.iter_unpack(
+            ENTRY_SLOT_FORMAT,
+            self.data[self.entry_slots_offset:self.trigram_slots_offset]
+        )
+
+    def iterate_trigram_slots(self) -> Iterator[Tuple[int, int, int, int]]:
+        '''
+        Yields:
+            (key, number of entries, offset, size) of every trigram, sorted
+            by key.
+        '''
+
+        return struct.iter_unpack(
+            TRIGRAM_SLOT_FORMAT,
+            self.data[
+                self.trigram_slots_offset:
+                self.trigram_slots_offset + self.trigram_count*TRIGRAM_SLOT_SIZE
+            ]
+        )
+
+    def find_trigram(self, key: int) -> Union[Tuple[int, int, int, int], None]:
+        '''
+        Returns:
+            (key, number of entries, offset, size) of the given trigram, None
+            if no entry has it.
+        '''
+
+        low = 0
+        high = self.trigram_count
+
+        while (low < high):
+            middle = (low + high)//2
+
+            slot = struct.unpack_from(
+                TRIGRAM_SLOT_FORMAT,
+                self.data,
+                self.trigram_slots_offset + middle*TRIGRAM_SLOT_SIZE
+            )
+
+            if (slot[0] == key):
+                return slot
+
+            if (slot[0] < key):
+                low = middle + 1
+
+            else:
+                high = middle
+
+        return None
+
+    def read_postings(self, slot: Tuple[int, int, int, int]) -> List[int]:
+
+        _, _, offset, size = slot
+
+        try:
+            return decode_postings(self.data[offset:offset + size])
+
+        except zlib.error as error:
+            raise ValueError(f"The posting lists of the search index are corrupted: {error}")
+
+    def search(
+        self,
+        query: str,
+        fuzzy: bool = False,
+        limit: int = SEARCH_LIMIT
+    ) -> List[Dict[str, Any]]:
+        '''
+        This method finds the names and channels that contain the query
+        (ignoring case), or with fuzzy, the ones that have most of the
+        trigrams of the query (so a query with a few wrong characters still
+        finds them).
+
+        Params:
+            query: the text to find.
+            fuzzy: whether to give the entries close to the query instead of
+            the ones that contain it.
+            limit: how many results to give at most.
+
+        Returns:
+            For every result, best first (the highest score, then the
+            shortest text), a dictionary with its "kind" ("name" or
+            "channel"), "text", "video_ids" and "score" (the fraction of
+            the trigrams of the query it has, always 1 without fuzzy).
+
+        Raises:
+            ValueError if the query is shorter than MIN_QUERY_LENGTH.
+        '''
+
+        folded = query.casefold()
+
+        if (len(folded) < MIN_QUERY_LENGTH):
+            raise ValueError(f"The query has to be at least {MIN_QUERY_LENGTH} characters long")
+
+        trigrams = make_trigrams(folded)
+        slots = [self.find_trigram(make_trigram_key(trigram)) for trigram in trigrams]
+
+        # (score, entry number) of every candidate.
+        candidates: List[Tuple[float, int]]
+
+        if not (fuzzy):
+
+            if (None in slots):
+                return []
+
+            # The shortest posting lists first, so that the candidates get
+            # few as early as possible.
+            slots.sort(key=lambda slot: slot[1])
+
+            entry_numbers = set(self.read_postings(slots[0]))
+
+            for slot in slots[1:]:
+
+                if not (entry_numbers):
+                    break
+
+                entry_numbers.intersection_update(self.read_postings(slot))
+
+            candidates = [(1.0, number) for number in sorted(entry_numbers)]
+
+        else:
+            counts: Counter = Counter()
+
+            for slot in slots:
+
+                if (slot != None):
+                    counts.update(self.read_postings(slot))
+
+            minimum_count = FUZZY_MIN_SIMILARITY*len(trigrams)
+
+            candidates = sorted(
+                (
+                    (count/len(trigrams), number)
+                    for number, count in counts.items() if (count >= minimum_count)
+                ),
+                key=lambda candidate: (-candidate[0], candidate[1])
+            )
+
+        results: List[Dict[str, Any]] = []
+
+        # The candidates come best score first, so once there are enough 
+        # results only the candidates as good as the last one can still make 
+        # it (by being shorter).
+        for score, number in candidates:
+
+            if (len(results) >= limit and score < results[-1]["score"]):
+                break
+
+            kind, text, video_ids = self.read_entry(number)
+
+            # Having all the trigrams does not mean having them in order.
+            if not (fuzzy or folded in text.casefold()):
+                continue
+
+            results.append({
+                "kind": KIND_STRS[kind],
+                "text": text,
+                "video_ids": video_ids,
+                "score": score
+            })
+
+        # Among results as good, the shortest texts are the closest to the
+        # query.
+        results.sort(key=lambda result: (-result["score"], len(result["text"])))
+
+        return results[:limit]
+
+    def add_archives(
+        self,
+        archives: List[Tuple[str, Any]],
+        check_playlist: Callable[[dict], bool],
+        check_time: Callable[[str], bool]
+    ) -> int:
+        '''
+        This method adds the names and channels of archives to the index.
+        Deleted and private videos (which have no channel) are left out,
+        their names are only placeholders.
+
+        Params:
+            archives: (path, ArchiveReader or BinaryArchiveReader) of every
+            archive to add.
+            check_playlist: the function that checks a playlist is of correct
+            format (check_format_of_playlist() in comparator.py).
+            check_time: the function that checks the time of the archive is
+            of correct format (check_time_format() in comparator.py).
+
+        Returns:
+            The number of entries in the index.
+
+        Raises:
+            ValueError if an archive is not of correct format, in which case
+            the index is left as it was.
+        '''
+
+        # (kind, text) -> ids of the videos.
+        new_entries: Dict[Tuple[int, str], Set[str]] = {}
+
+        for path, reader in archives:
+            time_str = reader.read_time()
+
+            if (not isinstance(time_str, str) or not check_time(time_str)):
+                raise ValueError("The time of the archive is not valid")
+
+            for playlist_id, playlist in reader.iterate():
+
+                if not (check_playlist(playlist)):
+                    raise ValueError(f"The playlist {playlist_id} is not valid")
+
+                for video in playlist["videos"].values():
+
+                    if (video["channel"] == UNKNOWN_CHANNEL):
+                        continue
+
+                    new_entries.setdefault((KIND_NAME, video["name"]), set()).add(video["id"])
+                    new_entries.setdefault((KIND_CHANNEL, video["channel"]), set()).add(video["id"])
+
+        entry_keys = {
+            (kind, text): make_entry_key(kind, text) for kind, text in new_entries
+        }
+
+        new_keys = set(entry_keys.values())
+
+        # Entry number -> ids of the videos to add, for the entries already
+        # in the index.
+        updated_entries: Dict[int, Set[str]] = {}
+
+        for key, number in self.iterate_entry_slots():
+
+            if (key in new_keys):
+                kind, text, video_ids = self.read_entry(number)
+
+                if ((kind, text) in new_entries):
+                    updated_entries[number] = new_entries.pop((kind, text)).difference(video_ids)
+
+        del new_keys
+
+        self.write_index(updated_entries, new_entries, entry_keys)
+
+        return self.entry_count
+
+    def write_index(
+        self,
+        updated_entries: Dict[int, Set[str]],
+        new_entries: Dict[Tuple[int, str], Set[str]],
+        entry_keys: Dict[Tuple[int, str], int]
+    ) -> None:
+        '''
+        This method writes a new index to the temporary file, with the ids
+        of updated_entries added to the entries already in the index and
+        new_entries numbered after them, then replaces the index with it.
+        entry_keys has the key (see make_entry_key()) of every new entry.
+        '''
+
+        file = output_file_opening(self.temporary_file_path, binary=True)
+
+        if (file == PlaceHolder.get_place_holder()):
+            raise OSError(f"Could not write {self.temporary_file_path.as_posix()}")
+
+        try:
+            entry_offsets = array("Q")
+
+            file.write(MAGIC)
+
+            # The entries already in the index, copied as they are unless
+            # they have new videos.
+            old_entry_offsets = self.read_entry_offsets()
+            old_entry_offsets.append(self.postings_offset)
+
+            copied_offset = len(MAGIC)
+            shift = 0
+
+            for number in sorted(updated_entries):
+                start = old_entry_offsets[number]
+                end = old_entry_offsets[number + 1]
+
+                kind, text, video_ids = self.read_entry(number)
+                entry = pack_entry(kind, text, video_ids + sorted(updated_entries[number]))
+
+                file.write(self.data[copied_offset:start])
+                file.write(entry)
+                copied_offset = end
+
+                entry_offsets.extend(
+                    old_offset + shift
+                    for old_offset in old_entry_offsets[len(entry_offsets):number + 1]
+                )
+
+                shift += len(entry) - (end - start)
+
+            file.write(self.data[copied_offset:self.postings_offset])
+
+            entry_offsets.extend(
+                old_offset + shift
+                for old_offset in old_entry_offsets[len(entry_offsets):self.entry_count]
+            )
+
+            offset = self.postings_offset + shift
+
+            # The new entries, and the trigrams they have.
+            entry_slots = [(key, number) for key, number in self.iterate_entry_slots()]
+            new_postings: DefaultDict[str, List[int]] = defaultdict(list)
+
+            parts: List[bytes] = []
+
+            for number, ((kind, text), video_ids) in enumerate(new_entries.items(), self.entry_count):
+                entry = pack_entry(kind, text, sorted(video_ids))
+
+                entry_offsets.append(offset)
+                entry_slots.append((entry_keys[(kind, text)], number))
+
+                for trigram in make_trigrams(text):
+                    new_postings[trigram].append(number)
+
+                parts.append(entry)
+                offset += len(entry)
+
+                if (len(parts) >= WRITE_BATCH_SIZE):
+                    file.write(b"".join(parts))
+                    parts.clear()
+
+            file.write(b"".join(parts))
+            parts.clear()
+
+            entry_slots.sort()
+
+            # The posting lists, the old ones get the new entries at their
+            # end since these are numbered after every old entry.
+            postings_offset = offset
+            trigram_slots: List[Tuple[int, int, int, int]] = []
+
+            new_postings_by_key = sorted(
+                (make_trigram_key(trigram), entry_numbers)
+                for trigram, entry_numbers in new_postings.items()
+            )
+
+            del new_postings
+
+            old_slots = self.iterate_trigram_slots()
+            old_slot = next(old_slots, None)
+
+            for key, entry_numbers in new_postings_by_key + [(None, None)]:
+
+                while (old_slot != None and (key == None or old_slot[0] < key)):
+                    _, count, old_offset, size = old_slot
+
+                    parts.append(self.data[old_offset:old_offset + size])
+                    trigram_slots.append((old_slot[0], count, offset, size))
+                    offset += size
+
+                    old_slot = next(old_slots, None)
+
+                if (key == None):
+                    break
+
+                if (old_slot != None and old_slot[0] == key):
+                    entry_numbers = self.read_postings(old_slot) + entry_numbers
+                    old_slot = next(old_slots, None)
+
+                postings = encode_postings(entry_numbers)
+
+                parts.append(postings)
+                trigram_slots.append((key, len(entry_numbers), offset, len(postings)))
+                offset += len(postings)
+
+                if (len(parts) >= WRITE_BATCH_SIZE):
+                    file.write(b"".join(parts))
+                    parts.clear()
+
+            file.write(b"".join(parts))
+            parts.clear()
+
+            entry_offsets_offset = offset
+
+            file.write(to_little_endian(entry_offsets).tobytes())
+            file.write(to_little_endian(array("Q", itertools.chain.from_iterable(entry_slots))).tobytes())
+
+            for slot_index in range(0, len(trigram_slots), WRITE_BATCH_SIZE):
+                file.write(b"".join(
+                    struct.pack(TRIGRAM_SLOT_FORMAT, *slot)
+                    for slot in trigram_slots[slot_index:slot_index + WRITE_BATCH_SIZE]
+                ))
+
+            file.write(
+                struct.pack(
+                    FOOTER_FORMAT,
+                    postings_offset,
+                    entry_offsets_offset,
+                    len(entry_offsets),
+                    len(trigram_slots)
+                )
+                + MAGIC
+            )
+
+            file.close()
+
+            # The index may be mapped, which keeps it from being replaced on
+            # some systems.
+            if (self.index_file_path.exists()):
+                self.close()
+
+            os.replace(self.temporary_file_path, self.index_file_path)
+
+        finally:
+            file.close()
+
+            if (self.temporary_file_path.exists()):
+                os.remove(self.temporary_file_path)
+
+        self.open()
@@ -0,0 +1,128 @@
+# External
+import requests
+import requests.adapters
+
+# Python
+from typing import Dict, Tuple
+import threading
+
+# Internal
+from configuration import (
+    API_URL, 
+    REQUEST_TIMEOUT, 
+    CONNECTION_POOL_SIZE, 
+    HTTP_USER_AGENT
+)
+
+
+class Transport:
+    '''
+    This class is the one and only way the program should talk to the 
+    Youtube API.
+
+    It wraps a requests.Session so that every request made through it:
+        - reuses keep-alive connections from a pool instead of doing a new 
+        TCP + TLS handshake for every page.
+        - asks for gzip encoded responses (Youtube only sends gzip when the 
+        user agent also contains "gzip", hence HTTP_USER_AGENT).
+        - has a timeout, so a stuck connection cannot hang the program 
+        forever.
+
+    It also knows where the API is (api_url), which is API_URL unless the 
+    archiver is pointed somewhere else, like the mock API server used for 
+    load tests (see benchmarks/mock_api.py).
+
+    There is supposed to be only one of it per process, use get_transport() 
+    to get it.
+    '''
+
+    _main_object = None
+    _main_object_lock = threading.Lock()
+
+    def __init__(
+        self, 
+        timeout: Tuple[float, float] = REQUEST_TIMEOUT, 
+        pool_size: int = CONNECTION_POOL_SIZE
+    ):
+        self.timeout: Tuple[float, float] = timeout
+
+        self.api_url: str = API_URL
+
+        self.session: requests.Session = requests.Session()
+
+        self.session.headers.update({
+            "Accept-Encoding": "gzip",
+            "User-Agent": HTTP_USER_AGENT
+        })
+
+        self.pool_size: int = 0
+
+        self.set_pool_size(pool_size)
+
+    def set_pool_size(self, pool_size: int) -> None:
+        '''
+        This method makes sure the connection pool can hold at least 
+        pool_size connections, so that every concurrent fetch can keep its own 
+        connection alive. The pool never shrinks.
+
+        Params:
+            pool_size: the minimum number of connections to keep per host.
+        '''
+
+        if (pool_size <= self.pool_size):
+            return
+
+        self.pool_size = pool_size
+
+        adapter = requests.adapters.HTTPAdapter(
+            pool_connections=pool_size,
+            pool_maxsize=pool_size
+        )
+
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def set_api_url(self, api_url: str) -> None:
+        self.api_url = api_url
+
+    def get(
+        self, 
+        url: str, 
+        params: Dict[str, str] = None, 
+        headers: Dict[str, str] = None
+    ) -> requests.Response:
+        '''
+        This method sends a GET request through the pooled session.
+
+        Params:
+            url: the url to send the request to.
+            params: the query parameters.
+            headers: extra headers for this request only.
+
+        Returns:
+            The response object.
+
+        Raises:
+            requests.RequestException (or its subclasses) if the request 
+            cannot be completed, including when it times out.
+        '''
+
+        return self.session.get(
+            url, 
+            params=params, 
+            headers=headers, 
+            timeout=self.timeout
+        )
+
+    def close(self) -> None:
+        self.session.close()
+
+    @classmethod
+    def get_transport(cls) -> 'Transport':
+
+        with cls._main_object_lock:
+
+            if (cls._main_object == None):
+                cls._main_object = Transport()
+
+        return cls._main_object
@@ -1,13 +1,29 @@
-from typing import *
+from typing import Dict
+import sys
 
 YOUTUBE_VIDEO_PREFIX = "youtube.com/watch?v="
 
+# The channel given to a video when the API does not say who uploaded it, 
+# which only happens when the video is deleted or privatised.
+UNKNOWN_CHANNEL = "Unknown Channel"
+
 class Video:
+
+	# There can be millions of videos in memory, without a __dict__ each of 
+	# them is a lot smaller.
+	__slots__ = ("name", "channel", "id")
+
 	def __init__(self, name: str, channel: str, id: str):
 		self.name: str = name
-		self.channel: str = channel
-		self.id = id
-		self.link: str = YOUTUBE_VIDEO_PREFIX + self.id
+
+		# A channel usually has many videos, interning makes all of them share 
+		# the same string.
+		self.channel: str = sys.intern(channel)
+		self.id: str = id
+
+	@property
+	def link(self) -> str:
+		return YOUTUBE_VIDEO_PREFIX + self.id
 
 	@classmethod
 	def initiate_video_from_json(cls, json_repr: Dict[str, str]) -> 'Video':
@@ -79,7 +95,7 @@ class Video:
 		'''
 
 		# This should be mentioned in archiver.py
-		return (self.channel == "Unknown Channel")
+		return (self.channel == UNKNOWN_CHANNEL)
 
 	# For debugging purpose.
 	def __repr__(self):
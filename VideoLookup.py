@@ -0,0 +1,437 @@
+'''
+VideoLookup.py: an index of every video ever archived, to find out what a
+video was (its last known name and channel, and the archive they come from)
+from its id, without going through any archive.
+
+Layout of the index file (numbers and str are packed like in
+BinaryArchive.py):
+
+    MAGIC
+    number of archives (u32), then for each archive its time (str) and path
+    (str)
+    a record for each video: id (str), name (str), channel (str), index of
+    the archive (u32)
+    a slot for each video, sorted by key then id: key (u64, see make_key()),
+    offset of the record (u64)
+    offset of the slots (u64), number of slots (u64), MAGIC
+
+Since the slots all have the same size, a video is found with a binary search
+over the memory mapped file, which only touches a few pages of it.
+'''
+
+# Python
+from typing import Any, Callable, Dict, Iterator, List, Tuple, Union
+from array import array
+import hashlib
+import pathlib
+import struct
+import mmap
+import os
+
+# Internal
+from utilities import output_file_opening
+from PlaceHolder import PlaceHolder
+from Video import UNKNOWN_CHANNEL
+from BinaryArchive import BufferReader, pack_str, to_little_endian
+
+MAGIC: bytes = b"YTVIDX01"
+
+SLOT_FORMAT: str = "<QQ"
+SLOT_SIZE: int = struct.calcsize(SLOT_FORMAT)
+
+FOOTER_FORMAT: str = "<QQ"
+FOOTER_SIZE: int = struct.calcsize(FOOTER_FORMAT) + len(MAGIC)
+
+# How many records are put together before being written.
+WRITE_BATCH_SIZE: int = 4096
+
+
+def make_key(video_id: str) -> int:
+    '''
+    This function turns a video id into the number the slots are sorted by.
+    It is the same on every run (unlike hash()).
+    '''
+
+    return int.from_bytes(
+        hashlib.blake2b(video_id.encode("utf-8"), digest_size=8).digest(),
+        "little"
+    )
+
+
+class VideoLookup:
+    '''
+    This class reads and updates an index file (see the layout above).
+
+    When archives are added, the videos in them are merged with the ones
+    already in the index and the whole index is written again to a temporary
+    file, which then replaces the index. Only the new archives have to be in
+    memory, the index is read one record at a time while merging.
+    '''
+
+    def __init__(self, index_file_path: pathlib.Path):
+        '''
+        Params:
+            The path of the index file, which does not have to exist yet.
+
+        Raises:
+            ValueError if the file exists but is not an index or is
+            corrupted.
+        '''
+
+        self.index_file_path: pathlib.Path = index_file_path
+
+        self.temporary_file_path: pathlib.Path = index_file_path.with_name(
+            f".{index_file_path.name}.tmp"
+        )
+
+        self.file = PlaceHolder.get_place_holder()
+        self.data: Union[mmap.mmap, bytes] = b""
+
+        # (time, path) of every archive in the index.
+        self.archives: List[Tuple[str, str]] = []
+
+        self.slots_offset: int = 0
+        self.slot_count: int = 0
+
+        if (self.index_file_path.exists()):
+            self.open()
+
+    def open(self) -> None:
+
+        self.file = self.index_file_path.open("rb")
+
+        try:
+            self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        except ValueError:
+            # An empty file cannot be mapped.
+            self.data = b""
+
+        if (len(self.data) < len(MAGIC) + FOOTER_SIZE or
+            self.data[:len(MAGIC)] != MAGIC or
+            self.data[-len(MAGIC):] != MAGIC):
+
+            self.close()
+            raise ValueError("The file is not a video index or is cut off")
+
+        self.slots_offset, self.slot_count = struct.unpack_from(
+            FOOTER_FORMAT, self.data, len(self.data) - FOOTER_SIZE
+        )
+
+        if (self.slots_offset + self.slot_count*SLOT_SIZE !=
+            len(self.data) - FOOTER_SIZE):
+
+            self.close()
+            raise ValueError("The slots of the video index are corrupted")
+
+        reader = BufferReader(self.data)
+        reader.position = len(MAGIC)
+
+        try:
+            count, = reader.read_struct("<I")
+
+            self.archives = [
+                (reader.read_str(), reader.read_str()) for _ in range(count)
+            ]
+
+        except (struct.error, UnicodeDecodeError) as error:
+            self.close()
+            raise ValueError(f"The archives of the video index are corrupted: {error}")
+
+    def close(self) -> None:
+
+        if (isinstance(self.data, mmap.mmap)):
+            self.data.close()
+
+        self.data = b""
+        self.file.close()
+        self.file = PlaceHolder.get_place_holder()
+
+    def read_record(self, offset: int) -> Tuple[str, str, str, int]:
+        '''
+        Returns:
+            (id, name, channel, index of the archive) of the record at the
+            given offset.
+        '''
+
+        reader = BufferReader(self.data)
+        reader.position = offset
+
+        try:
+            video_id = reader.read_str()
+            name = reader.read_str()
+            channel = reader.read_str()
+            archive_index, = reader.read_struct("<I")
+
+        except (struct.error, UnicodeDecodeError) as error:
+            raise ValueError(f"The records of the video index are corrupted: {error}")
+
+        return video_id, name, channel, archive_index
+
+    def iterate_records(self) -> Iterator[Tuple[int, str, str, str, int]]:
+        '''
+        Yields:
+            (key, id, name, channel, index of the archive) of every video, in
+            the order of the slots.
+        '''
+
+        for slot in range(self.slot_count):
+            key, offset = struct.unpack_from(
+                SLOT_FORMAT, self.data, self.slots_offset + slot*SLOT_SIZE
+            )
+
+            yield (key,) + self.read_record(offset)
+
+    def lookup(self, video_id: str) -> Union[Dict[str, Any], None]:
+        '''
+        This method finds what a video was.
+
+        Params:
+            The id of the video.
+
+        Returns:
+            None if the video is in no archive of the index, otherwise a
+            dictionary with its "id", "name", "channel", whether it is
+            "deleted" (only if it never had a name in any archive), and the
+            "time" and "path" of the archive the name and channel come from.
+        '''
+
+        key = make_key(video_id)
+
+        low = 0
+        high = self.slot_count
+
+        while (low < high):
+            middle = (low + high)//2
+
+            middle_key, = struct.unpack_from(
+                "<Q", self.data, self.slots_offset + middle*SLOT_SIZE
+            )
+
+            if (middle_key < key):
+                low = middle + 1
+
+            else:
+                high = middle
+
+        # Different ids may (very rarely) have the same key.
+        for slot in range(low, self.slot_count):
+            slot_key, offset = struct.unpack_from(
+                SLOT_FORMAT, self.data, self.slots_offset + slot*SLOT_SIZE
+            )
+
+            if (slot_key != key):
+                break
+
+            record_id, name, channel, archive_index = self.read_record(offset)
+
+            if (record_id == video_id):
+                time_str, path = self.archives[archive_index]
+
+                return {
+                    "id": record_id,
+                    "name": name,
+                    "channel": channel,
+                    "deleted": channel == UNKNOWN_CHANNEL,
+                    "time": time_str,
+                    "path": path
+                }
+
+        return None
+
+    def add_archives(
+        self,
+        archives: List[Tuple[str, Any]],
+        check_playlist: Callable[[dict], bool],
+        check_time: Callable[[str], bool]
+    ) -> int:
+        '''
+        This method adds archives to the index. For every video, the index
+        keeps the name and channel from the latest archive where the video
+        was not deleted (or from the latest archive at all if it was always
+        deleted).
+
+        Params:
+            archives: (path, ArchiveReader or BinaryArchiveReader) of every
+            archive to add.
+            check_playlist: the function that checks a playlist is of correct
+            format (check_format_of_playlist() in comparator.py).
+            check_time: the function that checks the time of the archive is
+            of correct format (check_time_format() in comparator.py).
+
+        Returns:
+            The number of videos in the index.
+
+        Raises:
+            ValueError if an archive is not of correct format, in which case
+            the index is left as it was.
+        '''
+
+        all_archives = list(self.archives)
+
+        # Video id -> (name, channel, index of the archive).
+        entries: Dict[str, Tuple[str, str, int]] = {}
+
+        for path, reader in archives:
+            archive_index = len(all_archives)
+
+            # The time is known before the videos (to rank them) for both
+            # formats, since archiver.py writes it first.
+            time_str = reader.read_time()
+
+            if (not isinstance(time_str, str) or not check_time(time_str)):
+                raise ValueError("The time of the archive is not valid")
+
+            all_archives.append((time_str, path))
+
+            for playlist_id, playlist in reader.iterate():
+
+                if not (check_playlist(playlist)):
+                    raise ValueError(f"The playlist {playlist_id} is not valid")
+
+                for video in playlist["videos"].values():
+                    entry = (video["name"], video["channel"], archive_index)
+
+                    known_entry = entries.get(video["id"])
+
+                    if (known_entry == None or
+                        rank_entry(entry, all_archives) >= rank_entry(known_entry, all_archives)):
+
+                        entries[video["id"]] = entry
+
+        new_records = sorted(
+            (make_key(video_id), video_id) + entry
+            for video_id, entry in entries.items()
+        )
+
+        del entries
+
+        self.write_index(
+            all_archives,
+            merge_records(self.iterate_records(), new_records, all_archives)
+        )
+
+        return self.slot_count
+
+    def write_index(
+        self,
+        archives: List[Tuple[str, str]],
+        records: Iterator[Tuple[int, str, str, str, int]]
+    ) -> None:
+        '''
+        This method writes a new index with the given archives and records
+        (sorted by key then id) to the temporary file, then replaces the
+        index with it.
+        '''
+
+        file = output_file_opening(self.temporary_file_path, binary=True)
+
+        if (file == PlaceHolder.get_place_holder()):
+            raise OSError(f"Could not write {self.temporary_file_path.as_posix()}")
+
+        try:
+            parts = [MAGIC, struct.pack("<I", len(archives))]
+
+            for time_str, path in archives:
+                parts.append(pack_str(time_str) + pack_str(path))
+
+            offset = sum(len(part) for part in parts)
+
+            # key, offset of the record, key, offset...
+            slots = array("Q")
+
+            for key, video_id, name, channel, archive_index in records:
+                record = (
+                    pack_str(video_id) + pack_str(name) + pack_str(channel)
+                    + struct.pack("<I", archive_index)
+                )
+
+                slots.append(key)
+                slots.append(offset)
+
+                parts.append(record)
+                offset += len(record)
+
+                if (len(parts) >= WRITE_BATCH_SIZE):
+                    file.write(b"".join(parts))
+                    parts.clear()
+
+            file.write(b"".join(parts))
+
+            file.write(to_little_endian(slots).tobytes())
+            file.write(
+                struct.pack(FOOTER_FORMAT, offset, len(slots)//2) + MAGIC
+            )
+
+            file.close()
+
+            # The index may be mapped, which keeps it from being replaced on
+            # some systems.
+            if (self.index_file_path.exists()):
+                self.close()
+
+            os.replace(self.temporary_file_path, self.index_file_path)
+
+        finally:
+            file.close()
+
+            if (self.temporary_file_path.exists()):
+                os.remove(self.temporary_file_path)
+
+        self.open()
+
+
+def rank_entry(
+    entry: Tuple[str, str, int],
+    archives: List[Tuple[str, str]]
+) -> Tuple[bool, str]:
+    '''
+    This function gives what (name, channel, index of the archive) entries of
+    the same video are compared by: a name over no name (deleted), then the
+    latest archive. Times of the format TIME_FORMAT_STR sort like the time
+    they stand for.
+    '''
+
+    return (entry[1] != UNKNOWN_CHANNEL, archives[entry[2]][0])
+
+def merge_records(
+    old_records: Iterator[Tuple[int, str, str, str, int]],
+    new_records: List[Tuple[int, str, str, str, int]],
+    archives: List[Tuple[str, str]]
+) -> Iterator[Tuple[int, str, str, str, int]]:
+    '''
+    This function merges the records of the index with the records of the
+    new archives (both sorted by key then id), keeping the better of the 2
+    (see rank_entry()) for a video in both.
+
+    Yields:
+        The merged records, sorted by key then id.
+    '''
+
+    new_records_iterator = iter(new_records)
+    new_record = next(new_records_iterator, None)
+
+    for old_record in old_records:
+
+        while (new_record != None and new_record[:2] < old_record[:2]):
+            yield new_record
+            new_record = next(new_records_iterator, None)
+
+        if (new_record != None and new_record[:2] == old_record[:2]):
+
+            if (rank_entry(new_record[2:], archives) >=
+                rank_entry(old_record[2:], archives)):
+
+                yield new_record
+
+            else:
+                yield old_record
+
+            new_record = next(new_records_iterator, None)
+            continue
+
+        yield old_record
+
+    while (new_record != None):
+        yield new_record
+        new_record = next(new_records_iterator, None)
@@ -2,36 +2,95 @@
 archiver.py: does the archiving of one or more Youtube playlists and save it 
 as a JSON file.
 
-Usage: python3 archiver.py <input_file> <output_file>
+Usage: python3 archiver.py [-j <jobs>] [-b <baseline_archive>] [--no-cache] [--quota <units>] [--rate <requests_per_second>] [-f json|binary] [--store <database>] [--api-url <url>] [--metrics <json_file>] [--prometheus <file>] <input_file> <output_file>
 '''
 
 # External
 import requests
 
 # Python
-from typing import *
+from typing import Dict, List, Set, Tuple, Union
+from concurrent.futures import ThreadPoolExecutor
+import argparse
 import re
 import sys
 import pathlib
 import json
 import os
 import time
+import math
+import random
+import sqlite3
 
 # Internal
-from configuration import *
-from Video import Video
+from configuration import (
+	API_KEY,
+	API_URL,
+	MAX_CONCURRENT_FETCHES,
+	MAX_RETRIES,
+	PLAYLIST_REGEX,
+	QUOTA_COST_PER_REQUEST,
+	QUOTA_DAILY_BUDGET,
+	REQUESTS_PER_SECOND,
+	RETRYABLE_ERROR_REASONS,
+	RETRY_BASE_DELAY,
+	RETRY_MAX_DELAY,
+	TIME_FORMAT_STR
+)
+from Video import Video, UNKNOWN_CHANNEL
 from Playlist import Playlist
-from utilities import *
+from utilities import err_print, input_file_opening, overwriting_file_warning
 from PlaceHolder import PlaceHolder
+from Transport import Transport
+from ResponseCache import ResponseCache
+from QuotaScheduler import QuotaScheduler
+from ConcurrencyController import ConcurrencyController
+from Metrics import Metrics
+from ArchiveWriter import ArchiveWriter
+from BinaryArchive import BinaryArchiveWriter, create_archive_reader
+from SnapshotStore import SnapshotStore
+from comparator import check_format_of_playlist, check_time_format
+from validation import find_pages_error, make_path
 
 class Archiver:
 
-	def __init__(self, input_file, output_file) -> None:
+	def __init__(
+		self, 
+		input_file, 
+		output_file, 
+		max_concurrent_fetches: int = MAX_CONCURRENT_FETCHES,
+		baseline_file = None,
+		use_cache: bool = True,
+		output_format: str = "json",
+		snapshot_store_file = None,
+		metrics_file = None,
+		prometheus_file = None
+	) -> None:
 		'''
 		A constructor, pretty self-explanatory so idk what to say.
 
 		Also the constructor also calls open_files() which is somewhat 
 		noteworthy.
+
+		max_concurrent_fetches is the number of playlists that can be fetched 
+		at the same time.
+
+		baseline_file is an optional previous archive, playlists that are in 
+		it are only re-downloaded where they changed (see 
+		convert_playlist_url_to_playlist_obj()).
+
+		use_cache tells whether fetched pages are looked up in and saved to 
+		the on-disk response cache (see ResponseCache.py).
+
+		output_format is the format of the archive written, either "json" 
+		(see README) or "binary" (see BinaryArchive.py).
+
+		snapshot_store_file is an optional snapshot store (see 
+		SnapshotStore.py) the archive is also added to as a new snapshot.
+
+		metrics_file and prometheus_file are optional files the metrics of 
+		the run (see Metrics.py) are written to at the end, as a JSON summary 
+		and in the Prometheus text format.
 		'''
 
 		self.input_file_path: pathlib.Path = pathlib.Path(input_file).expanduser().resolve()
@@ -39,12 +98,65 @@ class Archiver:
 
 		self.output_file_path: pathlib.Path = pathlib.Path(output_file).expanduser().resolve()
 		
-		self.output_file = PlaceHolder.get_place_holder()
+		# The output is written through an ArchiveWriter, so the output file 
+		# itself is only created (or replaced) once the archive is complete.
+		self.archive_writer = PlaceHolder.get_place_holder()
+
+		self.output_format: str = output_format
+
+		self.snapshot_store_path: Union[pathlib.Path, None] = None
+		self.snapshot_store: Union[SnapshotStore, None] = None
+
+		if (snapshot_store_file != None):
+			self.snapshot_store_path = pathlib.Path(snapshot_store_file).expanduser().resolve()
+
+		self.metrics_file_path: Union[pathlib.Path, None] = None
+		self.prometheus_file_path: Union[pathlib.Path, None] = None
 
-		self.no_output: bool = True
+		if (metrics_file != None):
+			self.metrics_file_path = pathlib.Path(metrics_file).expanduser().resolve()
+
+		if (prometheus_file != None):
+			self.prometheus_file_path = pathlib.Path(prometheus_file).expanduser().resolve()
+
+		self.max_concurrent_fetches: int = max(1, max_concurrent_fetches)
+
+		Transport.get_transport().set_pool_size(self.max_concurrent_fetches)
+
+		ConcurrencyController.get_controller().set_maximum(
+			self.max_concurrent_fetches
+		)
+
+		ResponseCache.get_cache().set_enabled(use_cache)
+
+		# Playlists of the baseline archive, keyed by their id.
+		self.baseline_playlists: Dict[str, dict] = {}
+
+		# First pages of the playlists that are not in the baseline, keyed by 
+		# their id (see probe_playlists()).
+		self.first_pages: Dict[str, Union[Tuple[int, dict, Union[str, None]], None]] = {}
+
+		# The baseline is read before the output file is opened, so that it 
+		# is still intact even if both are the same file.
+		if (baseline_file != None):
+			self.load_baseline(baseline_file)
 
 		self.open_files()
 
+	def load_baseline(self, baseline_file) -> None:
+		'''
+		This method reads the previous archive that is used as the baseline 
+		of an incremental run (in either format), the program exits if it is 
+		not a valid archive.
+		'''
+
+		baseline = read_archive(pathlib.Path(baseline_file).expanduser().resolve())
+
+		if (baseline == None):
+			exit(1)
+
+		self.baseline_playlists = baseline[1]
+
 	def open_files(self) -> None:
 		'''
 		This method opens the file descriptors to the file in the paths passed 
@@ -119,65 +231,403 @@ class Archiver:
 
 		self.input_file = input_file_opening(self.input_file_path)
 
-		self.output_file = output_file_opening(self.output_file_path)
+		if (self.input_file == PlaceHolder.get_place_holder()):
+			self.clean_up(1)
+
+		if (self.snapshot_store_path != None):
+
+			try:
+				self.snapshot_store = SnapshotStore(self.snapshot_store_path)
+
+			except sqlite3.Error:
+				err_print(f"File {self.snapshot_store_path.as_posix()} is not a snapshot store or is corrupted, please check it again.")
+
+				self.clean_up(1)
 
-		if (self.output_file == PlaceHolder.get_place_holder() or 
-			self.input_file == PlaceHolder.get_place_holder()):
+		if (self.output_format == "binary"):
+			archive_writer_class = BinaryArchiveWriter
 
+		else:
+			archive_writer_class = ArchiveWriter
+
+		self.archive_time: str = time.strftime(TIME_FORMAT_STR)
+
+		archive_writer = archive_writer_class(
+			self.output_file_path, 
+			self.archive_time
+		)
+
+		if not (archive_writer.open()):
 			self.clean_up(1)
 
+		self.archive_writer = archive_writer
+
 	def main_work(self):
 		'''
 		This method is where the Archiver does most of its work.
 		'''
 
-		playlists = {}
-		archive = {
-			"time": time.strftime(TIME_FORMAT_STR),
-			"playlists": playlists
-		}
+		urls = [line.strip() for line in self.input_file]
 
-		while True:
-			line = self.input_file.readline()
+		# Nothing is known about the playlists that are not in the baseline 
+		# (all of them without one), so their first page is requested before 
+		# anything else to find out how big they are.
+		self.first_pages = self.probe_playlists(urls)
 
-			if not line:
+		# The playlists expected to be the cheapest are started first, so that 
+		# if the quota runs out, it runs out on the big ones and as many 
+		# playlists as possible are complete.
+		order = sorted(
+			range(len(urls)), 
+			key=lambda index: self.estimate_requests(urls[index])
+		)
 
-				if (len(archive) != 0):
-					self.no_output = False
+		# Ids of the playlists already written, a playlist that appears more 
+		# than once in the input is only written the first time.
+		written_ids: Set[str] = set()
 
-				break
+		snapshot_id = None
+
+		try:
+			# The whole snapshot is one transaction, so it is only added if 
+			# the archive is complete.
+			if (self.snapshot_store != None):
+				snapshot_id = self.snapshot_store.begin_snapshot(self.archive_time)
+
+			# Each playlist is fetched on its own worker (and walks its own 
+			# pages), but they are written in the order of the input file so 
+			# the archive stays the same no matter which fetch finishes first. 
+			# A playlist is dropped as soon as it is written so only the 
+			# playlists waiting for an earlier one stay in memory.
+			with ThreadPoolExecutor(
+				max_workers=self.max_concurrent_fetches
+			) as executor:
+
+				futures = [None]*len(urls)
 
-			url = line.strip()
+				for index in order:
+					futures[index] = executor.submit(
+						self.fetch_playlist, urls[index]
+					)
 
-			this_playlist = convert_playlist_url_to_playlist_obj(url)
+				for index in range(len(futures)):
+					this_playlist = futures[index].result()
+					futures[index] = None
 
-			if not (this_playlist):
-				continue
+					if (not this_playlist or 
+						this_playlist.get_id() in written_ids):
 
-			playlists[this_playlist.get_id()] = this_playlist.construct_json_obj()
+						continue
 
-		if not (self.no_output):
-			json.dump(archive, self.output_file, ensure_ascii=False, indent=4)
+					written_ids.add(this_playlist.get_id())
+
+					playlist_json = this_playlist.construct_json_obj()
+
+					self.archive_writer.write_playlist(playlist_json)
+
+					if (self.snapshot_store != None):
+						self.snapshot_store.add_playlist(snapshot_id, playlist_json)
+
+			self.archive_writer.finish()
+
+			if (self.snapshot_store != None):
+				self.snapshot_store.commit_snapshot()
+
+				print(f"Saved as snapshot {snapshot_id} in {self.snapshot_store_path.as_posix()}")
+
+		except BaseException:
+			# Leaves the output file and the snapshot store as they were.
+			self.archive_writer.close()
+
+			if (self.snapshot_store != None):
+				self.snapshot_store.rollback_snapshot()
+
+			# The metrics of a failed run are the ones most worth a look.
+			self.write_metrics()
+
+			raise
+
+		cache = ResponseCache.get_cache()
+
+		if (cache.enabled):
+			print(cache.get_summary())
+
+		scheduler = QuotaScheduler.get_scheduler()
+		scheduler.save_state()
+
+		print(scheduler.get_summary())
+		print(Metrics.get_metrics().get_summary())
+
+		self.write_metrics()
 
 		self.clean_up(0)
 
+	def write_metrics(self) -> None:
+		'''
+		This method writes the metrics of the run to the metrics files, if 
+		any were given.
+		'''
+
+		if (self.metrics_file_path == None and self.prometheus_file_path == None):
+			return
+
+		metrics = Metrics.get_metrics()
+		scheduler = QuotaScheduler.get_scheduler()
+
+		metrics.set_gauge("quota_used_units", scheduler.used)
+		metrics.set_gauge("quota_budget_units", scheduler.budget)
+
+		if not (metrics.write(self.metrics_file_path, self.prometheus_file_path)):
+			err_print("Could not write the metrics files.")
+
+	def probe_playlists(
+		self, 
+		urls: List[str]
+	) -> Dict[str, Union[Tuple[int, dict, Union[str, None]], None]]:
+		'''
+		This method requests the first page of every playlist of the given 
+		urls that is not in the baseline archive, at the same time. The page 
+		tells how many videos the playlist has (pageInfo.totalResults), so 
+		that it is ordered and has its quota reserved like the playlists of 
+		the baseline. The page is then used as the first page of the 
+		playlist, so it is not requested twice.
+
+		Returns:
+			The result of request_playlist_page() for the first page of these 
+			playlists, keyed by their id (None if the request failed, the 
+			reason is already printed).
+		'''
+
+		probe_urls: Dict[str, str] = {}
+
+		for url in urls:
+			playlist_id = playlist_url_verifier(url)
+
+			if (playlist_id != None and 
+				playlist_id not in self.baseline_playlists):
+
+				probe_urls.setdefault(playlist_id, url)
+
+		with ThreadPoolExecutor(
+			max_workers=self.max_concurrent_fetches
+		) as executor:
+
+			first_pages = executor.map(
+				lambda playlist_id: request_playlist_page(
+					probe_urls[playlist_id], 
+					get_playlist_params(playlist_id)
+				), 
+				probe_urls
+			)
+
+			return dict(zip(probe_urls, first_pages))
+
+	def fetch_playlist(self, url: str) -> Union[Playlist, None]:
+		'''
+		This method fetches the playlist of the given url, using the same 
+		playlist of the baseline archive (if any) to skip unchanged pages, or 
+		its first page from probe_playlists().
+		'''
+
+		playlist_id = playlist_url_verifier(url)
+
+		# The first page could not be fetched, neither can the playlist.
+		if (playlist_id in self.first_pages and 
+			self.first_pages[playlist_id] == None):
+
+			return None
+
+		return fetch_playlist_with_quota(
+			url, 
+			self.baseline_playlists.get(playlist_id), 
+			self.first_pages.get(playlist_id)
+		)
+
+	def estimate_requests(self, url: str) -> float:
+		'''
+		This method estimates the number of requests needed for the playlist 
+		of the given url, for ordering the playlists. A playlist that could 
+		not be probed is put last.
+		'''
+
+		playlist_id = playlist_url_verifier(url)
+
+		baseline = self.baseline_playlists.get(playlist_id)
+		first_page = self.first_pages.get(playlist_id)
+
+		if (baseline == None and first_page == None):
+			return math.inf
+
+		return estimate_playlist_requests(baseline, first_page)
+
 	def clean_up(self, err_code: int) -> None:
 		'''
 		This method is supposed to be called whenever the program thinks it 
-		should stop, it will close all opened file descriptors and remove the newly opened output file if there is no output from the program.
+		should stop, it will close all opened file descriptors. The output 
+		file is left untouched unless the archive was finished.
 		'''
 		self.input_file.close()
-		self.output_file.close()
+		self.archive_writer.close()
 
-		if (self.no_output and 
-			self.output_file_path.exists()):
-
-			os.remove(self.output_file_path.name)
+		if (self.snapshot_store != None):
+			self.snapshot_store.close()
 		
 		exit(err_code)
 
 # Helpful functions
 
+def read_archive(archive_file_path: pathlib.Path) -> Union[Tuple[str, Dict[str, dict]], None]:
+	'''
+	This function reads a whole archive (in either format), checking that it 
+	is of correct format. The pages of a playlist that are not of correct 
+	format are left out, so that the playlist is fetched in full.
+
+	Returns:
+		A tuple of (time of the archive, playlists keyed by their id, in 
+		order).
+
+		None if the archive cannot be opened or is not valid, the reason is 
+		already printed.
+	'''
+
+	file = input_file_opening(archive_file_path, binary=True)
+
+	if (file == PlaceHolder.get_place_holder()):
+		return None
+
+	playlists: Dict[str, dict] = {}
+	is_valid = True
+
+	try:
+		reader = create_archive_reader(file)
+
+		for playlist_id, playlist in reader.iterate():
+
+			# The pages are only a shortcut, a playlist whose pages are not 
+			# right (like a hand edited archive) is simply fetched in full.
+			if (isinstance(playlist, dict) and "pages" in playlist):
+				error = find_pages_error(playlist["pages"], make_path(make_path("playlists", playlist_id), "pages"))
+
+				if (error != None):
+					err_print(f"The pages of the playlist {playlist_id} in {archive_file_path.as_posix()} are not of correct format ({error}), it will be fetched in full.")
+
+					del playlist["pages"]
+
+			if not (check_format_of_playlist(playlist)):
+				is_valid = False
+				break
+
+			playlists[playlist_id] = playlist
+
+		if (is_valid):
+			is_valid = (
+				isinstance(reader.time, str) and 
+				check_time_format(reader.time)
+			)
+
+	except ValueError:
+		is_valid = False
+
+	file.close()
+
+	if not (is_valid):
+		err_print(f"File {archive_file_path.as_posix()} is not of correct format or is corrupted, please check it again.")
+
+		return None
+
+	return reader.time, playlists
+
+def fetch_playlist_with_quota(
+	url: str, 
+	baseline: Union[dict, None] = None, 
+	first_page: Union[Tuple[int, dict, Union[str, None]], None] = None
+) -> Union[Playlist, None]:
+	'''
+	This function fetches the playlist of the given url (see 
+	convert_playlist_url_to_playlist_obj()) once the quota it is expected to 
+	need is reserved, and records it as a span of the metrics.
+
+	Params:
+		url: the url to the playlist.
+		baseline: the JSON representation of the same playlist from the last 
+		archive, if there is one.
+		first_page: the first page of the playlist if it was already 
+		requested (see Archiver.probe_playlists()), its quota is already 
+		used.
+
+	Returns:
+		The playlist, None if it could not be fetched (the reason is already 
+		printed).
+	'''
+
+	scheduler = QuotaScheduler.get_scheduler()
+
+	estimated_requests = estimate_playlist_requests(baseline, first_page)
+
+	if (first_page != None):
+		estimated_requests -= 1
+
+	if not (scheduler.begin_playlist(estimated_requests)):
+		err_print(f"Not enough quota left to fetch the playlist ({url}), skipping it.")
+		return None
+
+	metrics = Metrics.get_metrics()
+
+	try:
+		# The requests, pages and bytes of the playlist are added to the 
+		# span as they are made (see request_playlist_page()).
+		with metrics.span("playlist", playlist=playlist_url_verifier(url) or url):
+			this_playlist = convert_playlist_url_to_playlist_obj(url, baseline, first_page)
+
+			if (this_playlist != None):
+				metrics.add_to_span("videos", len(this_playlist.video_ids))
+
+		metrics.increment("playlists_total", result="fetched" if this_playlist else "failed")
+
+		return this_playlist
+
+	finally:
+		scheduler.end_playlist()
+
+def estimate_playlist_requests(
+	baseline: Union[dict, None], 
+	first_page: Union[Tuple[int, dict, Union[str, None]], None] = None
+) -> int:
+	'''
+	This function estimates the number of requests needed to fetch a 
+	playlist, which is also its quota cost.
+
+	Params:
+		baseline: the JSON representation of the playlist from a previous 
+		archive, None if there is none.
+		first_page: the first page of the playlist if it was already 
+		requested, as returned by request_playlist_page().
+
+	Returns:
+		The number of pages of the baseline (at least 1). Without a baseline, 
+		the number of pages the first page says the playlist has, or 1 if 
+		nothing is known about the playlist yet.
+	'''
+
+	if (baseline == None):
+		total_results = None
+
+		if (first_page != None):
+			page_info = first_page[1].get("pageInfo")
+
+			if (isinstance(page_info, dict)):
+				total_results = page_info.get("totalResults")
+
+		if (type(total_results) is not int):
+			return 1
+
+		return max(1, math.ceil(total_results/50))
+
+	if ("pages" in baseline):
+		return max(1, len(baseline["pages"]))
+
+	return max(1, math.ceil(len(baseline["videos"])/50))
+
 def playlist_url_verifier(url: str) -> Union[str,None]:
 	'''
 	This function uses regular expression to verify whether the given URL is a 
@@ -199,30 +649,346 @@ def playlist_url_verifier(url: str) -> Union[str,None]:
 	# Capture group 1 is the id of the playlist.
 	return matched_id.group(1)
 
-def convert_playlist_url_to_playlist_obj(url: str) -> Union[Playlist,None]:
+def request_playlist_page(
+	url: str, 
+	params: Dict[str, str], 
+	etag: Union[str, None] = None
+) -> Union[Tuple[int, dict, Union[str, None]], None]:
 	'''
-	This function takes in an url to a Youtube playlist and attempt to convert 
-	it to a playlist object.
+	This function requests one page of a playlist from the API.
+
+	The response cache is consulted first, a page found there is returned 
+	as if it was just fetched. Every page that is fetched is saved to it.
+
+	A request that is actually sent is charged against the quota and rate 
+	limited by the QuotaScheduler, and has to get a slot from the 
+	ConcurrencyController. If it is throttled, fails with a server error or 
+	times out, it is retried with exponential backoff, so the playlist 
+	carries on from this page instead of being dropped.
 
 	Params:
-		url: the url to the playlist.
+		url: the url to the playlist, only used for error messages.
+		params: the query parameters of the request.
+		etag: the ETag of the same page from the last archive, if there is 
+		one the request is made conditional (If-None-Match) and the API 
+		answers with 304 if the page has not changed since.
 
 	Returns:
-		A playlist object representing the playlist.
+		A tuple of (status code, JSON body, ETag of the page). The JSON body 
+		is an empty dictionary for a 304.
 
-		None if the url is not valid.
+		None if the request failed, the reason is already printed.
+	'''
+
+	cache = ResponseCache.get_cache()
+	transport = Transport.get_transport()
+
+	cache_key = (
+		params["playlistId"], 
+		params.get("pageToken", ""), 
+		params["fields"]
+	)
+
+	# Pages of another API (like the mock API server) are not the pages of 
+	# Youtube, the keys of Youtube pages are left as they were so that the 
+	# cache stays valid.
+	if (transport.api_url != API_URL):
+		cache_key += (transport.api_url,)
+
+	metrics = Metrics.get_metrics()
+
+	cached = cache.get(cache_key)
+
+	if (cached != None):
+		metrics.increment("cache_hits_total")
+		metrics.add_to_span("cache_hits")
+
+		return 200, cached[0], cached[1]
+
+	headers = None
+
+	if (etag != None):
+		headers = {"If-None-Match": etag}
+
+	scheduler = QuotaScheduler.get_scheduler()
+	controller = ConcurrencyController.get_controller()
+
+	attempt = 0
+
+	while True:
+
+		if not (scheduler.acquire()):
+
+			# Stopping is not a failure of the playlist.
+			if not (scheduler.stopped.is_set()):
+				err_print(f"The quota budget is used up, could not finish the playlist ({url}).")
+
+			return None
+
+		metrics.increment("quota_units_total", QUOTA_COST_PER_REQUEST)
+
+		controller.acquire()
+		start = time.monotonic()
+
+		api_call = None
+		result_json = None
+		error = None
+		retry_reason = None
+
+		# The slot is given back whatever happens, an unexpected exception 
+		# (which goes on up) counting as a failure.
+		succeeded = False
+
+		try:
+			try:
+				api_call = transport.get(transport.api_url, params=params, headers=headers)
+
+				# A 304 has no body.
+				if (api_call.status_code == 304):
+					result_json = {}
+
+				else:
+					result_json = api_call.json()
+
+			except (requests.RequestException, ValueError) as exception:
+				error = str(exception)
+
+			retry_reason = get_retry_reason(api_call, result_json, error)
+			succeeded = (retry_reason == None)
+
+		finally:
+			latency = time.monotonic() - start
+
+			controller.release(succeeded, latency)
+
+		record_request(metrics, api_call, latency)
+
+		if (retry_reason == None):
+			break
+
+		metrics.increment("retries_total")
+		metrics.add_to_span("retries")
+
+		if (attempt == MAX_RETRIES):
+			err_print(f"Could not fetch the playlist ({url}) after {MAX_RETRIES} retries: {retry_reason}")
+			return None
+
+		delay = get_retry_delay(attempt, api_call)
+
+		err_print(f"Request for the playlist ({url}) failed ({retry_reason}), retrying in {delay:.1f} seconds.")
+
+		scheduler.wait(delay)
+		attempt += 1
+
+	if (result_json == None):
+		err_print(f"Could not fetch the playlist ({url}): {error}")
+		return None
+
+	if (api_call.status_code == 304):
+		return 304, {}, etag
+
+	# Error in response means the id is not valid.
+	if ("error" in result_json):
+
+		code = result_json["error"]["code"]
+
+		if (code == 400):
+			err_print("Your API key is expired, please get a new one.")
+
+		elif (code == 404):
+			err_print(f"The url for the playlist ({url}) is invalid, please recheck it.")
+
+		return None
+
+	new_etag = api_call.headers.get("ETag", result_json.get("etag"))
+
+	cache.put(cache_key, result_json, new_etag)
+
+	return api_call.status_code, result_json, new_etag
+
+def record_request(
+	metrics: Metrics, 
+	api_call: Union[requests.Response, None], 
+	latency: float
+) -> None:
+	'''
+	This function records a request that was sent in the metrics, and adds 
+	it to the span of the playlist being fetched.
+
+	Params:
+		metrics: the metrics to record in.
+		api_call: the response, None if there was none (like a timeout).
+		latency: how long the request took, in seconds.
+	'''
+
+	status = str(api_call.status_code) if (api_call != None) else "error"
+
+	# What went over the wire, which is the compressed size if the response 
+	# was gzipped.
+	size = 0
+
+	if (api_call != None):
+		size = int(api_call.headers.get("Content-Length", len(api_call.content)))
+
+	metrics.observe("request_seconds", latency)
+	metrics.increment("requests_total", status=status)
+	metrics.increment("downloaded_bytes_total", size)
+
+	metrics.add_to_span("requests")
+	metrics.add_to_span("bytes", size)
+
+def get_retry_reason(
+	api_call: Union[requests.Response, None], 
+	result_json: Union[dict, None], 
+	error: Union[str, None]
+) -> Union[str, None]:
+	'''
+	This function decides whether a request should be retried, that is 
+	whether it failed in a way that may go away by itself.
+
+	Params:
+		api_call: the response, None if there was no response at all.
+		result_json: the JSON body of the response, None if it is not JSON.
+		error: the error raised while making the request, if any.
+
+	Returns:
+		The reason the request should be retried (for messages), None if it 
+		should not be.
+	'''
+
+	# No response at all, the connection failed or timed out.
+	if (api_call == None):
+		return error
+
+	status = api_call.status_code
+
+	if (status == 429 or status >= 500):
+		return f"HTTP {status}"
+
+	if (result_json == None):
+
+		# A successful response that is cut off or garbled.
+		if (status < 400):
+			return error
+
+		return None
+
+	if ("error" not in result_json):
+		return None
+
+	reasons = [
+		reason.get("reason") 
+		for reason in result_json["error"].get("errors", [])
+	]
+
+	for reason in reasons:
+
+		if (reason in RETRYABLE_ERROR_REASONS):
+			return reason
+
+	return None
+
+def get_retry_delay(
+	attempt: int, 
+	api_call: Union[requests.Response, None]
+) -> float:
+	'''
+	This function calculates how long to wait before retrying a request.
+
+	Params:
+		attempt: the number of retries done so far.
+		api_call: the response of the failed request, if there was one.
+
+	Returns:
+		The number of seconds given by the Retry-After header of the response 
+		if it has one, otherwise a random number between 0 and 
+		RETRY_BASE_DELAY*2^attempt (capped by RETRY_MAX_DELAY). The randomness 
+		(jitter) keeps the workers that failed at the same time from retrying 
+		at the same time.
+	'''
+
+	if (api_call != None):
+
+		try:
+			return min(RETRY_MAX_DELAY, float(api_call.headers["Retry-After"]))
+
+		except (KeyError, ValueError):
+			pass
+
+	return random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY*2**attempt))
+
+def convert_items_to_videos(items: List[dict]) -> List[Video]:
+	'''
+	This function converts the items of a playlistItems response into Video 
+	objects.
+
+	Params:
+		The "items" list of the response.
+
+	Returns:
+		A list of Video objects, in the same order as the items.
+	'''
+
+	videos: List[Video] = []
+
+	for video in items:
+		current_video = video["snippet"] 
+		
+		if ("videoOwnerChannelTitle" not in current_video):
+			channel = UNKNOWN_CHANNEL
+
+		else:
+			channel = current_video["videoOwnerChannelTitle"]
+		
+		videos.append(Video(
+			current_video["title"], 
+			channel,
+			current_video["resourceId"]["videoId"]
+		))
+
+	return videos
+
+def get_playlist_params(playlist_id: str) -> Dict[str, str]:
+	'''
+	This function gives the query parameters to request the first page of a 
+	playlist, the other pages also need their pageToken.
 	'''
 
 	# Visit https://developers.google.com/youtube/v3/docs/playlistItems to 
 	# understand what are the parameters.
 
-	PARAMS: Dict[str,str] = {
+	return {
 		"part": "snippet",
 		"maxResults": "50",
 		"key": f"{API_KEY}",
-		"fields": "nextPageToken,items(snippet(title,videoOwnerChannelTitle,resourceId/videoId))"
+		"fields": "etag,nextPageToken,pageInfo/totalResults,items(snippet(title,videoOwnerChannelTitle,resourceId/videoId))",
+		"playlistId": playlist_id
 	}
-	
+
+def convert_playlist_url_to_playlist_obj(
+	url: str, 
+	baseline: Union[dict, None] = None, 
+	first_page: Union[Tuple[int, dict, Union[str, None]], None] = None
+) -> Union[Playlist,None]:
+	'''
+	This function takes in an url to a Youtube playlist and attempt to convert 
+	it to a playlist object.
+
+	Params:
+		url: the url to the playlist.
+		baseline: the JSON representation of the same playlist from a 
+		previous archive. If it has the "pages" attribute, every page is 
+		requested conditionally and the pages that did not change are taken 
+		from the baseline instead.
+		first_page: the first page of the playlist if it was already 
+		requested, as returned by request_playlist_page().
+
+	Returns:
+		A playlist object representing the playlist.
+
+		None if the url is not valid.
+	'''
+
 	# Check if the url is a valid one using regex.
 	playlist_id = playlist_url_verifier(url)
 
@@ -232,7 +998,19 @@ def convert_playlist_url_to_playlist_obj(url: str) -> Union[Playlist,None]:
 
 	this_playlist = Playlist(playlist_id) 
 
-	PARAMS["playlistId"] = playlist_id
+	PARAMS: Dict[str,str] = get_playlist_params(playlist_id)
+
+	# The pages of the baseline, keyed by the page token used to get them 
+	# ("" for the first page).
+	baseline_pages: Dict[str, dict] = {}
+
+	if (baseline != None):
+		for page in baseline.get("pages", []):
+			baseline_pages[page["page_token"]] = page
+
+	# One entry per page, None means the page did not change (304) and its 
+	# videos still have to be taken from the baseline.
+	page_videos: List[Union[List[Video], None]] = []
 
 	# Max size is 50 entries per call so we need to call it until we exhaust 
 	# the playlist.
@@ -241,68 +1019,258 @@ def convert_playlist_url_to_playlist_obj(url: str) -> Union[Playlist,None]:
 	# N_i denotes the size of playlist i.
 	# Assuming we have n playlists.
 
+	page_token = ""
+
 	while True:
-		api_call = requests.get(API_URL, params=PARAMS)
-		result_json = api_call.json()
 
-		# Error in response means the id is not valid.
-		if ("error" in result_json):
+		if (page_token):
+			PARAMS["pageToken"] = page_token
 
-			code = result_json["error"]["code"]
+		baseline_page = baseline_pages.get(page_token)
 
-			if (code == 400):
-				err_print("Your API key is expired, please get a new one.")
+		if (page_token == "" and first_page != None):
+			result = first_page
 
-			elif (code == 404):
-				err_print(f"The url for the playlist ({url}) is invalid, please recheck it.")
+		else:
+			result = request_playlist_page(
+				url, 
+				PARAMS, 
+				baseline_page["etag"] if baseline_page else None
+			)
 
+		if (result == None):
 			return None
 
-		video_information_list = result_json["items"]
+		status, result_json, etag = result
 
-		for video in video_information_list:
-			current_video = video["snippet"] 
-			
-			if ("videoOwnerChannelTitle" not in current_video):
-				channel = "Unknown Channel"
+		Metrics.get_metrics().add_to_span("unchanged_pages" if (status == 304) else "pages")
 
-			else:
-				channel = current_video["videoOwnerChannelTitle"]
-			
-			video_object = Video(
-				current_video["title"], 
-				channel,
-				current_video["resourceId"]["videoId"]
-				)
+		if (status == 304):
+			# A 304 has no body, but since the page is the same as last time 
+			# so is its next page token.
+			this_playlist.add_page(dict(baseline_page))
+			page_videos.append(None)
 
-			this_playlist.add_video(video_object)
+			next_page_token = baseline_page["next_page_token"]
+
+		else:
+			videos = convert_items_to_videos(result_json["items"])
+			next_page_token = result_json.get("nextPageToken")
+
+			this_playlist.add_page({
+				"page_token": page_token,
+				"next_page_token": next_page_token,
+				"etag": etag,
+				"count": len(videos)
+			})
+			page_videos.append(videos)
 
 		# Sign of playlist exhausted.
-		if ("nextPageToken" not in result_json):
+		if (next_page_token == None):
 			break
 
-		PARAMS["pageToken"] = result_json["nextPageToken"]
+		page_token = next_page_token
+
+	if not (fill_unchanged_pages(url, PARAMS, page_videos, this_playlist, baseline)):
+		return None
+
+	for videos in page_videos:
+		for video_object in videos:
+			this_playlist.add_video(video_object)
 
 	return this_playlist
 
+def fill_unchanged_pages(
+	url: str, 
+	params: Dict[str, str], 
+	page_videos: List[Union[List[Video], None]], 
+	this_playlist: Playlist, 
+	baseline: Union[dict, None]
+) -> bool:
+	'''
+	This function replaces the pages that came back as 304 (the None entries 
+	of page_videos) with their videos.
+
+	If every page was a 304, the whole playlist did not change and the 
+	baseline videos are carried over as they are. Otherwise an unchanged 
+	page is sliced out of the baseline videos using the video count of the 
+	pages before it. That only works if the baseline playlist has no video 
+	that appears twice (the videos attribute is keyed by id so duplicates are 
+	merged), if it does, the unchanged pages are requested again without the 
+	ETag.
+
+	Params:
+		url: the url to the playlist, only used for error messages.
+		params: the query parameters used for the playlist.
+		page_videos: the videos of each page, modified in place.
+		this_playlist: the playlist being built, its pages are in the same 
+		order as page_videos.
+		baseline: the JSON representation of the playlist from the previous 
+		archive.
+
+	Returns:
+		True if all pages are filled, False if a request failed.
+	'''
+
+	if (None not in page_videos):
+		return True
+
+	baseline_videos = [
+		Video.initiate_video_from_json(video) 
+		for video in baseline["videos"].values()
+	]
+
+	if (all(videos == None for videos in page_videos)):
+		page_videos[:] = [baseline_videos]
+		return True
+
+	# Where each page of the baseline starts within baseline_videos.
+	baseline_offsets: Dict[str, int] = {}
+	offset = 0
+
+	for page in baseline["pages"]:
+		baseline_offsets[page["page_token"]] = offset
+		offset += page["count"]
+
+	can_slice = (offset == len(baseline_videos))
+
+	for index, page in enumerate(this_playlist.pages):
+
+		if (page_videos[index] != None):
+			continue
+
+		if (can_slice):
+			start = baseline_offsets[page["page_token"]]
+			page_videos[index] = baseline_videos[start:start + page["count"]]
+			continue
+
+		page_params = dict(params)
+		page_params.pop("pageToken", None)
+
+		if (page["page_token"]):
+			page_params["pageToken"] = page["page_token"]
+
+		result = request_playlist_page(url, page_params)
+
+		if (result == None):
+			return False
+
+		page_videos[index] = convert_items_to_videos(result[1]["items"])
+
+	return True
+
 def main() -> None:
-	
-	if (len(sys.argv) != 3):
-
-		err_print(
-			"Usage: python3 archiver.py <input_file> <output_file>",
-			"<input_file> should contain a valid <playlist_link> per line.",
-			"<playlist_link> is in the form of \"https://www.youtube.com/playlist?list=<playlist_id>\"",
-			"Also works for a video that is being watched from a playlist (ie, has a link of youtube.com/watch?v=<id>&list=<id>&ab_channel=<channel>",
-			sep="\n\n"
+
+	parser = argparse.ArgumentParser(
+		description="Archive one or more Youtube playlists into a JSON file.",
+		epilog=(
+			"<input_file> should contain a valid <playlist_link> per line. "
+			"<playlist_link> is in the form of "
+			"\"https://www.youtube.com/playlist?list=<playlist_id>\". "
+			"Also works for a video that is being watched from a playlist "
+			"(ie, has a link of youtube.com/watch?v=<id>&list=<id>&ab_channel=<channel>)"
 		)
+	)
+
+	parser.add_argument("input_file")
+	parser.add_argument("output_file")
+	parser.add_argument(
+		"-j", "--jobs",
+		type=int,
+		default=MAX_CONCURRENT_FETCHES,
+		help=f"number of playlists fetched at the same time (default: {MAX_CONCURRENT_FETCHES})"
+	)
+
+	parser.add_argument(
+		"-b", "--baseline",
+		default=None,
+		help="a previous archive, playlists in it are only re-downloaded where they changed"
+	)
+
+	parser.add_argument(
+		"--no-cache",
+		action="store_true",
+		help="do not use the on-disk cache of fetched pages"
+	)
+
+	parser.add_argument(
+		"--quota",
+		type=int,
+		default=QUOTA_DAILY_BUDGET,
+		help=f"quota units that can be used per day (default: {QUOTA_DAILY_BUDGET})"
+	)
+
+	parser.add_argument(
+		"--rate",
+		type=float,
+		default=REQUESTS_PER_SECOND,
+		help=f"maximum number of requests sent per second (default: {REQUESTS_PER_SECOND})"
+	)
+
+	parser.add_argument(
+		"-f", "--format",
+		choices=["json", "binary"],
+		default="json",
+		help="format of the archive written (default: json)"
+	)
+
+	parser.add_argument(
+		"--store",
+		default=None,
+		help="a snapshot store (SQLite database) the archive is also added to, it is created if needed"
+	)
+
+	parser.add_argument(
+		"--api-url",
+		default=API_URL,
+		help="url of the playlistItems endpoint, to use another server like benchmarks/mock_api.py (default: the Youtube API)"
+	)
+
+	parser.add_argument(
+		"--metrics",
+		default=None,
+		help="a file the metrics of the run are written to, as JSON"
+	)
+
+	parser.add_argument(
+		"--prometheus",
+		default=None,
+		help="a file the metrics of the run are written to, in the Prometheus text format (for the textfile collector of node_exporter)"
+	)
+
+	args = parser.parse_args()
+
+	if (args.jobs < 1):
+		err_print("The number of jobs must be at least 1.")
 
 		exit(1)
 
-	output_file_path = sys.argv[2]
-	input_file_path = sys.argv[1]
+	if (args.rate <= 0):
+		err_print("The request rate must be greater than 0.")
+
+		exit(1)
 
-	archiver = Archiver(input_file_path, output_file_path)
+	scheduler = QuotaScheduler.get_scheduler()
+	scheduler.set_budget(args.quota)
+	scheduler.set_rate(args.rate)
+
+	Transport.get_transport().set_api_url(args.api_url)
+
+	# The quota of another API is not the quota of Youtube.
+	if (args.api_url != API_URL):
+		scheduler.set_persistent(False)
+
+	archiver = Archiver(
+		args.input_file, 
+		args.output_file, 
+		args.jobs, 
+		args.baseline, 
+		not args.no_cache, 
+		args.format, 
+		args.store,
+		args.metrics,
+		args.prometheus
+	)
 
 	archiver.main_work()
 
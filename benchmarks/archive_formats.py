@@ -0,0 +1,89 @@
+'''
+archive_formats.py: compares the JSON and the binary archive formats, in 
+file size, time to load the whole archive and time to read a single 
+playlist.
+
+Usage: python3 archive_formats.py [<total_videos> ...]
+'''
+
+# Python
+import sys
+import json
+import time
+import pathlib
+import tempfile
+from typing import Callable
+
+# Internal
+from synthetic import make_archive
+from ArchiveWriter import ArchiveWriter
+from ArchiveReader import ArchiveReader
+from BinaryArchive import BinaryArchiveWriter, BinaryArchiveReader
+
+def write_archive(writer_class, path: pathlib.Path, archive: dict) -> None:
+    writer = writer_class(path, archive["time"])
+    writer.open()
+
+    for playlist in archive["playlists"].values():
+        writer.write_playlist(playlist)
+
+    writer.finish()
+    writer.close()
+
+def time_it(function: Callable) -> float:
+    start = time.perf_counter()
+    function()
+
+    return time.perf_counter() - start
+
+def main() -> None:
+    sizes = [int(size) for size in sys.argv[1:]] or [10000, 100000, 1000000]
+
+    print(f"{'videos':>10} {'format':>7} {'size (KiB)':>12} {'load (s)':>10} {'1 playlist (s)':>15}")
+
+    with tempfile.TemporaryDirectory() as directory:
+
+        for total_videos in sizes:
+            archive = make_archive(total_videos)
+            last_id = list(archive["playlists"])[-1]
+
+            json_path = pathlib.Path(directory) / "archive.json"
+            binary_path = pathlib.Path(directory) / "archive.bin"
+
+            write_archive(ArchiveWriter, json_path, archive)
+            write_archive(BinaryArchiveWriter, binary_path, archive)
+
+            del archive
+
+            def load_json():
+                with json_path.open("r", encoding="utf-8") as file:
+                    json.load(file)
+
+            def load_binary():
+                with binary_path.open("rb") as file:
+                    dict(BinaryArchiveReader(file).iterate())
+
+            # Without an index, the JSON archive has to be gone through up to 
+            # the playlist.
+            def one_json():
+                with json_path.open("rb") as file:
+                    for playlist_id, playlist in ArchiveReader(file).iterate():
+                        if (playlist_id == last_id):
+                            break
+
+            def one_binary():
+                with binary_path.open("rb") as file:
+                    BinaryArchiveReader(file).read_playlist(last_id)
+
+            for name, path, load, one in (
+                ("json", json_path, load_json, one_json), 
+                ("binary", binary_path, load_binary, one_binary)
+            ):
+                print(
+                    f"{total_videos:>10} {name:>7} " 
+                    f"{path.stat().st_size//1024:>12} " 
+                    f"{time_it(load):>10.3f} {time_it(one):>15.4f}"
+                )
+
+if (__name__ == "__main__"):
+    main()
@@ -0,0 +1,510 @@
+'''
+mock_api.py: a local stand-in for the playlistItems endpoint of the Youtube
+Data API, serving made up playlists (see synthetic.py), so that the archiver
+can be load tested without using any quota.
+
+Usage: python3 mock_api.py [--port <port>] [-v <total_videos>]
+                           [-p <playlist_size>] [--seed <seed>]
+                           [--deleted <fraction>] [--latency <seconds>]
+                           [--jitter <seconds>] [--error-rate <fraction>]
+                           [--quota <requests>] [--input-file <file>]
+
+Then run the archiver against it with
+    python3 archiver.py --no-cache --api-url http://127.0.0.1:<port>/youtube/v3/playlistItems <input_file> <output_file>
+
+--input-file writes the links of the playlists served, to use as the input
+file of the archiver.
+
+Like the real API, the server:
+    - pages the videos (maxResults, 5 by default and 50 at most) with
+    nextPageToken and pageToken.
+    - only returns the fields asked for with fields (partial responses).
+    - gives every page an ETag and answers 304 to If-None-Match when it
+    matches.
+    - gzips its responses when asked to.
+    - answers errors with the same payload as the real API: 400 for a
+    missing key or a bad parameter, 403 once --quota requests were answered,
+    404 for a playlist that does not exist, and 500 for --error-rate of the
+    requests.
+'''
+
+# Python
+import sys
+import json
+import gzip
+import time
+import random
+import signal
+import base64
+import hashlib
+import argparse
+import threading
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Tuple, Union
+
+# Internal
+from synthetic import iterate_playlists
+from Video import UNKNOWN_CHANNEL
+from configuration import YOUTUBE_PLAYLIST_PREFIX
+
+ENDPOINT_PATH: str = "/youtube/v3/playlistItems"
+
+DEFAULT_MAX_RESULTS: int = 5
+MAX_MAX_RESULTS: int = 50
+
+# The error payload of the real API (see
+# https://developers.google.com/youtube/v3/docs/errors) for every error the
+# server gives: code, reason, message.
+ERRORS: Dict[str, Tuple[int, str, str]] = {
+    "keyInvalid": (400, "badRequest", "API key not valid. Please pass a valid API key."),
+    "invalidPageToken": (400, "invalidPageToken", "The request specifies an invalid page token."),
+    "invalidParameter": (400, "invalidParameter", "Invalid value for a parameter."),
+    "quotaExceeded": (403, "quotaExceeded", "The request cannot be completed because you have exceeded your quota."),
+    "playlistNotFound": (404, "playlistNotFound", "The playlist identified with the request's playlistId parameter cannot be found."),
+    "backendError": (500, "backendError", "Backend Error")
+}
+
+def parse_fields(fields: str) -> dict:
+    '''
+    This function parses the fields parameter of a request, for example
+    "etag,items(snippet(title,resourceId/videoId))".
+
+    Returns:
+        The fields asked for, as a dictionary of field name -> True (the
+        whole field) or the same kind of dictionary (only these subfields).
+
+    Raises:
+        ValueError if the fields are not of correct syntax.
+    '''
+
+    selection, position = parse_field_list(fields, 0)
+
+    if (position != len(fields)):
+        raise ValueError(f"Unexpected {fields[position]!r} at {position}")
+
+    return selection
+
+def parse_field_list(fields: str, position: int) -> Tuple[dict, int]:
+    '''
+    This function parses fields separated by commas, from position up to
+    the end or a closing bracket.
+
+    Returns:
+        (the fields, see parse_fields(), the position after them)
+    '''
+
+    selection: dict = {}
+
+    while True:
+        end = position
+
+        while (end < len(fields) and fields[end] not in ",()"):
+            end += 1
+
+        path = fields[position:end].split("/")
+
+        if ("" in path):
+            raise ValueError(f"Empty field name at {position}")
+
+        position = end
+        subselection: Union[dict, bool] = True
+
+        if (position < len(fields) and fields[position] == "("):
+            subselection, position = parse_field_list(fields, position + 1)
+
+            if (position >= len(fields) or fields[position] != ")"):
+                raise ValueError("Unclosed bracket")
+
+            position += 1
+
+        # a/b(c) is a(b(c)).
+        for name in reversed(path[1:]):
+            subselection = {name: subselection}
+
+        merge_selection(selection, path[0], subselection)
+
+        if (position < len(fields) and fields[position] == ","):
+            position += 1
+            continue
+
+        return selection, position
+
+def merge_selection(selection: dict, name: str, subselection: Union[dict, bool]) -> None:
+
+    if (selection.get(name) == True or subselection == True):
+        selection[name] = True
+
+    elif (name in selection):
+        for subname, value in subselection.items():
+            merge_selection(selection[name], subname, value)
+
+    else:
+        selection[name] = subselection
+
+def apply_fields(value: Any, selection: Union[dict, bool]) -> Any:
+    '''
+    This function keeps only the given fields (see parse_fields()) of a
+    resource, the fields of lists apply to each of their items.
+    '''
+
+    if (selection == True):
+        return value
+
+    if (isinstance(value, list)):
+        return [apply_fields(item, selection) for item in value]
+
+    if (isinstance(value, dict)):
+        return {
+            name: apply_fields(value[name], subselection)
+            for name, subselection in selection.items() if (name in value)
+        }
+
+    return value
+
+def make_etag(data: str) -> str:
+    return '"' + hashlib.sha1(data.encode("utf-8")).hexdigest() + '"'
+
+def make_page_token(offset: int) -> str:
+    return base64.urlsafe_b64encode(f"offset:{offset}".encode("ascii")).decode("ascii")
+
+def read_page_token(page_token: str) -> int:
+    '''
+    Returns:
+        The offset the page token stands for.
+
+    Raises:
+        ValueError if it is not a page token made by make_page_token().
+    '''
+
+    prefix, offset = base64.urlsafe_b64decode(page_token.encode("ascii")).decode("ascii").split(":")
+
+    if (prefix != "offset" or int(offset) < 0):
+        raise ValueError(f"Invalid page token {page_token}")
+
+    return int(offset)
+
+def make_playlist_item(playlist_id: str, position: int, video: dict) -> dict:
+    '''
+    This function turns a video (see README) into a playlistItem resource of
+    the API. Like the real API, a deleted video has no owner channel.
+    '''
+
+    snippet = {
+        "publishedAt": "2023-01-01T00:00:00Z",
+        "channelId": "UCmockplaylistowner",
+        "title": video["name"],
+        "description": "",
+        "channelTitle": "Mock playlist owner",
+        "playlistId": playlist_id,
+        "position": position,
+        "resourceId": {"kind": "youtube#video", "videoId": video["id"]}
+    }
+
+    if (video["channel"] != UNKNOWN_CHANNEL):
+        snippet["videoOwnerChannelTitle"] = video["channel"]
+        snippet["videoOwnerChannelId"] = "UC" + hashlib.sha1(video["channel"].encode("utf-8")).hexdigest()[:22]
+
+    return {
+        "kind": "youtube#playlistItem",
+        "etag": make_etag(playlist_id + video["id"]),
+        "id": base64.urlsafe_b64encode(f"{playlist_id}.{video['id']}".encode("utf-8")).decode("ascii"),
+        "snippet": snippet
+    }
+
+
+class MockAPI:
+    '''
+    This class holds the made up playlists and answers the requests to the
+    endpoint (see handle_request()), it is shared by the threads of the
+    server.
+    '''
+
+    def __init__(self, arguments: argparse.Namespace):
+        rng = random.Random(arguments.seed)
+
+        # Playlist id -> videos, in order.
+        self.playlists: Dict[str, List[dict]] = {}
+
+        for playlist in iterate_playlists(arguments.videos, arguments.playlist_size, arguments.seed):
+            videos = list(playlist["videos"].values())
+
+            for video in videos:
+
+                if (rng.random() < arguments.deleted):
+                    video["name"] = "Deleted video"
+                    video["channel"] = UNKNOWN_CHANNEL
+
+            self.playlists[playlist["id"]] = videos
+
+        self.latency: float = arguments.latency
+        self.jitter: float = arguments.jitter
+        self.error_rate: float = arguments.error_rate
+        self.quota: Union[int, None] = arguments.quota
+
+        self.rng: random.Random = random.Random(arguments.seed)
+
+        self.lock = threading.Lock()
+
+        # Status code -> number of responses.
+        self.responses: Dict[int, int] = {}
+
+    def count_response(self, status: int) -> None:
+
+        with self.lock:
+            self.responses[status] = self.responses.get(status, 0) + 1
+
+    def make_error(self, error: str) -> Tuple[int, dict]:
+        code, reason, message = ERRORS[error]
+
+        return code, {
+            "error": {
+                "code": code,
+                "message": message,
+                "errors": [{"message": message, "domain": "youtube.api", "reason": reason}]
+            }
+        }
+
+    def handle_request(
+        self,
+        query: Dict[str, str],
+        etag: Union[str, None]
+    ) -> Tuple[int, Union[dict, None], Union[str, None]]:
+        '''
+        This method answers a request to the endpoint.
+
+        Params:
+            query: the query parameters of the request.
+            etag: the If-None-Match header of the request, if any.
+
+        Returns:
+            (status code, JSON body or None for a 304, ETag of the page or
+            None for an error)
+        '''
+
+        with self.lock:
+            delay = max(0.0, self.latency + self.rng.uniform(-self.jitter, self.jitter))
+            failed = (self.rng.random() < self.error_rate)
+
+            over_quota = (self.quota != None and self.quota <= 0)
+
+            if (self.quota != None and not over_quota):
+                self.quota -= 1
+
+        time.sleep(delay)
+
+        if not (query.get("key")):
+            return self.make_error("keyInvalid") + (None,)
+
+        if (over_quota):
+            return self.make_error("quotaExceeded") + (None,)
+
+        if (failed):
+            return self.make_error("backendError") + (None,)
+
+        playlist_id = query.get("playlistId", "")
+
+        if (playlist_id not in self.playlists):
+            return self.make_error("playlistNotFound") + (None,)
+
+        try:
+            max_results = int(query.get("maxResults", DEFAULT_MAX_RESULTS))
+            selection = parse_fields(query["fields"]) if (query.get("fields")) else True
+
+        except ValueError:
+            return self.make_error("invalidParameter") + (None,)
+
+        if not (0 <= max_results <= MAX_MAX_RESULTS):
+            return self.make_error("invalidParameter") + (None,)
+
+        videos = self.playlists[playlist_id]
+
+        try:
+            offset = read_page_token(query["pageToken"]) if (query.get("pageToken")) else 0
+
+        except (ValueError, UnicodeDecodeError):
+            return self.make_error("invalidPageToken") + (None,)
+
+        if (offset > len(videos)):
+            return self.make_error("invalidPageToken") + (None,)
+
+        page = videos[offset:offset + max_results]
+
+        response = {
+            "kind": "youtube#playlistItemListResponse",
+            "items": [
+                make_playlist_item(playlist_id, offset + index, video)
+                for index, video in enumerate(page)
+            ],
+            "pageInfo": {"totalResults": len(videos), "resultsPerPage": max_results}
+        }
+
+        if (offset + max_results < len(videos)):
+            response["nextPageToken"] = make_page_token(offset + max_results)
+
+        if (offset > 0):
+            response["prevPageToken"] = make_page_token(max(0, offset - max_results))
+
+        page_etag = make_etag(json.dumps(response, sort_keys=True))
+        response["etag"] = page_etag
+
+        if (etag == page_etag):
+            return 304, None, page_etag
+
+        return 200, apply_fields(response, selection), page_etag
+
+
+def make_handler(api: MockAPI) -> type:
+
+    class Handler(BaseHTTPRequestHandler):
+
+        # Keep-alive, like the real API.
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            url = urllib.parse.urlsplit(self.path)
+
+            if (url.path != ENDPOINT_PATH):
+                self.send_error(404)
+                api.count_response(404)
+                return
+
+            query = dict(urllib.parse.parse_qsl(url.query))
+
+            status, body, etag = api.handle_request(query, self.headers.get("If-None-Match"))
+
+            self.send_response(status)
+
+            if (etag != None):
+                self.send_header("ETag", etag)
+
+            if (body == None):
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            else:
+                data = json.dumps(body).encode("utf-8")
+
+                if ("gzip" in self.headers.get("Accept-Encoding", "")):
+                    data = gzip.compress(data, 1)
+                    self.send_header("Content-Encoding", "gzip")
+
+                self.send_header("Content-Type", "application/json; charset=UTF-8")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            api.count_response(status)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+def parse_arguments() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="A local stand-in for the playlistItems endpoint of the Youtube Data API."
+    )
+
+    parser.add_argument("--host", default="127.0.0.1", help="the address to listen on")
+    parser.add_argument("--port", type=int, default=8080, help="the port to listen on")
+
+    parser.add_argument(
+        "-v", "--videos",
+        type=int,
+        default=10000,
+        help="the number of videos of all the playlists together"
+    )
+
+    parser.add_argument(
+        "-p", "--playlist-size",
+        type=int,
+        default=5000,
+        help="the number of videos per playlist"
+    )
+
+    parser.add_argument("--seed", type=int, default=0, help="the seed of the made up playlists")
+
+    parser.add_argument(
+        "--deleted",
+        type=float,
+        default=0.01,
+        help="the fraction of videos that are deleted"
+    )
+
+    parser.add_argument(
+        "--latency",
+        type=float,
+        default=0.05,
+        help="how long (in seconds) every request takes on average"
+    )
+
+    parser.add_argument(
+        "--jitter",
+        type=float,
+        default=0.02,
+        help="how much (in seconds) the latency varies, either way"
+    )
+
+    parser.add_argument(
+        "--error-rate",
+        type=float,
+        default=0.0,
+        help="the fraction of requests answered with a 500 backendError"
+    )
+
+    parser.add_argument(
+        "--quota",
+        type=int,
+        default=None,
+        help="the number of requests answered before every request gets a 403 quotaExceeded"
+    )
+
+    parser.add_argument(
+        "--input-file",
+        default=None,
+        help="a file to write the links of the playlists to, as an input file of the archiver"
+    )
+
+    return parser.parse_args()
+
+def main() -> None:
+    arguments = parse_arguments()
+
+    api = MockAPI(arguments)
+
+    if (arguments.input_file != None):
+
+        with open(arguments.input_file, "w", encoding="utf-8") as file:
+            for playlist_id in api.playlists:
+                file.write(YOUTUBE_PLAYLIST_PREFIX + playlist_id + "\n")
+
+    server = ThreadingHTTPServer((arguments.host, arguments.port), make_handler(api))
+    server.daemon_threads = True
+
+    # So that the responses are printed when stopped by kill too, not just 
+    # Ctrl-C.
+    for signal_number in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signal_number, signal.default_int_handler)
+
+    print(
+        f"Serving {len(api.playlists)} playlist(s) of {arguments.videos} video(s) at "
+        f"http://{arguments.host}:{server.server_port}{ENDPOINT_PATH}",
+        flush=True
+    )
+
+    try:
+        server.serve_forever()
+
+    except KeyboardInterrupt:
+        pass
+
+    finally:
+        server.server_close()
+
+    responses = ", ".join(f"{count} x {status}" for status, count in sorted(api.responses.items()))
+
+    print(f"Responses: {responses or 'none'}")
+
+if (__name__ == "__main__"):
+    main()
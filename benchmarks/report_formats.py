@@ -0,0 +1,98 @@
+'''
+report_formats.py: compares the formats of the comparator output (see
+ReportWriter.py), in time to write and file size, on made up reports.
+
+Usage: python3 report_formats.py [<changed_videos> ...]
+'''
+
+# Python
+import sys
+import time
+import random
+import pathlib
+import tempfile
+from typing import Dict, List
+
+# Internal
+from synthetic import make_archive
+from Video import Video, UNKNOWN_CHANNEL
+from ReportWriter import REPORT_WRITERS, create_report_writer
+from comparator import parse_time, get_time_apart
+
+def make_changes(
+    changed_videos: int,
+    playlist_size: int = 1000,
+    seed: int = 0
+) -> Dict[str, tuple]:
+    '''
+    This function makes the changes of a comparison (like
+    Comparator.changes), with changed_videos videos in total split between
+    added, removed and changed.
+    '''
+
+    rng = random.Random(seed)
+    archive = make_archive(changed_videos, playlist_size, seed)
+
+    changes: Dict[str, tuple] = {}
+
+    for playlist_id, playlist in archive["playlists"].items():
+        added: List[Video] = []
+        removed: List[Video] = []
+        changed: List[List[Video]] = []
+
+        for video in playlist["videos"].values():
+            video = Video.initiate_video_from_json(video)
+            roll = rng.random()
+
+            if (roll < 0.4):
+                added.append(video)
+
+            elif (roll < 0.8):
+                removed.append(video)
+
+            else:
+                deleted = Video("Deleted video", UNKNOWN_CHANNEL, video.id)
+                changed.append([video, deleted] if (roll < 0.9) else [deleted, video])
+
+        changes[playlist_id] = (added, removed, changed)
+
+    return changes
+
+def main() -> None:
+    sizes = [int(size) for size in sys.argv[1:]] or [10000, 100000, 500000]
+
+    old_date = parse_time("2023-01-31 Tue 00:23:32")
+    new_date = parse_time("2023-02-01 Wed 00:23:32")
+
+    print(f"{'videos':>10} {'format':>7} {'size (KiB)':>12} {'write (s)':>10}")
+
+    with tempfile.TemporaryDirectory() as directory:
+
+        for changed_videos in sizes:
+            changes = make_changes(changed_videos)
+
+            for report_format in REPORT_WRITERS:
+                path = pathlib.Path(directory) / f"report.{report_format}"
+
+                start = time.perf_counter()
+
+                with path.open("w", encoding="utf-8") as file:
+                    report_writer = create_report_writer(report_format, file)
+                    report_writer.begin(
+                        old_date, new_date, get_time_apart(old_date, new_date)
+                    )
+
+                    for playlist_id, playlist_changes in changes.items():
+                        report_writer.write_playlist(playlist_id, playlist_changes)
+
+                    report_writer.finish()
+
+                elapsed = time.perf_counter() - start
+
+                print(
+                    f"{changed_videos:>10} {report_format:>7} "
+                    f"{path.stat().st_size//1024:>12} {elapsed:>10.3f}"
+                )
+
+if (__name__ == "__main__"):
+    main()
@@ -0,0 +1,205 @@
+'''
+startup.py: checks that no command of ytarchiver.py imports the modules it
+should not need (like requests for a comparison), and measures how long each
+one takes to import against its budget (with python -X importtime).
+
+Usage: python3 startup.py [-r <repeat>] [<command> ...]
+
+The time of a command is what the modules it imports took, on top of what
+the interpreter imports anyway (site and the like), the best of the repeats.
+Times depend on the machine, so a command over its budget is only reported.
+The exit code is 1 if any command imports a module it must not, which does
+not depend on the machine, so it can be run before every release (or from
+CI) like a test.
+'''
+
+# Python
+import sys
+import argparse
+import subprocess
+import pathlib
+from typing import Dict, List, Set, Tuple
+
+PROGRAM_DIRECTORY: pathlib.Path = pathlib.Path(__file__).resolve().parent.parent
+
+# The benchmarks are run from this folder but the program lives one up.
+sys.path.insert(0, str(PROGRAM_DIRECTORY))
+
+# Internal
+from ytarchiver import COMMANDS
+
+# What only the commands that go online need: requests (and what it brings
+# along) and the threads of concurrent.futures.
+ONLINE_MODULES: List[str] = ["requests", "urllib3", "ssl", "concurrent"]
+
+# Command -> modules it must not import. Only the archiver and the watcher go
+# online, and a plain comparison needs neither the processes of -j nor the
+# SQLite of --store.
+FORBIDDEN_MODULES: Dict[str, List[str]] = {
+    "archive": [],
+    "watch": [],
+    "compare": ONLINE_MODULES + ["multiprocessing", "sqlite3"],
+    "convert": ONLINE_MODULES + ["multiprocessing", "sqlite3"],
+    "timeline": ONLINE_MODULES + ["multiprocessing", "sqlite3"],
+    "snapshots": ONLINE_MODULES + ["multiprocessing"],
+    "chain": ONLINE_MODULES + ["multiprocessing", "sqlite3"],
+    "lookup": ONLINE_MODULES + ["multiprocessing", "sqlite3"],
+    "search": ONLINE_MODULES + ["multiprocessing", "sqlite3"]
+}
+
+# Command -> budget in milliseconds, about twice what the commands take on a
+# slow machine.
+STARTUP_BUDGETS: Dict[str, float] = {
+    "archive": 250.0,
+    "watch": 250.0,
+    "compare": 50.0,
+    "convert": 50.0,
+    "timeline": 50.0,
+    "snapshots": 60.0,
+    "chain": 50.0,
+    "lookup": 40.0,
+    "search": 40.0
+}
+
+def run_importtime(code: str) -> List[Tuple[int, str, int]]:
+    '''
+    This function runs the code in a new interpreter with -X importtime.
+
+    Returns:
+        A (depth, module, cumulative time in microseconds) tuple for every
+        module imported, in the order importtime gives them (the modules a
+        module imports come before it, one level deeper).
+    '''
+
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=PROGRAM_DIRECTORY,
+        capture_output=True,
+        text=True,
+        check=True
+    )
+
+    imports = []
+
+    for line in process.stderr.splitlines():
+
+        if not (line.startswith("import time:")):
+            continue
+
+        _, cumulative, name = line[len("import time:"):].split("|")
+
+        # The header line.
+        if not (cumulative.strip().isdigit()):
+            continue
+
+        depth = (len(name) - len(name.lstrip()) - 1)//2
+
+        imports.append((depth, name.strip(), int(cumulative)))
+
+    return imports
+
+def measure_command(
+    command: str,
+    baseline_modules: Set[str],
+    repeat: int
+) -> Tuple[float, Set[str]]:
+    '''
+    This function measures how long the command takes to import.
+
+    Returns:
+        A tuple of the time (in milliseconds, the best of the repeats) and
+        the names of the modules it imported.
+    '''
+
+    best = float("inf")
+    modules: Set[str] = set()
+
+    for _ in range(repeat):
+        imports = run_importtime(
+            f"import ytarchiver; ytarchiver.load_command({command!r})"
+        )
+
+        modules = {name for _, name, _ in imports}
+
+        total = sum(
+            cumulative for depth, name, cumulative in imports
+            if (depth == 0 and name not in baseline_modules)
+        )
+
+        best = min(best, total/1000)
+
+    return best, modules
+
+def parse_arguments() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Checks what every command of ytarchiver.py imports and how long it takes to start."
+    )
+
+    parser.add_argument(
+        "commands",
+        nargs="*",
+        help=f"the commands to check, out of {', '.join(FORBIDDEN_MODULES)} (all of them by default)"
+    )
+
+    parser.add_argument(
+        "-r", "--repeat",
+        type=int,
+        default=5,
+        help="how many times every command is measured, the best time is kept"
+    )
+
+    arguments = parser.parse_args()
+
+    for command in arguments.commands:
+
+        if (command not in FORBIDDEN_MODULES):
+            parser.error(f"unknown command {command}")
+
+    return arguments
+
+def main() -> None:
+    arguments = parse_arguments()
+
+    # A command added to ytarchiver.py has to be given its forbidden modules
+    # and a budget too.
+    for command in COMMANDS:
+
+        if (command not in FORBIDDEN_MODULES or command not in STARTUP_BUDGETS):
+            print(f"The command {command} has no forbidden modules or no startup budget", file=sys.stderr)
+
+            exit(1)
+
+    baseline_modules = {name for _, name, _ in run_importtime("pass")}
+
+    failed = []
+
+    print(f"{'command':>10} {'time (ms)':>10} {'budget (ms)':>12}")
+
+    for command in arguments.commands or FORBIDDEN_MODULES:
+        budget = STARTUP_BUDGETS[command]
+
+        milliseconds, modules = measure_command(command, baseline_modules, arguments.repeat)
+
+        problems = [
+            f"imports {module}" for module in FORBIDDEN_MODULES[command] 
+            if (module in modules)
+        ]
+
+        if (problems):
+            failed.append(command)
+
+        # Only reported, see the top of the file.
+        if (milliseconds > budget):
+            problems.insert(0, "over budget")
+
+        print(f"{command:>10} {milliseconds:>10.1f} {budget:>12.0f} {', '.join(problems)}")
+
+    if (failed):
+        print(f"{len(failed)} command(s) import modules they must not: {', '.join(failed)}", file=sys.stderr)
+
+        exit(1)
+
+    print("No command imports a module it must not")
+
+if (__name__ == "__main__"):
+    main()
@@ -0,0 +1,404 @@
+'''
+suite.py: times the hot paths of the archiver and the comparator on made up
+archives (see synthetic.py), without the API, and writes the results to a
+JSON file so that runs can be compared over time.
+
+Usage: python3 suite.py [-s <total_videos>,...] [-c <churn>] [--seed <seed>]
+                        [-r <repeat>] [-o <results_file>]
+                        [--compare <previous_results_file>] [<scenario> ...]
+
+For every size, an old archive and a new one (the old one after churn) are
+made up one playlist at a time, so sizes of 10M videos do not need the whole
+archives in memory. The scenarios that work on a playlist are timed on every
+playlist as it is made up (the best of the repeats, summed over the
+playlists), the others are timed on the archive files.
+'''
+
+# Python
+import sys
+import json
+import time
+import platform
+import argparse
+import itertools
+import subprocess
+import pathlib
+import tempfile
+from typing import Callable, Dict, List, Union
+
+# Internal
+from synthetic import iterate_playlists, iterate_churned_playlists
+from Video import Video
+from Playlist import Playlist
+from ArchiveWriter import ArchiveWriter
+from ArchiveReader import ArchiveReader
+from comparator import compare_video_set, check_format_of_archive
+
+PROGRAM_DIRECTORY: pathlib.Path = pathlib.Path(__file__).resolve().parent.parent
+
+OLD_TIME_STR: str = "2023-01-31 Tue 00:23:32"
+NEW_TIME_STR: str = "2023-02-01 Wed 00:23:32"
+
+# Timed on every playlist as it is made up.
+PLAYLIST_SCENARIOS: List[str] = [
+    "compare_video_set",
+    "check_format_of_archive",
+    "construct_json_obj",
+    "json_dump"
+]
+
+# Timed on the archive files.
+ARCHIVE_SCENARIOS: List[str] = [
+    "json_load",
+    "archive_read",
+    "comparator"
+]
+
+SCENARIOS: List[str] = PLAYLIST_SCENARIOS + ARCHIVE_SCENARIOS
+
+# json_load loads the whole archive in memory, which bigger archives may not
+# fit in.
+JSON_LOAD_MAX_VIDEOS: int = 2000000
+
+# Bumped whenever the scenarios change in a way that makes the results not
+# comparable with older ones.
+SUITE_VERSION: int = 1
+
+def time_best(function: Callable, repeat: int) -> float:
+    '''
+    This function runs the function repeat times.
+
+    Returns:
+        The shortest time (in seconds) it took, the others are mostly the
+        same plus noise.
+    '''
+
+    best = float("inf")
+
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+
+        best = min(best, time.perf_counter() - start)
+
+    return best
+
+def make_playlist_object(playlist: dict) -> Playlist:
+    playlist_object = Playlist(playlist["id"])
+
+    for video in playlist["videos"].values():
+        playlist_object.add_video(Video.initiate_video_from_json(video))
+
+    return playlist_object
+
+def time_playlist_scenarios(
+    total_videos: int,
+    arguments: argparse.Namespace,
+    old_archive_path: pathlib.Path,
+    new_archive_path: pathlib.Path,
+    scenarios: List[str]
+) -> Dict[str, float]:
+    '''
+    This function makes up the old and new archives, writes them to the
+    given paths and times the given scenarios of PLAYLIST_SCENARIOS on every
+    playlist.
+
+    Returns:
+        The time (in seconds) of every scenario, summed over the playlists.
+    '''
+
+    timings = dict.fromkeys(PLAYLIST_SCENARIOS, 0.0)
+
+    old_writer = ArchiveWriter(old_archive_path, OLD_TIME_STR)
+    new_writer = ArchiveWriter(new_archive_path, NEW_TIME_STR)
+
+    if not (old_writer.open() and new_writer.open()):
+        raise OSError("Could not write the archives")
+
+    # The churned playlists are made from the old ones as they come, tee()
+    # only keeps the one in between.
+    old_playlists, playlists_to_churn = itertools.tee(
+        iterate_playlists(total_videos, arguments.playlist_size, arguments.seed)
+    )
+
+    new_playlists = iterate_churned_playlists(
+        playlists_to_churn, arguments.churn, arguments.seed + 1
+    )
+
+    for old_playlist, new_playlist in zip(old_playlists, new_playlists):
+
+        if ("compare_video_set" in scenarios):
+            timings["compare_video_set"] += time_best(
+                lambda: compare_video_set(old_playlist["videos"], new_playlist["videos"]),
+                arguments.repeat
+            )
+
+        if ("check_format_of_archive" in scenarios):
+            archive = {"time": OLD_TIME_STR, "playlists": {old_playlist["id"]: old_playlist}}
+
+            timings["check_format_of_archive"] += time_best(
+                lambda: check_format_of_archive(archive),
+                arguments.repeat
+            )
+
+        if ("construct_json_obj" in scenarios):
+            playlist_object = make_playlist_object(old_playlist)
+
+            timings["construct_json_obj"] += time_best(
+                playlist_object.construct_json_obj,
+                arguments.repeat
+            )
+
+        # Only once, the archive is written for real.
+        timings["json_dump"] += time_best(
+            lambda: old_writer.write_playlist(old_playlist), 1
+        )
+
+        new_writer.write_playlist(new_playlist)
+
+    for writer in (old_writer, new_writer):
+        writer.finish()
+        writer.close()
+
+    return timings
+
+def time_archive_scenarios(
+    total_videos: int,
+    arguments: argparse.Namespace,
+    old_archive_path: pathlib.Path,
+    new_archive_path: pathlib.Path,
+    scenarios: List[str]
+) -> Dict[str, float]:
+    '''
+    This function times the given scenarios of ARCHIVE_SCENARIOS on the
+    archive files.
+
+    Returns:
+        The time (in seconds) of every scenario that was run.
+    '''
+
+    timings: Dict[str, float] = {}
+
+    def load_json():
+        with old_archive_path.open("r", encoding="utf-8") as file:
+            json.load(file)
+
+    def read_archive():
+        with old_archive_path.open("rb") as file:
+            for _ in ArchiveReader(file).iterate():
+                pass
+
+    report_path = old_archive_path.with_name("report.txt")
+
+    # The whole program, startup included, as it is run by hand.
+    def run_comparator():
+
+        # Otherwise the comparator asks whether to overwrite it.
+        if (report_path.exists()):
+            report_path.unlink()
+
+        subprocess.run(
+            [
+                sys.executable,
+                str(PROGRAM_DIRECTORY / "comparator.py"),
+                str(old_archive_path),
+                str(new_archive_path),
+                str(report_path)
+            ],
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            check=True
+        )
+
+    functions = {
+        "json_load": load_json,
+        "archive_read": read_archive,
+        "comparator": run_comparator
+    }
+
+    for scenario in ARCHIVE_SCENARIOS:
+
+        if (scenario not in scenarios):
+            continue
+
+        if (scenario == "json_load" and total_videos > JSON_LOAD_MAX_VIDEOS):
+            print(f"{total_videos:>10} {scenario:>24} {'skipped, too big for memory':>28}")
+            continue
+
+        timings[scenario] = time_best(functions[scenario], arguments.repeat)
+
+    return timings
+
+def get_commit() -> Union[str, None]:
+    '''
+    Returns:
+        The commit the program is at, None if it is not in a git repository.
+    '''
+
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=PROGRAM_DIRECTORY,
+            capture_output=True,
+            text=True,
+            check=True
+        ).stdout.strip()
+
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare_results(previous_results: dict, results: dict) -> None:
+    '''
+    This function prints how much faster (or slower) every scenario got since
+    the previous results.
+    '''
+
+    previous_seconds = {
+        (result["scenario"], result["videos"]): result["seconds"]
+        for result in previous_results["results"]
+    }
+
+    print()
+    print(f"Compared with {previous_results.get('commit') or 'the previous results'}:")
+
+    compared_results = [
+        result for result in results["results"]
+        if ((result["scenario"], result["videos"]) in previous_seconds)
+    ]
+
+    if not (compared_results):
+        print("No scenario was run with the same number of videos")
+
+    for result in compared_results:
+        key = (result["scenario"], result["videos"])
+
+        speedup = previous_seconds[key]/max(result["seconds"], 1e-9)
+
+        print(f"{result['videos']:>10} {result['scenario']:>24} {speedup:>10.2f}x")
+
+def parse_arguments() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Times the hot paths of the archiver and the comparator on made up archives."
+    )
+
+    parser.add_argument(
+        "scenarios",
+        nargs="*",
+        help=f"the scenarios to run, out of {', '.join(SCENARIOS)} (all of them by default)"
+    )
+
+    parser.add_argument(
+        "-s", "--sizes",
+        default="1000,100000,1000000",
+        help="the numbers of videos of the archives, separated by commas (up to 10000000)"
+    )
+
+    parser.add_argument(
+        "-c", "--churn",
+        type=float,
+        default=0.01,
+        help="the fraction of videos removed, added and deleted or restored between the archives"
+    )
+
+    parser.add_argument("--seed", type=int, default=0, help="the seed of the made up archives")
+
+    parser.add_argument(
+        "-p", "--playlist-size",
+        type=int,
+        default=5000,
+        help="the number of videos per playlist"
+    )
+
+    parser.add_argument(
+        "-r", "--repeat",
+        type=int,
+        default=3,
+        help="how many times every scenario is run, the best time is kept"
+    )
+
+    parser.add_argument(
+        "-o", "--output",
+        default="benchmark_results.json",
+        help="the file the results are written to"
+    )
+
+    parser.add_argument(
+        "--compare",
+        help="results of an earlier run to compare with"
+    )
+
+    arguments = parser.parse_args()
+
+    for scenario in arguments.scenarios:
+
+        if (scenario not in SCENARIOS):
+            parser.error(f"unknown scenario {scenario}")
+
+    return arguments
+
+def main() -> None:
+    arguments = parse_arguments()
+
+    scenarios = arguments.scenarios or SCENARIOS
+    sizes = [int(size) for size in arguments.sizes.split(",")]
+
+    results = {
+        "suite_version": SUITE_VERSION,
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "commit": get_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "settings": {
+            "sizes": sizes,
+            "churn": arguments.churn,
+            "seed": arguments.seed,
+            "playlist_size": arguments.playlist_size,
+            "repeat": arguments.repeat
+        },
+        "results": []
+    }
+
+    print(f"{'videos':>10} {'scenario':>24} {'time (s)':>12} {'videos/s':>15}")
+
+    with tempfile.TemporaryDirectory() as directory:
+        old_archive_path = pathlib.Path(directory) / "old.json"
+        new_archive_path = pathlib.Path(directory) / "new.json"
+
+        for total_videos in sizes:
+            timings = time_playlist_scenarios(
+                total_videos, arguments, old_archive_path, new_archive_path, scenarios
+            )
+
+            timings.update(time_archive_scenarios(
+                total_videos, arguments, old_archive_path, new_archive_path, scenarios
+            ))
+
+            for scenario in SCENARIOS:
+
+                if (scenario not in scenarios or scenario not in timings):
+                    continue
+
+                seconds = timings[scenario]
+                videos_per_second = total_videos/max(seconds, 1e-9)
+
+                print(f"{total_videos:>10} {scenario:>24} {seconds:>12.4f} {videos_per_second:>15.0f}")
+
+                results["results"].append({
+                    "scenario": scenario,
+                    "videos": total_videos,
+                    "seconds": seconds,
+                    "videos_per_second": videos_per_second
+                })
+
+    with open(arguments.output, "w", encoding="utf-8") as file:
+        json.dump(results, file, indent=4)
+
+    print(f"Results written to {arguments.output}")
+
+    if (arguments.compare != None):
+
+        with open(arguments.compare, "r", encoding="utf-8") as file:
+            compare_results(json.load(file), results)
+
+if (__name__ == "__main__"):
+    main()
@@ -0,0 +1,180 @@
+'''
+synthetic.py: makes up archives (see README for the format) for the 
+benchmarks, so that they can run without the API.
+
+Everything is generated from a seed, so the same arguments always give the 
+same archive.
+'''
+
+# Python
+import sys
+import random
+import pathlib
+from typing import Iterable, Iterator, List
+
+# The benchmarks are run from this folder but the program lives one up.
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+
+# Internal
+from Video import YOUTUBE_VIDEO_PREFIX, UNKNOWN_CHANNEL
+from configuration import YOUTUBE_PLAYLIST_PREFIX
+
+ID_CHARACTERS: str = "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789-_"
+
+WORDS: List[str] = [
+    "Music", "Video", "Official", "Live", "Remix", "Cover", "Topic", "feat.", 
+    "空", "夢", "歌ってみた", "オリジナル", "Sign", "Night", "Blue", "Mix"
+]
+
+def make_id(rng: random.Random, length: int) -> str:
+    return "".join(rng.choice(ID_CHARACTERS) for _ in range(length))
+
+def make_video(rng: random.Random, channels: List[str]) -> dict:
+    video_id = make_id(rng, 11)
+
+    return {
+        "id": video_id,
+        "name": " ".join(rng.choice(WORDS) for _ in range(rng.randint(2, 8))),
+        "channel": rng.choice(channels),
+        "link": YOUTUBE_VIDEO_PREFIX + video_id
+    }
+
+def iterate_playlists(
+    total_videos: int, 
+    playlist_size: int = 5000, 
+    seed: int = 0
+) -> Iterator[dict]:
+    '''
+    This function makes up the playlists of an archive one at a time, so 
+    that archives too big for memory can be made (see make_archive()).
+
+    Yields:
+        The JSON representation of every playlist.
+    '''
+
+    rng = random.Random(seed)
+
+    channels = [
+        f"{rng.choice(WORDS)} {make_id(rng, 4)}" 
+        for _ in range(max(1, total_videos//20))
+    ]
+
+    while (total_videos > 0):
+        playlist_id = "PL" + make_id(rng, 32)
+
+        size = min(playlist_size, total_videos)
+        total_videos -= size
+
+        videos = {}
+
+        for _ in range(size):
+            video = make_video(rng, channels)
+            videos[video["id"]] = video
+
+        yield {
+            "id": playlist_id,
+            "link": YOUTUBE_PLAYLIST_PREFIX + playlist_id,
+            "videos": videos
+        }
+
+def make_archive(
+    total_videos: int, 
+    playlist_size: int = 5000, 
+    seed: int = 0, 
+    time_str: str = "2023-01-31 Tue 00:23:32"
+) -> dict:
+    '''
+    This function makes up an archive.
+
+    Params:
+        total_videos: the number of videos in the whole archive.
+        playlist_size: the number of videos per playlist (the last one may 
+        have less).
+        seed: the seed of the random generator.
+        time_str: the time attribute of the archive.
+
+    Returns:
+        The JSON representation of the archive.
+    '''
+
+    playlists = {
+        playlist["id"]: playlist 
+        for playlist in iterate_playlists(total_videos, playlist_size, seed)
+    }
+
+    return {"time": time_str, "playlists": playlists}
+
+def iterate_churned_playlists(
+    playlists: Iterable[dict], 
+    churn: float, 
+    seed: int = 1
+) -> Iterator[dict]:
+    '''
+    This function makes the next snapshot of every playlist, one at a time 
+    (see churn_archive()).
+
+    Yields:
+        The JSON representation of every new playlist, in the same order.
+    '''
+
+    rng = random.Random(seed)
+
+    channels = [f"{rng.choice(WORDS)} {make_id(rng, 4)}" for _ in range(100)]
+
+    for playlist in playlists:
+        videos = {}
+
+        for video_id, video in playlist["videos"].items():
+            roll = rng.random()
+
+            if (roll < churn):
+                continue
+
+            if (roll < 2*churn):
+                video = dict(video)
+
+                if (video["channel"] == UNKNOWN_CHANNEL):
+                    video["channel"] = rng.choice(channels)
+
+                else:
+                    video["channel"] = UNKNOWN_CHANNEL
+                    video["name"] = "Deleted video"
+
+            videos[video_id] = video
+
+        for _ in range(round(len(playlist["videos"])*churn)):
+            video = make_video(rng, channels)
+            videos[video["id"]] = video
+
+        yield dict(playlist, videos=videos)
+
+def churn_archive(
+    archive: dict, 
+    churn: float, 
+    seed: int = 1, 
+    time_str: str = "2023-02-01 Wed 00:23:32"
+) -> dict:
+    '''
+    This function makes the next snapshot of an archive: in every playlist, 
+    about churn of the videos are removed, as many are added, and as many 
+    are deleted or restored (their channel becomes or stops being 
+    UNKNOWN_CHANNEL).
+
+    Params:
+        archive: the JSON representation of the archive, it is not modified.
+        churn: the fraction of videos affected by each kind of change.
+        seed: the seed of the random generator.
+        time_str: the time attribute of the new archive.
+
+    Returns:
+        The JSON representation of the new archive.
+    '''
+
+    playlists = {
+        playlist["id"]: playlist 
+        for playlist in iterate_churned_playlists(
+            archive["playlists"].values(), churn, seed
+        )
+    }
+
+    return {"time": time_str, "playlists": playlists}
@@ -0,0 +1,166 @@
+'''
+chain.py: manages a snapshot chain (see SnapshotChain.py), the directory 
+that keeps the history of archives as keyframes and deltas.
+
+Usage: python3 chain.py <directory> list
+       python3 chain.py <directory> add <archive> [<archive> ...]
+       python3 chain.py <directory> extract <snapshot_index> <output_file>
+
+"list" shows every snapshot with its index, which is what comparator.py 
+--chain takes. "add" appends archives (in either format) to the chain, in 
+the order given. "extract" rebuilds a snapshot as a JSON archive.
+'''
+
+# Python
+import sys
+import pathlib
+from typing import List
+
+# Internal
+from utilities import err_print, input_file_opening
+from PlaceHolder import PlaceHolder
+from ArchiveWriter import ArchiveWriter
+from SnapshotChain import SnapshotChain
+from BinaryArchive import create_archive_reader
+from comparator import check_format_of_playlist, check_time_format
+
+USAGE: List[str] = [
+    "Usage: python3 chain.py <directory> list",
+    "       python3 chain.py <directory> add <archive> [<archive> ...]",
+    "       python3 chain.py <directory> extract <snapshot_index> <output_file>"
+]
+
+def add_archive(chain: SnapshotChain, archive_path: pathlib.Path) -> bool:
+    '''
+    This function appends an archive to the chain.
+
+    Params:
+        chain: the snapshot chain.
+        archive_path: the path to the archive.
+
+    Returns:
+        True if successful, False otherwise (the reason is already printed).
+    '''
+
+    file = input_file_opening(archive_path, binary=True)
+
+    if (file == PlaceHolder.get_place_holder()):
+        return False
+
+    try:
+        index = chain.append(
+            create_archive_reader(file), 
+            check_format_of_playlist, 
+            check_time_format
+        )
+
+    except ValueError:
+        err_print(f"File {archive_path.as_posix()} is not of correct format or is corrupted, please check it again.")
+
+        return False
+
+    finally:
+        file.close()
+
+    print(f"Added {archive_path.as_posix()} as snapshot {index}")
+
+    return True
+
+def extract_snapshot(
+    chain: SnapshotChain, 
+    index: int, 
+    output_file_path: pathlib.Path
+) -> bool:
+    '''
+    This function rebuilds a snapshot and writes it as a JSON archive.
+
+    Returns:
+        True if successful, False otherwise (the reason is already printed).
+    '''
+
+    writer = ArchiveWriter(output_file_path, chain.snapshots[index]["time"])
+
+    if not (writer.open()):
+        return False
+
+    try:
+        for playlist_id, playlist in chain.iterate(index):
+            writer.write_playlist(playlist)
+
+        writer.finish()
+
+    finally:
+        writer.close()
+
+    return True
+
+def main() -> None:
+
+    arguments = sys.argv[1:]
+
+    if not (
+        (len(arguments) == 2 and arguments[1] == "list") or 
+        (len(arguments) >= 3 and arguments[1] == "add") or 
+        (len(arguments) == 4 and arguments[1] == "extract")):
+
+        for line in USAGE:
+            err_print(line)
+
+        exit(1)
+
+    directory = pathlib.Path(arguments[0]).expanduser().resolve()
+
+    if (arguments[1] != "add" and not directory.exists()):
+        err_print(f"File {directory.as_posix()} does not exist")
+
+        exit(1)
+
+    try:
+        chain = SnapshotChain(directory)
+
+    except (OSError, ValueError):
+        err_print(f"File {directory.as_posix()} is not a snapshot chain or is corrupted, please check it again.")
+
+        exit(1)
+
+    success = True
+
+    if (arguments[1] == "list"):
+
+        for index, snapshot in enumerate(chain.snapshots):
+            kind = "keyframe" if (snapshot["keyframe"] != None) else "delta"
+
+            print(f"{index}: {snapshot['time']} ({kind})")
+
+    elif (arguments[1] == "add"):
+
+        for archive in arguments[2:]:
+            success = add_archive(chain, pathlib.Path(archive).expanduser().resolve())
+
+            if not (success):
+                break
+
+    else:
+        try:
+            index = int(arguments[2])
+
+        except ValueError:
+            index = -1
+
+        if not (0 <= index < len(chain.snapshots)):
+            err_print(f"There is no snapshot with index {arguments[2]} in {directory.as_posix()}.")
+
+            success = False
+
+        else:
+            success = extract_snapshot(
+                chain, index, pathlib.Path(arguments[3]).expanduser().resolve()
+            )
+
+    chain.close()
+
+    if not (success):
+        exit(1)
+
+if (__name__ == "__main__"):
+    main()
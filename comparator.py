@@ -4,22 +4,45 @@ comparator.py: Compare 2 archives together to point out what has changed.
 Note that comparator.py only compares mutual playlists within the 2 archives, 
 which means if 2 archives have no mutual playlist, it will not report anything.
 
-Usage: python3 comparator.py <old_archive> <new_archive> <output_file>
+Usage: python3 comparator.py [--trust] [--moves] [-j <jobs>] [-f text|json|csv|ndjson] <old_archive> <new_archive> <output_file>
+       python3 comparator.py --store <database> <old_snapshot_id> <new_snapshot_id> <output_file>
+       python3 comparator.py --chain <directory> <old_snapshot_index> <new_snapshot_index> <output_file>
+
+Any of them also takes [--metrics <json_file>] [--prometheus <file>].
 '''
 # Python
+import argparse
+import itertools
+import math
 import json
 import sys
 import pathlib
 import os
-from typing import *
+from typing import Dict, List, Set, Tuple, Union
 import time
 import datetime
 
 # Internal
-from Video import Video
+from Video import Video, UNKNOWN_CHANNEL
 from configuration import YOUTUBE_PLAYLIST_PREFIX,TIME_FORMAT_STR
-from utilities import *
+from utilities import err_print, input_file_opening, output_file_opening, overwriting_file_warning
 from PlaceHolder import PlaceHolder
+from ArchiveReader import ArchiveReader
+from BinaryArchive import create_archive_reader
+from validation import (
+    find_video_error, 
+    find_playlist_error, 
+    find_archive_error, 
+    find_archive_stream_error, 
+    parse_time_str
+)
+from ReportWriter import REPORT_WRITERS, create_report_writer
+from Metrics import Metrics
+
+# When comparing in parallel, the mutual playlists are split into about this 
+# many shards per process, so that a shard of big playlists does not keep one 
+# process busy long after the others are done.
+SHARDS_PER_JOB: int = 4
 
 class Comparator:
     
@@ -27,12 +50,59 @@ class Comparator:
         self, 
         old_archive_file_path, 
         new_archive_file_path, 
-        output_file_path
+        output_file_path,
+        snapshot_store_path = None,
+        snapshot_chain_path = None,
+        trust: bool = False,
+        jobs: int = 1,
+        report_format: str = "text",
+        find_moves: bool = False
     ) -> None:
         '''
         Good ol' constructor, can never go wrong.
+
+        If trust is True, archives with a checksum that matches (see README) 
+        are not checked, since they are exactly what archiver.py wrote.
+
+        If jobs is more than 1, the mutual playlists of the archives are 
+        compared by that many processes at the same time.
+
+        report_format is the format of the output file, one of the keys of 
+        REPORT_WRITERS (see ReportWriter.py).
+
+        If find_moves is True, videos that went from one playlist to another 
+        are reported as moved or copied (see find_moves()) instead of as 
+        removed from one playlist and added to the other.
+
+        If snapshot_store_path is given, the "archives" are instead the ids of 
+        2 snapshots in that snapshot store (see SnapshotStore.py). Same with 
+        snapshot_chain_path, with the indexes of 2 snapshots in that snapshot 
+        chain (see SnapshotChain.py).
         '''
 
+        self.snapshot_chain_path: Union[pathlib.Path, None] = None
+        self.snapshot_chain: 'SnapshotChain' = None
+
+        if (snapshot_chain_path != None):
+            self.snapshot_chain_path = pathlib.Path(
+                snapshot_chain_path
+            ).expanduser().resolve()
+
+            self.old_snapshot_index: Union[str, int] = old_archive_file_path
+            self.new_snapshot_index: Union[str, int] = new_archive_file_path
+
+        self.snapshot_store_path: Union[pathlib.Path, None] = None
+
+        if (snapshot_store_path != None):
+            self.snapshot_store_path = pathlib.Path(
+                snapshot_store_path
+            ).expanduser().resolve()
+
+            self.old_snapshot_id: Union[str, int] = old_archive_file_path
+            self.new_snapshot_id: Union[str, int] = new_archive_file_path
+
+        self.snapshot_store: 'SnapshotStore' = None
+
         self.old_archive_file_path: pathlib.Path = pathlib.Path(
             old_archive_file_path
         ).expanduser().resolve()
@@ -47,75 +117,224 @@ class Comparator:
 
         self.output_file = PlaceHolder.get_place_holder()
 
+        self.trust: bool = trust
+        self.jobs: int = jobs
+        self.report_format: str = report_format
+        self.find_moves: bool = find_moves
+
         self.no_output = True
 
-        # JSON objects of old and new archive playlists.
-        self.old_archive_playlists: dict = None
+        # The archives are read one playlist at a time (see 
+        # ArchiveReader.py and BinaryArchive.py) so they are never fully in 
+        # memory.
+        self.old_archive_file = PlaceHolder.get_place_holder()
+        self.old_archive_reader: ArchiveReader = None
         self.old_archive_date: time.struct_time = None
     
-        self.new_archive_playlists: dict = None
+        self.new_archive_file = PlaceHolder.get_place_holder()
+        self.new_archive_reader: ArchiveReader = None
         self.new_archive_date: time.struct_time = None
 
+        # Ids of the playlists in both archives, in the order of the old one.
+        self.mutual_playlist_ids: List[str] = []
+
         # This variable record all the changes happening between mutual 
         # playlists.
         self.changes: dict = {}
 
+        # The videos moved or copied between playlists, only looked for if 
+        # find_moves is True (see find_moves()).
+        self.moves: Union[List[tuple], None] = None
+
     def fetch_archives(self) -> None:
         '''
-        This method will attempt to open the input files and retrieve the 
-        JSON representation of both old and new archives.
+        This method will attempt to open the input files and check that both 
+        old and new archives are of correct format.
+
+        The archives are only read one playlist at a time, here they are gone 
+        through once to check them and to find out where each playlist is, 
+        the mutual playlists are then read again one by one in main_work().
         '''
-        old_archive_file = input_file_opening(
-            self.old_archive_file_path
+
+        if (self.snapshot_store_path != None):
+            self.fetch_snapshots()
+            return
+
+        if (self.snapshot_chain_path != None):
+            self.fetch_chain_snapshots()
+            return
+
+        self.old_archive_file = input_file_opening(
+            self.old_archive_file_path, binary=True
         )
 
-        new_archive_file = input_file_opening(
-            self.new_archive_file_path
+        self.new_archive_file = input_file_opening(
+            self.new_archive_file_path, binary=True
         )
 
-        if (old_archive_file == PlaceHolder.get_place_holder() or 
-            new_archive_file == PlaceHolder.get_place_holder()):
+        if (self.old_archive_file == PlaceHolder.get_place_holder() or 
+            self.new_archive_file == PlaceHolder.get_place_holder()):
 
-            old_archive_file.close()
-            new_archive_file.close()
+            self.close_archives()
 
             exit(1)
 
-        old_archive = convert_json_from_file_to_dict(
-            old_archive_file
-        )
+        end_now = False
 
-        new_archive = convert_json_from_file_to_dict(
-            new_archive_file
-        )
+        try:
+            self.old_archive_reader = create_archive_reader(self.old_archive_file)
+
+        except ValueError:
+            self.old_archive_reader = None
+
+        try:
+            self.new_archive_reader = create_archive_reader(self.new_archive_file)
+
+        except ValueError:
+            self.new_archive_reader = None
+
+        for path, reader in (
+            (self.old_archive_file_path, self.old_archive_reader), 
+            (self.new_archive_file_path, self.new_archive_reader)
+        ):
+
+            if (reader == None):
+                error = "archive: not a valid binary archive"
+
+            else:
+                error = find_archive_stream_error(reader, self.trust)
+
+            if (error != None):
+                err_print(f"File {path.as_posix()} is not of correct format or is corrupted, please check it again.")
+                err_print(f"The first problem found is at {error}")
 
-        old_archive_file.close()
-        new_archive_file.close()
+                end_now = True
+
+        if (end_now):
+            self.close_archives()
+
+            exit(1)
+
+        self.old_archive_date = parse_time(self.old_archive_reader.time)
+        self.new_archive_date = parse_time(self.new_archive_reader.time)
+
+        self.mutual_playlist_ids = [
+            playlist_id 
+            for playlist_id in self.old_archive_reader.offsets 
+            if playlist_id in self.new_archive_reader.offsets
+        ]
+
+    def fetch_snapshots(self) -> None:
+        '''
+        This method opens the snapshot store and checks that both snapshots 
+        are in it, it is what fetch_archives() does for snapshots.
+        '''
+
+        if not (self.snapshot_store_path.exists()):
+            err_print(f"File {self.snapshot_store_path.as_posix()} does not exist")
+
+            exit(1)
+
+        try:
+            self.old_snapshot_id = int(self.old_snapshot_id)
+            self.new_snapshot_id = int(self.new_snapshot_id)
+
+        except ValueError:
+            err_print("The ids of the snapshots must be whole numbers.")
+
+            exit(1)
+
+        # Only imported here (like SnapshotChain and ProcessPoolExecutor) 
+        # since most comparisons are of 2 archives and the comparator is run 
+        # often enough for its startup time to matter.
+        import sqlite3
+        from SnapshotStore import SnapshotStore
+
+        try:
+            self.snapshot_store = SnapshotStore(self.snapshot_store_path)
+
+            old_time = self.snapshot_store.get_snapshot_time(self.old_snapshot_id)
+            new_time = self.snapshot_store.get_snapshot_time(self.new_snapshot_id)
+
+        except sqlite3.Error:
+            err_print(f"File {self.snapshot_store_path.as_posix()} is not a snapshot store or is corrupted, please check it again.")
+
+            exit(1)
 
         end_now = False
 
-        if (old_archive == None or 
-            not check_format_of_archive(old_archive)):
+        for snapshot_id, snapshot_time in (
+            (self.old_snapshot_id, old_time), 
+            (self.new_snapshot_id, new_time)
+        ):
 
-            err_print(f"File {self.old_archive_file_path.as_posix()} is not of correct format or is corrupted, please check it again.")
+            if (snapshot_time == None):
+                err_print(f"There is no snapshot with id {snapshot_id} in {self.snapshot_store_path.as_posix()}.")
 
-            end_now = True
-        
-        if (new_archive == None or 
-            not check_format_of_archive(new_archive)):
+                end_now = True
 
-            err_print(f"File {self.new_archive_file_path.as_posix()} is not of correct format or is corrupted, please check it again.")
+        if (end_now):
+            self.snapshot_store.close()
 
-            end_now = True
+            exit(1)
+
+        self.old_archive_date = parse_time(old_time)
+        self.new_archive_date = parse_time(new_time)
+
+    def fetch_chain_snapshots(self) -> None:
+        '''
+        This method opens the snapshot chain and checks that both snapshots 
+        are in it, it is what fetch_archives() does for a snapshot chain.
+        '''
+
+        if not (self.snapshot_chain_path.exists()):
+            err_print(f"File {self.snapshot_chain_path.as_posix()} does not exist")
+
+            exit(1)
+
+        from SnapshotChain import SnapshotChain
+
+        try:
+            self.snapshot_chain = SnapshotChain(self.snapshot_chain_path)
+
+        except (OSError, ValueError):
+            err_print(f"File {self.snapshot_chain_path.as_posix()} is not a snapshot chain or is corrupted, please check it again.")
+
+            exit(1)
+
+        snapshot_count = len(self.snapshot_chain.snapshots)
+
+        try:
+            self.old_snapshot_index = int(self.old_snapshot_index)
+            self.new_snapshot_index = int(self.new_snapshot_index)
+
+        except ValueError:
+            err_print("The indexes of the snapshots must be whole numbers.")
+
+            exit(1)
+
+        end_now = False
+
+        for snapshot_index in (self.old_snapshot_index, self.new_snapshot_index):
+
+            if not (0 <= snapshot_index < snapshot_count):
+                err_print(f"There is no snapshot with index {snapshot_index} in {self.snapshot_chain_path.as_posix()}.")
+
+                end_now = True
 
         if (end_now):
             exit(1)
 
-        self.old_archive_playlists = old_archive["playlists"]
-        self.old_archive_date = parse_time(old_archive["time"])
+        self.old_archive_date = parse_time(
+            self.snapshot_chain.snapshots[self.old_snapshot_index]["time"]
+        )
+        self.new_archive_date = parse_time(
+            self.snapshot_chain.snapshots[self.new_snapshot_index]["time"]
+        )
 
-        self.new_archive_playlists = new_archive["playlists"]
-        self.new_archive_date = parse_time(new_archive["time"])
+    def close_archives(self) -> None:
+        self.old_archive_file.close()
+        self.new_archive_file.close()
 
     def open_output_file(self) -> None:
         '''
@@ -153,108 +372,173 @@ class Comparator:
         '''
         The name is pretty much self-explanatory, the bulk work of the 
         comparator.
+
+        It is timed as the "compare" span of the metrics (see Metrics.py), 
+        and when the playlists are compared one after another, each of them 
+        is a "compared_playlist" span too.
         '''
-        
-        for playlist_id in self.old_archive_playlists:
 
-            if (playlist_id in self.new_archive_playlists):
+        metrics = Metrics.get_metrics()
 
-                old_playlist = self.old_archive_playlists[playlist_id]["videos"]
-                new_playlist = self.new_archive_playlists[playlist_id]["videos"]
+        with metrics.span("compare", jobs=self.jobs):
+            self.compare()
 
-                self.changes[playlist_id] = compare_video_set(
-                    old_playlist, new_playlist
-                )
-    
-    def write_to_output(self) -> None:
+        for added, removed, changed in self.changes.values():
+            metrics.increment("videos_total", len(added), change="added")
+            metrics.increment("videos_total", len(removed), change="removed")
+            metrics.increment("videos_total", len(changed), change="changed")
+
+        metrics.increment("playlists_total", len(self.changes))
+
+        if (self.moves != None):
+            metrics.increment("videos_total", len(self.moves), change="moved")
+
+    def compare(self) -> None:
         '''
-        This method logs the findings to output file for each mutual playlist 
-        between the 2 archives.
+        This method finds the changes between the archives (or snapshots), 
+        see main_work().
         '''
-        if (len(self.changes) != 0):
 
-            time_apart = get_time_apart(
-                self.old_archive_date,
-                self.new_archive_date
+        # The snapshot store does the whole comparison in SQL.
+        if (self.snapshot_store_path != None):
+            self.changes = self.snapshot_store.compare_snapshots(
+                self.old_snapshot_id, self.new_snapshot_id
             )
 
-            self.output_file.write(f"Reporting the changes of the mutual playlists between the 2 archives after {time_apart[0]} days, {time_apart[1]} hours, {time_apart[2]} minutes, {time_apart[3]} seconds\n\n")
+            self.snapshot_store.close()
+            return
 
+        # Only the deltas between the 2 snapshots are read.
+        if (self.snapshot_chain_path != None):
+            self.changes = self.snapshot_chain.compare(
+                self.old_snapshot_index, self.new_snapshot_index
+            )
 
-        for main_loop_index, mutual_playlist_id in enumerate(self.changes):
+            self.snapshot_chain.close()
+            return
+        
+        if (self.jobs > 1 and len(self.mutual_playlist_ids) > 1):
+            self.compare_in_parallel()
 
-            this_playlist_changes: tuple = self.changes[mutual_playlist_id]
+        else:
+            metrics = Metrics.get_metrics()
 
-            if (check_changes_empty(this_playlist_changes)):
-                self.output_file.write(f"0 changes for playlist with id {mutual_playlist_id} ({YOUTUBE_PLAYLIST_PREFIX}{mutual_playlist_id}) \n\n")
-                continue
+            # Only one pair of playlists is in memory at a time.
+            for playlist_id in self.mutual_playlist_ids:
 
-            self.output_file.write(f"The changes in playlist with id {mutual_playlist_id} ({YOUTUBE_PLAYLIST_PREFIX}{mutual_playlist_id}):\n\n")
+                with metrics.span("compared_playlist", playlist=playlist_id):
+                    old_playlist = self.old_archive_reader.read_playlist(playlist_id)["videos"]
+                    new_playlist = self.new_archive_reader.read_playlist(playlist_id)["videos"]
 
-            added_videos: list = this_playlist_changes[0]
+                    self.changes[playlist_id] = compare_video_set(
+                        old_playlist, new_playlist
+                    )
 
-            self.output_file.write(f"Added ({len(added_videos)} video(s) added):\n")
+                    metrics.add_to_span("videos", len(new_playlist))
 
-            if (len(added_videos) == 0):
-                self.output_file.write("None\n\n")
+        if (self.find_moves):
+            self.find_moved_videos()
 
-            else:
-                for index, video in enumerate(added_videos):
+        self.close_archives()
 
-                    self.output_file.write(f"+ \"{video.get_name()}\" by channel \"{video.get_channel()}\"")
+    def find_moved_videos(self) -> None:
+        '''
+        This method finds the videos moved or copied between playlists, among 
+        the videos added to and removed from the mutual playlists.
 
-                    if (index != len(added_videos) - 1):
-                        
-                        self.output_file.write("\n")
-                    else:
-                        self.output_file.write("\n\n")
+        Each archive is gone through once more to index which playlists the 
+        added and removed videos are in (see build_video_index()), then 
+        every added and removed video is looked up once (see find_moves()).
+        '''
 
-            removed_videos: list = this_playlist_changes[1]
+        added_ids: Set[str] = set()
+        changed_ids: Set[str] = set()
 
-            self.output_file.write(f"Removed ({len(removed_videos)} video(s) removed):\n")
+        for added, removed, changed in self.changes.values():
+            added_ids.update(video.id for video in added)
+            changed_ids.update(video.id for video in removed)
 
-            if (len(removed_videos) == 0):
-                self.output_file.write("None\n\n")
-            
-            else:
-                for index, video in enumerate(removed_videos):
+        changed_ids |= added_ids
 
-                    self.output_file.write(f"- \"{video.get_name()}\" by channel \"{video.get_channel()}\"")
+        old_index = build_video_index(self.old_archive_reader, added_ids)
+        new_index = build_video_index(self.new_archive_reader, changed_ids)
 
-                    if (index != len(removed_videos) - 1):
-                        self.output_file.write("\n")
+        self.changes, self.moves = find_moves(
+            self.changes, 
+            old_index, 
+            new_index, 
+            set(self.old_archive_reader.offsets), 
+            set(self.new_archive_reader.offsets)
+        )
 
-                    else:
-                        self.output_file.write("\n\n")
+    def compare_in_parallel(self) -> None:
+        '''
+        This method compares the mutual playlists like main_work() does, but 
+        splits them into shards that a pool of processes compare at the same 
+        time.
+
+        Every process reads the playlists of its shards from the archives on 
+        its own, so only where the playlists are in the files goes to the 
+        processes, and only the changes found (as tuples of strings, see 
+        pack_changes()) come back. The changes are put in self.changes in the 
+        same order as when comparing one playlist after another.
+        '''
 
-            changed_videos: list = this_playlist_changes[2]
+        from concurrent.futures import ProcessPoolExecutor
 
-            self.output_file.write(f"Changed ({len(changed_videos)} video(s) changed):\n")            
+        shard_size = math.ceil(
+            len(self.mutual_playlist_ids)/(SHARDS_PER_JOB*self.jobs)
+        )
 
-            if (len(changed_videos) == 0):
-                
-                if (main_loop_index != len(self.changes) - 1):
-                    self.output_file.write("None\n\n" + "-"*156 + "\n\n")
-                else:
-                    self.output_file.write("None")
-            
-            else: 
-                for index, videos in enumerate(changed_videos):
-                    old_video: Video = videos[0]
-                    new_video: Video = videos[1]
+        shards = [
+            self.mutual_playlist_ids[start:start + shard_size] 
+            for start in range(0, len(self.mutual_playlist_ids), shard_size)
+        ]
+
+        with ProcessPoolExecutor(max_workers=min(self.jobs, len(shards))) as executor:
+
+            # map() gives the results in the order of the shards, no matter 
+            # which one is done first.
+            results = executor.map(
+                compare_playlist_shard, 
+                itertools.repeat(self.old_archive_file_path), 
+                itertools.repeat(self.new_archive_file_path), 
+                [
+                    {playlist_id: self.old_archive_reader.offsets[playlist_id] for playlist_id in shard} 
+                    for shard in shards
+                ], 
+                [
+                    {playlist_id: self.new_archive_reader.offsets[playlist_id] for playlist_id in shard} 
+                    for shard in shards
+                ]
+            )
+
+            for shard, shard_changes in zip(shards, results):
+
+                for playlist_id, packed_changes in zip(shard, shard_changes):
+                    self.changes[playlist_id] = unpack_changes(packed_changes)
+    
+    def write_to_output(self) -> None:
+        '''
+        This method logs the findings to output file for each mutual playlist 
+        between the 2 archives, in the format asked for (see ReportWriter.py).
+        '''
 
-                    if (old_video.is_deleted()):
-                        self.output_file.write(f"{old_video.get_name()} --> \"{new_video.get_name()}\" by channel \"{new_video.get_channel()}\"")
+        report_writer = create_report_writer(self.report_format, self.output_file)
+
+        report_writer.begin(
+            self.old_archive_date, 
+            self.new_archive_date, 
+            get_time_apart(self.old_archive_date, self.new_archive_date)
+        )
 
-                    else:
-                        self.output_file.write(f"\"{old_video.get_name()}\" by \"{old_video.get_channel()}\" --> {new_video.get_name()}")
+        for mutual_playlist_id, this_playlist_changes in self.changes.items():
+            report_writer.write_playlist(mutual_playlist_id, this_playlist_changes)
 
-                    if (index != len(changed_videos) - 1):
-                        self.output_file.write("\n")
+        if (self.moves != None):
+            report_writer.write_moves(self.moves)
 
-                    else:
-                        if (main_loop_index != len(self.changes) - 1):
-                            self.output_file.write("\n\n" + "-"*156 + "\n\n")
+        report_writer.finish()
 
         self.output_file.close()
          
@@ -266,6 +550,10 @@ def compare_video_set(
     This function takes in 2 videos attributes of a playlist then find the 
     differences between them.
 
+    It only does dictionary lookups so it takes linear time in the size of 
+    the playlists, Video objects are only made for the videos that end up in 
+    the result and the given dictionaries are not modified.
+
     Params:
         videos attribute of the first playlist.
         videos attribute of the second playlist.
@@ -279,64 +567,265 @@ def compare_video_set(
     '''
 
     added: List[Video] = []
-    changed: List[Video] = []
+    removed: List[Video] = []
 
     # This is the odd one out because if a video is changed, we want to know 
     # it before and after being changed, unlike removed and added where we 
     # only need to know the video at 1 timestamp only.
-    removed: List[List[Video]] = []
-
-    # Iterate through the keys which are the id of the videos.
-    old_videos_id: str = list(old_video_set.keys())
+    changed: List[List[Video]] = []
 
-    while len(old_videos_id) > 0:
+    # Iterate through the keys which are the id of the videos, in the order 
+    # of the old playlist.
+    for video_id, old_video in old_video_set.items():
 
-        current_video_id = old_videos_id[0]
-
-        current_video = Video.initiate_video_from_json(
-            old_video_set[current_video_id]
-        )
+        new_video = new_video_set.get(video_id)
 
         # If the video in old playlist is not there anymore in the new 
         # playlist then that means that video was removed.
+        if (new_video == None):
+            removed.append(Video.initiate_video_from_json(old_video))
+            continue
 
-        if (current_video_id not in new_video_set):
-            removed.append(current_video)
+        # A video changed if it went from deleted to not deleted or the other 
+        # way around, which can be told from the channel alone.
+        if ((old_video["channel"] == UNKNOWN_CHANNEL) != 
+            (new_video["channel"] == UNKNOWN_CHANNEL)):
+
+            changed.append([
+                Video.initiate_video_from_json(old_video), 
+                Video.initiate_video_from_json(new_video)
+            ])
+
+    # The videos of the new playlist that are not in the old one were added.
+    for video_id, new_video in new_video_set.items():
+
+        if (video_id not in old_video_set):
+            added.append(Video.initiate_video_from_json(new_video))
+
+    return added, removed, changed
+
+def build_video_index(reader, video_ids: Set[str]) -> Dict[str, List[str]]:
+    '''
+    This function goes through every playlist of an archive once and finds 
+    which playlists each of the given videos is in.
+
+    Only the given videos are indexed, so the index is as big as the number 
+    of changes instead of the number of videos in the archive.
+
+    Params:
+        reader: the ArchiveReader (or BinaryArchiveReader) of the archive.
+        video_ids: the ids of the videos to index.
+
+    Returns:
+        video id -> ids of the playlists it is in, in the order of the 
+        archive (videos in no playlist are left out).
+    '''
+
+    index: Dict[str, List[str]] = {}
+
+    if (len(video_ids) == 0):
+        return index
+
+    for playlist_id, playlist in reader.iterate():
+        videos = playlist["videos"]
+
+        # Whichever is smaller is gone through.
+        if (len(video_ids) < len(videos)):
+            found = [video_id for video_id in video_ids if video_id in videos]
 
-        # We can't check for added videos yet, however we can check for 
-        # changed videos.
         else:
-            new_current_video = Video.initiate_video_from_json(
-                new_video_set[current_video_id]
-            )
+            found = [video_id for video_id in videos if video_id in video_ids]
 
-            # The idea is that we want to remove the videos we have been 
-            # through.
-            new_video_set.pop(current_video_id)
+        for video_id in found:
+            index.setdefault(video_id, []).append(playlist_id)
 
-            # Is this readable at all lol.
-            video_changed = (
-                (current_video.is_deleted() and 
-                not new_current_video.is_deleted()) or 
+    return index
 
-                (not current_video.is_deleted() and
-                new_current_video.is_deleted())
-            )
+def find_moves(
+    changes: Dict[str, tuple], 
+    old_index: Dict[str, List[str]], 
+    new_index: Dict[str, List[str]], 
+    old_playlist_ids: Set[str], 
+    new_playlist_ids: Set[str]
+) -> Tuple[Dict[str, tuple], List[tuple]]:
+    '''
+    This function tells apart, among the videos added to and removed from 
+    the mutual playlists, the ones that were moved or copied from one 
+    playlist to another. A video added to playlist B is:
+        - moved from A if it was removed from the mutual playlist A, 
+        - otherwise copied from A if A had it in the old archive and still 
+        has it in the new one, 
+        - otherwise moved from A if A had it but is not in the new archive.
+    And a video removed from playlist A (that did not go to a mutual 
+    playlist) is moved to C if C has it but is not in the old archive.
+
+    Every video is looked up once, so it takes linear time in the number of 
+    changes.
 
-            if (video_changed):
-                changed.append([current_video, new_current_video])
+    Params:
+        changes: the changes of each mutual playlist (like 
+        Comparator.changes).
+        old_index: build_video_index() of the old archive, with at least the 
+        added videos.
+        new_index: build_video_index() of the new archive, with at least the 
+        added and removed videos.
+        old_playlist_ids, new_playlist_ids: the ids of all the playlists of 
+        the old and new archives.
 
-        old_videos_id.pop(0)
+    Returns:
+        The changes without the moved and copied videos, and a list of 
+        (kind, from playlist id, to playlist id, old video, new video) for 
+        each of them, where kind is "moved" or "copied", and old video (new 
+        video) is None if the video is not in the changes of the playlist it 
+        was moved from (to).
+    '''
 
-    # After exhausting the old version of the playlist, check for all newly 
-    # added videos.
+    # Video id -> (playlist id, video) for each mutual playlist it was 
+    # removed from, the ones not matched with an added video yet.
+    removed_from: Dict[str, List[Tuple[str, Video]]] = {}
 
-    for video in new_video_set:
-        added.append(Video.initiate_video_from_json(
-            new_video_set[video]
-        ))
+    for playlist_id, (added, removed, changed) in changes.items():
 
-    return added, removed, changed
+        for video in removed:
+            removed_from.setdefault(video.id, []).append((playlist_id, video))
+
+    moves: List[tuple] = []
+
+    # (playlist id, video id) of the videos that are part of a move.
+    taken: Set[Tuple[str, str]] = set()
+
+    for playlist_id, (added, removed, changed) in changes.items():
+
+        for video in added:
+            sources = removed_from.get(video.id)
+
+            if (sources):
+                source_id, old_video = sources.pop(0)
+
+                moves.append(("moved", source_id, playlist_id, old_video, video))
+
+                taken.add((source_id, video.id))
+                taken.add((playlist_id, video.id))
+                continue
+
+            old_playlists = old_index.get(video.id, [])
+            new_playlists = new_index.get(video.id, [])
+
+            kind = None
+
+            for source_id in old_playlists:
+
+                if (source_id != playlist_id and source_id in new_playlists):
+                    kind = "copied"
+                    break
+
+            else:
+                for source_id in old_playlists:
+
+                    if (source_id not in new_playlist_ids):
+                        kind = "moved"
+                        break
+
+            if (kind != None):
+                moves.append((kind, source_id, playlist_id, None, video))
+
+                taken.add((playlist_id, video.id))
+
+    for sources in removed_from.values():
+
+        for source_id, old_video in sources:
+
+            for destination_id in new_index.get(old_video.id, []):
+
+                if (destination_id not in old_playlist_ids):
+                    moves.append(("moved", source_id, destination_id, old_video, None))
+
+                    taken.add((source_id, old_video.id))
+                    break
+
+    if (len(taken) == 0):
+        return changes, moves
+
+    remaining_changes: Dict[str, tuple] = {
+        playlist_id: (
+            [video for video in added if (playlist_id, video.id) not in taken], 
+            [video for video in removed if (playlist_id, video.id) not in taken], 
+            changed
+        )
+        for playlist_id, (added, removed, changed) in changes.items()
+    }
+
+    return remaining_changes, moves
+
+def compare_playlist_shard(
+    old_archive_file_path: pathlib.Path, 
+    new_archive_file_path: pathlib.Path, 
+    old_offsets: Dict[str, int], 
+    new_offsets: Dict[str, int]
+) -> List[tuple]:
+    '''
+    This function compares some of the mutual playlists of 2 archives, it is 
+    what each process does in Comparator.compare_in_parallel().
+
+    Params:
+        The paths of the old and new archives (already checked), and for 
+        each archive, playlist id -> offset of the playlist (see 
+        ArchiveReader.offsets) for the playlists to compare. Both must have 
+        the same playlist ids in the same order.
+
+    Returns:
+        The changes in each playlist (packed by pack_changes()), in the order 
+        of the playlist ids.
+    '''
+
+    with open(old_archive_file_path, "rb") as old_archive_file, \
+         open(new_archive_file_path, "rb") as new_archive_file:
+
+        old_archive_reader = create_archive_reader(old_archive_file)
+        new_archive_reader = create_archive_reader(new_archive_file)
+
+        old_archive_reader.offsets.update(old_offsets)
+        new_archive_reader.offsets.update(new_offsets)
+
+        return [
+            pack_changes(compare_video_set(
+                old_archive_reader.read_playlist(playlist_id)["videos"], 
+                new_archive_reader.read_playlist(playlist_id)["videos"]
+            ))
+            for playlist_id in old_offsets
+        ]
+
+def pack_changes(changes: tuple) -> tuple:
+    '''
+    This function turns the result of compare_video_set() into plain tuples 
+    of (name, channel, id), which are a lot cheaper to send between processes 
+    than Video objects.
+    '''
+
+    added, removed, changed = changes
+
+    return (
+        [(video.name, video.channel, video.id) for video in added], 
+        [(video.name, video.channel, video.id) for video in removed], 
+        [
+            ((old.name, old.channel, old.id), (new.name, new.channel, new.id)) 
+            for old, new in changed
+        ]
+    )
+
+def unpack_changes(packed_changes: tuple) -> tuple:
+    '''
+    This function turns the result of pack_changes() back into the result of 
+    compare_video_set().
+    '''
+
+    added, removed, changed = packed_changes
+
+    return (
+        [Video(*video) for video in added], 
+        [Video(*video) for video in removed], 
+        [[Video(*old), Video(*new)] for old, new in changed]
+    )
 
 def check_changes_empty(changes: tuple) -> bool:
     '''
@@ -379,7 +868,8 @@ def convert_json_from_file_to_dict(file) -> dict:
 def check_format_of_video(video: dict) -> bool:
     '''
     This function checks whether the given dictionary is of correct format of 
-    a video as defined in README.
+    a video as defined in README (see find_video_error() in validation.py 
+    to find out what is wrong).
 
     Params:
         dict which is the video.
@@ -388,29 +878,13 @@ def check_format_of_video(video: dict) -> bool:
         True if it is correct, false otherwise.
     ''' 
 
-    if not (isinstance(video, dict)):
-        return False
-
-    if ("id" not in video or 
-        "name" not in video or
-        "channel" not in video or 
-        "link" not in video):
-
-        return False
-
-    if (not isinstance(video["id"], str) or 
-        not isinstance(video["name"], str) or 
-        not isinstance(video["channel"], str) or 
-        not isinstance(video["link"], str)):
-        
-        return False
-
-    return True
+    return find_video_error(video) == None
 
 def check_format_of_playlist(playlist: dict) -> bool:
     '''
     This function checks whether the given dictionary is of correct format of 
-    a playlist as defined in README.
+    a playlist as defined in README (see find_playlist_error() in 
+    validation.py to find out what is wrong).
 
     Params:
         dict which is the playlist.
@@ -419,34 +893,13 @@ def check_format_of_playlist(playlist: dict) -> bool:
         True if it is correct, false otherwise.
     '''
 
-    if (not isinstance(playlist, dict)):
-        return False
-
-    if ("id" not in playlist or 
-        "videos" not in playlist or 
-        "link" not in playlist):
-
-        return False
-
-    if (not isinstance(playlist["id"], str) or 
-        not isinstance(playlist["videos"], dict) or 
-        not isinstance(playlist["link"], str)):
-
-        return False
-
-    videos = playlist["videos"]
-
-    for video_id in videos:
-        
-        if not (check_format_of_video(videos[video_id])):
-            return False
-
-    return True
+    return find_playlist_error(playlist) == None
 
 def check_format_of_archive(archive: dict) -> bool:
     '''
     This function checks whether the given dictionary is of correct format of 
-    an archive as defined in README.
+    an archive as defined in README (see find_archive_error() in 
+    validation.py to find out what is wrong).
 
     Params:
         dict which is the archive.
@@ -455,30 +908,27 @@ def check_format_of_archive(archive: dict) -> bool:
         True if it is correct, false otherwise.
     '''
 
-    if not (isinstance(archive, dict)):
-        return False
-
-    if ("time" not in archive or
-        "playlists" not in archive):
-
-        return False
-
-    if (not isinstance(archive["time"], str) or 
-        not isinstance(archive["playlists"], dict)):
+    return find_archive_error(archive) == None
 
-        return False
-
-    if (not check_time_format(archive["time"])):
-        return False
-
-    playlists = archive["playlists"]
+def check_format_of_archive_stream(
+    reader: ArchiveReader, 
+    trust: bool = False
+) -> bool:
+    '''
+    This function checks whether the archive being read by the given reader 
+    is of correct format as defined in README, like check_format_of_archive() 
+    but one playlist at a time (see find_archive_stream_error() in 
+    validation.py, which also explains trust).
 
-    for playlist_id in playlists:
+    Params:
+        The ArchiveReader (or BinaryArchiveReader) of the archive, which 
+        must not have been iterated yet.
 
-        if not (check_format_of_playlist(playlists[playlist_id])):
-            return False
+    Returns:
+        True if it is correct, false otherwise.
+    '''
 
-    return True
+    return find_archive_stream_error(reader, trust) == None
 
 def check_time_format(time_str: str) -> bool:
     '''
@@ -492,17 +942,13 @@ def check_time_format(time_str: str) -> bool:
         True if correct, False otherwise.
     '''
 
-    try:
-        time.strptime(time_str, TIME_FORMAT_STR)
-    except ValueError:
-        return False
-
-    return True
+    return parse_time_str(time_str) != None
 
 def parse_time(time_str: str) -> time.struct_time:
     '''
     This function will parse the time string of the correct format into the 
-    equivalent struct_time object.
+    equivalent struct_time object. The time string is only parsed once even 
+    if it was checked with check_time_format() before.
 
     Params:
         str which is the time string of the correct format.
@@ -511,7 +957,12 @@ def parse_time(time_str: str) -> time.struct_time:
         The equivalent struct_time object.
     '''
 
-    return time.strptime(time_str, TIME_FORMAT_STR)
+    parsed_time = parse_time_str(time_str)
+
+    if (parsed_time == None):
+        raise ValueError(f"{time_str!r} is not of the format {TIME_FORMAT_STR!r}")
+
+    return parsed_time
 
 def get_time_apart(
     time1: time.struct_time,
@@ -564,18 +1015,95 @@ def get_time_apart(
 
 def main():
 
-    if (len(sys.argv) != 4):
-        err_print(
-            "Usage: python3 comparator.py <old_archive> <new_archive> <output_file>"
-        )
+    parser = argparse.ArgumentParser(
+        description="Compare 2 archives together to point out what has changed."
+    )
+
+    parser.add_argument("old_archive")
+    parser.add_argument("new_archive")
+    parser.add_argument("output_file")
+    parser.add_argument(
+        "--store",
+        default=None,
+        help="a snapshot store, <old_archive> and <new_archive> are then ids of snapshots in it"
+    )
+    parser.add_argument(
+        "--chain",
+        default=None,
+        help="a snapshot chain, <old_archive> and <new_archive> are then indexes of snapshots in it"
+    )
+
+    parser.add_argument(
+        "-j", "--jobs",
+        type=int,
+        default=1,
+        help="the number of processes comparing the mutual playlists of 2 archives at the same time"
+    )
+    parser.add_argument(
+        "-f", "--format",
+        choices=list(REPORT_WRITERS),
+        default="text",
+        help="the format of the output file (text by default)"
+    )
+    parser.add_argument(
+        "--moves",
+        action="store_true",
+        help="report videos that went from one playlist to another as moved or copied"
+    )
+    parser.add_argument(
+        "--trust",
+        action="store_true",
+        help="skip checking archives whose checksum shows they were written by archiver.py"
+    )
+    parser.add_argument(
+        "--metrics",
+        default=None,
+        help="a file the metrics of the comparison are written to, as JSON"
+    )
+    parser.add_argument(
+        "--prometheus",
+        default=None,
+        help="a file the metrics of the comparison are written to, in the Prometheus text format"
+    )
+
+    args = parser.parse_args()
+
+    if (args.moves and (args.store != None or args.chain != None)):
+        err_print("--moves only works when comparing 2 archives.")
 
         exit(1)
 
-    comparator: Comparator = Comparator(sys.argv[1], sys.argv[2], sys.argv[3])
+    if (args.jobs < 1):
+        err_print("The number of jobs must be at least 1.")
+
+        exit(1)
+
+    comparator: Comparator = Comparator(
+        args.old_archive, 
+        args.new_archive, 
+        args.output_file, 
+        args.store, 
+        args.chain,
+        args.trust,
+        args.jobs,
+        args.format,
+        args.moves
+    )
     comparator.fetch_archives()
     comparator.open_output_file()
     comparator.main_work()
     comparator.write_to_output()
 
+    if (args.metrics != None or args.prometheus != None):
+        metrics_written = Metrics.get_metrics().write(
+            pathlib.Path(args.metrics).expanduser().resolve() if (args.metrics != None) else None,
+            pathlib.Path(args.prometheus).expanduser().resolve() if (args.prometheus != None) else None
+        )
+
+        if not (metrics_written):
+            err_print("Could not write the metrics files.")
+
+            exit(1)
+
 if (__name__ == "__main__"):
     main()
\ No newline at end of file
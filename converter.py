@@ -0,0 +1,135 @@
+'''
+converter.py: converts an archive between the JSON format (see README) and 
+the binary format (see BinaryArchive.py). The conversion is lossless both 
+ways, converting an archive there and back gives the same archive 
+(playlists, videos and time).
+
+The direction is worked out from the input, a JSON archive is converted to 
+the binary format and a binary archive to JSON.
+
+Usage: python3 converter.py <input_archive> <output_archive>
+'''
+
+# Python
+import sys
+import pathlib
+import itertools
+
+# Internal
+from utilities import err_print, input_file_opening, overwriting_file_warning
+from PlaceHolder import PlaceHolder
+from ArchiveWriter import ArchiveWriter
+from BinaryArchive import BinaryArchiveWriter, create_archive_reader, is_binary_archive
+from comparator import check_format_of_playlist, check_time_format
+
+def convert_archive(
+    input_file, 
+    input_file_path: pathlib.Path, 
+    output_file_path: pathlib.Path
+) -> bool:
+    '''
+    This function converts the archive of the given file into the other 
+    format, one playlist at a time.
+
+    Params:
+        input_file: the archive, opened for reading in binary mode.
+        input_file_path: the path of the archive, for error messages.
+        output_file_path: where the converted archive is written.
+
+    Returns:
+        True if successful, False if the input is not a valid archive or the 
+        output cannot be written (the reason is already printed).
+    '''
+
+    is_valid = True
+
+    try:
+        reader = create_archive_reader(input_file)
+
+        if (is_binary_archive(input_file)):
+            writer_class = ArchiveWriter
+
+        else:
+            writer_class = BinaryArchiveWriter
+
+        playlists = reader.iterate()
+
+        # The time of a JSON archive is only known once the reader went past 
+        # it, which is before the playlists in archives written by 
+        # archiver.py, so the first playlist is read before the writer is 
+        # made.
+        first_playlist = next(playlists, None)
+
+        is_valid = (
+            isinstance(reader.time, str) and 
+            check_time_format(reader.time)
+        )
+
+        if not (is_valid):
+            raise ValueError("The time of the archive is not valid")
+
+        writer = writer_class(output_file_path, reader.time)
+
+        if not (writer.open()):
+            return False
+
+        try:
+            if (first_playlist != None):
+                playlists = itertools.chain([first_playlist], playlists)
+
+            for playlist_id, playlist in playlists:
+
+                if not (check_format_of_playlist(playlist)):
+                    raise ValueError(f"The playlist {playlist_id} is not valid")
+
+                writer.write_playlist(playlist)
+
+            writer.finish()
+
+        finally:
+            writer.close()
+
+    except ValueError:
+        is_valid = False
+
+    if not (is_valid):
+        err_print(f"File {input_file_path.as_posix()} is not of correct format or is corrupted, please check it again.")
+
+    return is_valid
+
+def main() -> None:
+
+    if (len(sys.argv) != 3):
+        err_print(
+            "Usage: python3 converter.py <input_archive> <output_archive>"
+        )
+
+        exit(1)
+
+    input_file_path = pathlib.Path(sys.argv[1]).expanduser().resolve()
+    output_file_path = pathlib.Path(sys.argv[2]).expanduser().resolve()
+
+    if (output_file_path.exists()):
+
+        if (output_file_path.samefile(input_file_path)):
+            err_print("Input file cannot be the same file as output file. Please recheck your arguments.")
+
+            exit(1)
+
+        if not (overwriting_file_warning(output_file_path.name)):
+            exit()
+
+    input_file = input_file_opening(input_file_path, binary=True)
+
+    if (input_file == PlaceHolder.get_place_holder()):
+        exit(1)
+
+    converted = convert_archive(input_file, input_file_path, output_file_path)
+
+    input_file.close()
+
+    if not (converted):
+        exit(1)
+
+if (__name__ == "__main__"):
+    main()
@@ -0,0 +1,170 @@
+'''
+lookup.py: finds out what videos were (their last known name and channel)
+from their ids, using an index of archives (see VideoLookup.py).
+
+Usage: python3 lookup.py <index_file> add <archive> [<archive> ...]
+       python3 lookup.py <index_file> find <video_id> [<video_id> ...]
+       python3 lookup.py <index_file> list
+
+"add" adds archives (in either format) to the index, creating it if needed.
+"find" looks videos up in the index, without reading any archive. "list"
+shows the archives in the index.
+'''
+
+# Python
+import sys
+import pathlib
+from typing import List, Union
+
+# Internal
+from utilities import err_print, input_file_opening
+from PlaceHolder import PlaceHolder
+from VideoLookup import VideoLookup
+
+USAGE: List[str] = [
+    "Usage: python3 lookup.py <index_file> add <archive> [<archive> ...]",
+    "       python3 lookup.py <index_file> find <video_id> [<video_id> ...]",
+    "       python3 lookup.py <index_file> list"
+]
+
+def add_archives(index, archive_paths: List[pathlib.Path]) -> Union[int, None]:
+    '''
+    This function adds archives to an index, all at once so that the index
+    is only written once.
+
+    Params:
+        index: a VideoLookup or a TitleSearch (see search.py).
+        archive_paths: the archives to add.
+
+    Returns:
+        What the add_archives() method of the index returns if successful, 
+        None otherwise (the reason is already printed).
+    '''
+
+    # Only imported here since comparator.py takes a while to import, and 
+    # looking videos up should be as fast as possible.
+    from BinaryArchive import create_archive_reader
+    from comparator import check_format_of_playlist, check_time_format
+
+    files = []
+    archives = []
+
+    try:
+        for archive_path in archive_paths:
+            file = input_file_opening(archive_path, binary=True)
+
+            if (file == PlaceHolder.get_place_holder()):
+                return None
+
+            files.append(file)
+
+            try:
+                archives.append((archive_path.as_posix(), create_archive_reader(file)))
+
+            except ValueError:
+                err_print(f"File {archive_path.as_posix()} is not of correct format or is corrupted, please check it again.")
+
+                return None
+
+        try:
+            return index.add_archives(
+                archives,
+                check_format_of_playlist,
+                check_time_format
+            )
+
+        except ValueError:
+            err_print("One of the archives is not of correct format or is corrupted, please check them again.")
+
+            return None
+
+        except OSError:
+            return None
+
+    finally:
+        for file in files:
+            file.close()
+
+def find_videos(index: VideoLookup, video_ids: List[str]) -> bool:
+    '''
+    This function prints what each video was.
+
+    Returns:
+        True if every video was found, False otherwise.
+    '''
+
+    found_all = True
+
+    for video_id in video_ids:
+        video = index.lookup(video_id)
+
+        if (video == None):
+            print(f"{video_id}: not in any archive")
+
+            found_all = False
+            continue
+
+        if (video["deleted"]):
+            print(f"{video_id}: already deleted in every archive, last seen on {video['time']} ({video['path']})")
+            continue
+
+        print(f"{video_id}: \"{video['name']}\" by channel \"{video['channel']}\", as of {video['time']} ({video['path']})")
+
+    return found_all
+
+def main() -> None:
+
+    arguments = sys.argv[1:]
+
+    if not (
+        (len(arguments) == 2 and arguments[1] == "list") or
+        (len(arguments) >= 3 and arguments[1] in ("add", "find"))):
+
+        for line in USAGE:
+            err_print(line)
+
+        exit(1)
+
+    index_file_path = pathlib.Path(arguments[0]).expanduser().resolve()
+
+    if (arguments[1] != "add" and not index_file_path.exists()):
+        err_print(f"File {index_file_path.as_posix()} does not exist")
+
+        exit(1)
+
+    try:
+        index = VideoLookup(index_file_path)
+
+    except (OSError, ValueError):
+        err_print(f"File {index_file_path.as_posix()} is not a video index or is corrupted, please check it again.")
+
+        exit(1)
+
+    if (arguments[1] == "list"):
+
+        for time_str, path in index.archives:
+            print(f"{time_str}: {path}")
+
+        success = True
+
+    elif (arguments[1] == "add"):
+        video_count = add_archives(
+            index,
+            [pathlib.Path(archive).expanduser().resolve() for archive in arguments[2:]]
+        )
+
+        success = (video_count != None)
+
+        if (success):
+            print(f"Added {len(arguments) - 2} archive(s), the index now has {video_count} video(s)")
+
+    else:
+        success = find_videos(index, arguments[2:])
+
+    index.close()
+
+    if not (success):
+        exit(1)
+
+if (__name__ == "__main__"):
+    main()
@@ -0,0 +1,125 @@
+'''
+search.py: finds videos from a part of their name or channel, using a
+trigram index of archives (see TitleSearch.py).
+
+Usage: python3 search.py <index_file> add <archive> [<archive> ...]
+       python3 search.py <index_file> find [--fuzzy] <text> [<text> ...]
+
+"add" adds archives (in either format) to the index, creating it if needed.
+"find" gives the names and channels that contain the text (the words given
+are joined with spaces), ignoring case, or with --fuzzy the ones closest to
+it.
+'''
+
+# Python
+import sys
+import pathlib
+from typing import List
+
+# Internal
+from utilities import err_print
+from TitleSearch import TitleSearch, MIN_QUERY_LENGTH
+from lookup import add_archives
+
+USAGE: List[str] = [
+    "Usage: python3 search.py <index_file> add <archive> [<archive> ...]",
+    "       python3 search.py <index_file> find [--fuzzy] <text> [<text> ...]"
+]
+
+# How many video ids are printed for a result, a channel can have thousands.
+PRINTED_VIDEO_IDS: int = 5
+
+def find_text(index: TitleSearch, words: List[str]) -> bool:
+    '''
+    This function prints the names and channels that match the text.
+
+    Returns:
+        True if anything matched, False otherwise.
+    '''
+
+    fuzzy = (words[0] == "--fuzzy")
+
+    if (fuzzy):
+        words = words[1:]
+
+    query = " ".join(words)
+
+    if (len(query) < MIN_QUERY_LENGTH):
+        err_print(f"The text to find has to be at least {MIN_QUERY_LENGTH} characters long")
+
+        return False
+
+    results = index.search(query, fuzzy)
+
+    if not (results):
+        print("Nothing found")
+
+        return False
+
+    for result in results:
+        video_ids = ", ".join(result["video_ids"][:PRINTED_VIDEO_IDS])
+
+        if (len(result["video_ids"]) > PRINTED_VIDEO_IDS):
+            video_ids += ", ..."
+
+        score = f" [{result['score']:.0%}]" if (fuzzy) else ""
+
+        print(f"{result['kind']} \"{result['text']}\"{score}: {len(result['video_ids'])} video(s) ({video_ids})")
+
+    return True
+
+def main() -> None:
+
+    arguments = sys.argv[1:]
+
+    if not (
+        len(arguments) >= 3 and arguments[1] in ("add", "find") and
+        arguments[2:] != ["--fuzzy"]):
+
+        for line in USAGE:
+            err_print(line)
+
+        exit(1)
+
+    index_file_path = pathlib.Path(arguments[0]).expanduser().resolve()
+
+    if (arguments[1] != "add" and not index_file_path.exists()):
+        err_print(f"File {index_file_path.as_posix()} does not exist")
+
+        exit(1)
+
+    try:
+        index = TitleSearch(index_file_path)
+
+    except (OSError, ValueError):
+        err_print(f"File {index_file_path.as_posix()} is not a search index or is corrupted, please check it again.")
+
+        exit(1)
+
+    if (arguments[1] == "add"):
+        entry_count = add_archives(
+            index,
+            [pathlib.Path(archive).expanduser().resolve() for archive in arguments[2:]]
+        )
+
+        success = (entry_count != None)
+
+        if (success):
+            print(f"Added {len(arguments) - 2} archive(s), the index now has {entry_count} name(s) and channel(s)")
+
+    else:
+        try:
+            success = find_text(index, arguments[2:])
+
+        except ValueError:
+            err_print(f"File {index_file_path.as_posix()} is corrupted, please check it again.")
+
+            success = False
+
+    index.close()
+
+    if not (success):
+        exit(1)
+
+if (__name__ == "__main__"):
+    main()
@@ -0,0 +1,158 @@
+'''
+snapshots.py: manages a snapshot store (see SnapshotStore.py), the SQLite 
+database that keeps the history of archives.
+
+Usage: python3 snapshots.py <database> list
+       python3 snapshots.py <database> import <archive> [<archive> ...]
+
+"list" shows every snapshot with its id, which is what comparator.py --store 
+takes. "import" adds existing archives (in either format) as new snapshots, 
+in the order given.
+'''
+
+# Python
+import sys
+import sqlite3
+import pathlib
+import collections
+
+# Internal
+from utilities import err_print, input_file_opening
+from PlaceHolder import PlaceHolder
+from SnapshotStore import SnapshotStore
+from BinaryArchive import create_archive_reader
+from comparator import check_format_of_playlist, check_time_format
+
+def describe_integrity_error(playlist_id: str, playlist: dict) -> str:
+    '''
+    This function explains why a playlist could not be added to the store. A 
+    playlist of the store cannot have the same video twice, which an archive 
+    can if its videos are not keyed by their id (see FLAG_VIDEO_KEYS in 
+    BinaryArchive.py), and a snapshot cannot have the same playlist twice.
+
+    Returns:
+        The description of the problem.
+    '''
+
+    video_id_counts = collections.Counter(
+        video["id"] for video in playlist["videos"].values()
+    )
+
+    for video_id, count in video_id_counts.items():
+
+        if (count > 1):
+            return f"the playlist {playlist_id} has the video {video_id} {count} times"
+
+    return f"the playlist {playlist_id} appears more than once"
+
+def import_archive(store: SnapshotStore, archive_path: pathlib.Path) -> bool:
+    '''
+    This function adds an archive to the store as a new snapshot, one 
+    playlist at a time.
+
+    Params:
+        store: the snapshot store.
+        archive_path: the path to the archive.
+
+    Returns:
+        True if successful, False otherwise (the reason is already printed).
+    '''
+
+    file = input_file_opening(archive_path, binary=True)
+
+    if (file == PlaceHolder.get_place_holder()):
+        return False
+
+    is_valid = True
+    integrity_error = None
+
+    try:
+        reader = create_archive_reader(file)
+
+        snapshot_id = store.begin_snapshot("")
+
+        for playlist_id, playlist in reader.iterate():
+
+            if not (check_format_of_playlist(playlist)):
+                raise ValueError(f"The playlist {playlist_id} is not valid")
+
+            try:
+                store.add_playlist(snapshot_id, playlist)
+
+            except sqlite3.IntegrityError:
+                integrity_error = describe_integrity_error(playlist_id, playlist)
+
+                raise ValueError(integrity_error)
+
+        # The time of a JSON archive may come after its playlists.
+        if (not isinstance(reader.time, str) or 
+            not check_time_format(reader.time)):
+
+            raise ValueError("The time of the archive is not valid")
+
+        store.set_snapshot_time(snapshot_id, reader.time)
+        store.commit_snapshot()
+
+    except ValueError:
+        store.rollback_snapshot()
+        is_valid = False
+
+    file.close()
+
+    if (integrity_error != None):
+        err_print(f"File {archive_path.as_posix()} cannot be added to the snapshot store, {integrity_error}.")
+
+        return False
+
+    if not (is_valid):
+        err_print(f"File {archive_path.as_posix()} is not of correct format or is corrupted, please check it again.")
+
+        return False
+
+    print(f"Imported {archive_path.as_posix()} as snapshot {snapshot_id}")
+
+    return True
+
+def main() -> None:
+
+    if (len(sys.argv) < 3 or 
+        sys.argv[2] not in ("list", "import") or 
+        (sys.argv[2] == "import" and len(sys.argv) < 4)):
+
+        err_print("Usage: python3 snapshots.py <database> list")
+        err_print("       python3 snapshots.py <database> import <archive> [<archive> ...]")
+
+        exit(1)
+
+    database_path = pathlib.Path(sys.argv[1]).expanduser().resolve()
+
+    if (sys.argv[2] == "list" and not database_path.exists()):
+        err_print(f"File {database_path.as_posix()} does not exist")
+
+        exit(1)
+
+    try:
+        store = SnapshotStore(database_path)
+
+        if (sys.argv[2] == "list"):
+
+            for snapshot_id, time_str, playlist_count, video_count in store.get_snapshots():
+                print(f"{snapshot_id}: {time_str} ({playlist_count} playlist(s), {video_count} video(s))")
+
+        else:
+            for archive in sys.argv[3:]:
+
+                if not (import_archive(store, pathlib.Path(archive).expanduser().resolve())):
+                    store.close()
+
+                    exit(1)
+
+        store.close()
+
+    except sqlite3.Error:
+        err_print(f"File {database_path.as_posix()} is not a snapshot store or is corrupted, please check it again.")
+
+        exit(1)
+
+if (__name__ == "__main__"):
+    main()
@@ -0,0 +1,308 @@
+'''
+timeline.py: goes through any number of archives in the order of their time 
+and reports the lifecycle of every video that changed: when it was added, 
+removed, deleted or restored, in every playlist.
+
+The archives (in either format) are read in a single pass, one playlist at 
+a time, and only the videos currently in the playlists (plus the history of 
+the ones that changed) are kept in memory, no matter how many archives there 
+are.
+
+Usage: python3 timeline.py <output_file> <archive> [<archive> ...]
+'''
+
+# Python
+import sys
+import pathlib
+import time
+import os
+from typing import Dict, List, Tuple
+
+# Internal
+from Video import YOUTUBE_VIDEO_PREFIX, UNKNOWN_CHANNEL
+from configuration import YOUTUBE_PLAYLIST_PREFIX
+from utilities import err_print, input_file_opening, output_file_opening, overwriting_file_warning
+from PlaceHolder import PlaceHolder
+from BinaryArchive import create_archive_reader
+from comparator import check_format_of_playlist, check_time_format, parse_time
+
+class Timeline:
+
+    def __init__(self, archive_file_paths: List[str], output_file_path) -> None:
+        '''
+        Just like Comparator but with any number of archives.
+        '''
+
+        self.archive_file_paths: List[pathlib.Path] = [
+            pathlib.Path(path).expanduser().resolve() 
+            for path in archive_file_paths
+        ]
+
+        self.output_file_path: pathlib.Path = pathlib.Path(
+            output_file_path
+        ).expanduser().resolve()
+
+        # The report is written next to the output file and only replaces it 
+        # once it is complete (like ArchiveWriter), so an archive found to be 
+        # invalid halfway does not cost the previous report.
+        self.temporary_file_path: pathlib.Path = self.output_file_path.with_name(
+            f".{self.output_file_path.name}.tmp"
+        )
+
+        self.output_file = PlaceHolder.get_place_holder()
+
+        # The time attribute of each archive, in the order they are gone 
+        # through (which is the order of their time).
+        self.archive_times: List[str] = []
+
+        # The videos in each playlist as of the last archive that had the 
+        # playlist: playlist id -> video id -> (deleted, name, channel). The 
+        # name and channel are the last ones known before it was deleted.
+        self.live_videos: Dict[str, Dict[str, Tuple[bool, str, str]]] = {}
+
+        # The index of the first archive each playlist is in.
+        self.first_archive_index: Dict[str, int] = {}
+
+        # The videos that changed at least once: playlist id -> video id -> 
+        # [name, channel, [(archive index, event)]], where event is one of 
+        # "added", "removed", "deleted" or "restored".
+        self.histories: Dict[str, Dict[str, list]] = {}
+
+    def fetch_archives(self) -> None:
+        '''
+        This method opens every archive just to find out its time, then sorts 
+        them by it. The archives are only read in full by main_work().
+        '''
+
+        times: List[time.struct_time] = []
+        end_now = False
+
+        for path in self.archive_file_paths:
+            file = input_file_opening(path, binary=True)
+
+            if (file == PlaceHolder.get_place_holder()):
+                exit(1)
+
+            try:
+                time_str = create_archive_reader(file).read_time()
+
+            except ValueError:
+                time_str = None
+
+            file.close()
+
+            if (not isinstance(time_str, str) or 
+                not check_time_format(time_str)):
+
+                err_print(f"File {path.as_posix()} is not of correct format or is corrupted, please check it again.")
+
+                end_now = True
+                continue
+
+            times.append(parse_time(time_str))
+            self.archive_times.append(time_str)
+
+        if (end_now):
+            exit(1)
+
+        # Only the first 6 fields (year to second) say when it was.
+        order = sorted(
+            range(len(self.archive_file_paths)), 
+            key=lambda index: tuple(times[index])[:6]
+        )
+
+        self.archive_file_paths = [self.archive_file_paths[i] for i in order]
+        self.archive_times = [self.archive_times[i] for i in order]
+
+    def open_output_file(self) -> None:
+        '''
+        Same as Comparator.open_output_file(), except that the report is 
+        written to the temporary file.
+        '''
+
+        if (self.output_file_path.exists()):
+
+            if not (overwriting_file_warning(self.output_file_path.name)):
+                exit()
+
+        self.output_file = output_file_opening(self.temporary_file_path)
+
+        if (self.output_file == PlaceHolder.get_place_holder()):
+            exit(1)
+
+    def main_work(self) -> None:
+        '''
+        This method goes through the archives in order, one playlist at a 
+        time, and records every change compared to the archive before.
+        '''
+
+        for archive_index, path in enumerate(self.archive_file_paths):
+            file = input_file_opening(path, binary=True)
+
+            if (file == PlaceHolder.get_place_holder()):
+                self.clean_up(1)
+
+            try:
+                for playlist_id, playlist in create_archive_reader(file).iterate():
+
+                    if not (check_format_of_playlist(playlist)):
+                        raise ValueError(f"The playlist {playlist_id} is not valid")
+
+                    self.update_playlist(archive_index, playlist_id, playlist)
+
+            except ValueError:
+                err_print(f"File {path.as_posix()} is not of correct format or is corrupted, please check it again.")
+
+                file.close()
+                self.clean_up(1)
+
+            file.close()
+
+    def update_playlist(
+        self, 
+        archive_index: int, 
+        playlist_id: str, 
+        playlist: dict
+    ) -> None:
+        '''
+        This method compares a playlist of an archive with the same playlist 
+        in the last archive that had it, and records the changes.
+
+        A playlist missing from an archive is not counted as emptied, it is 
+        just compared to the last archive that had it.
+        '''
+
+        previous = self.live_videos.get(playlist_id)
+
+        if (previous == None):
+            self.first_archive_index[playlist_id] = archive_index
+
+        current: Dict[str, Tuple[bool, str, str]] = {}
+
+        for video_id, video in playlist["videos"].items():
+            deleted = (video["channel"] == UNKNOWN_CHANNEL)
+
+            old = previous.get(video_id) if (previous != None) else None
+
+            # A deleted video has lost its name and channel, so the last known 
+            # ones are kept.
+            if (deleted and old != None):
+                current[video_id] = (True, old[1], old[2])
+
+            else:
+                current[video_id] = (deleted, video["name"], video["channel"])
+
+            # Everything is new in the first archive that has the playlist.
+            if (previous == None):
+                continue
+
+            if (old == None):
+                self.record(playlist_id, video_id, current[video_id], archive_index, "added")
+
+            elif (old[0] != deleted):
+                event = "deleted" if deleted else "restored"
+
+                self.record(playlist_id, video_id, current[video_id], archive_index, event)
+
+        if (previous != None):
+
+            for video_id, old in previous.items():
+
+                if (video_id not in current):
+                    self.record(playlist_id, video_id, old, archive_index, "removed")
+
+        self.live_videos[playlist_id] = current
+
+    def record(
+        self, 
+        playlist_id: str, 
+        video_id: str, 
+        state: Tuple[bool, str, str], 
+        archive_index: int, 
+        event: str
+    ) -> None:
+
+        playlist_histories = self.histories.setdefault(playlist_id, {})
+
+        if (video_id not in playlist_histories):
+            playlist_histories[video_id] = [state[1], state[2], []]
+
+        history = playlist_histories[video_id]
+
+        if not (state[0]):
+            history[0] = state[1]
+            history[1] = state[2]
+
+        history[2].append((archive_index, event))
+
+    def write_to_output(self) -> None:
+        '''
+        This method writes the lifecycle of every video that changed, 
+        playlist by playlist.
+        '''
+
+        write = self.output_file.write
+
+        if (len(self.archive_times) != 0):
+            write(f"Reporting the lifecycle of the videos across {len(self.archive_times)} archive(s), from {self.archive_times[0]} to {self.archive_times[-1]}\n\n")
+
+        for playlist_id, first_index in self.first_archive_index.items():
+            playlist_histories = self.histories.get(playlist_id, {})
+
+            if (len(playlist_histories) == 0):
+                write(f"0 changes for playlist with id {playlist_id} ({YOUTUBE_PLAYLIST_PREFIX}{playlist_id}) since {self.archive_times[first_index]}\n\n")
+                continue
+
+            write(f"The lifecycle of the videos that changed in playlist with id {playlist_id} ({YOUTUBE_PLAYLIST_PREFIX}{playlist_id}) since {self.archive_times[first_index]} ({len(playlist_histories)} video(s) changed):\n\n")
+
+            for video_id, (name, channel, events) in playlist_histories.items():
+                write(f"\"{name}\" by channel \"{channel}\" ({YOUTUBE_VIDEO_PREFIX}{video_id}):\n")
+
+                for archive_index, event in events:
+                    write(f"    {self.archive_times[archive_index]}: {event}\n")
+
+                write("\n")
+
+        self.output_file.close()
+
+        try:
+            os.replace(self.temporary_file_path, self.output_file_path)
+
+        except OSError as error:
+            err_print(f"Could not write to {self.output_file_path.as_posix()}: {error}")
+
+            self.clean_up(1)
+
+    def clean_up(self, err_code: int) -> None:
+        '''
+        This method closes the temporary file and removes it, for when the 
+        program has to stop before the report is complete. The output file is 
+        left as it was.
+        '''
+
+        self.output_file.close()
+
+        if (self.output_file != PlaceHolder.get_place_holder() and 
+            self.temporary_file_path.exists()):
+
+            self.temporary_file_path.unlink()
+
+        exit(err_code)
+
+def main():
+
+    if (len(sys.argv) < 3):
+        err_print(
+            "Usage: python3 timeline.py <output_file> <archive> [<archive> ...]"
+        )
+
+        exit(1)
+
+    timeline: Timeline = Timeline(sys.argv[2:], sys.argv[1])
+    timeline.fetch_archives()
+    timeline.open_output_file()
+    timeline.main_work()
+    timeline.write_to_output()
+
+if (__name__ == "__main__"):
+    main()
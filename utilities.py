@@ -1,6 +1,7 @@
 # Python
 import sys
 import pathlib
+import hashlib
 
 # Internal
 from PlaceHolder import PlaceHolder
@@ -21,13 +22,15 @@ def err_print(*args, **kwargs) -> None:
 
     print(*args, **kwargs, file=sys.stderr)
 
-def input_file_opening(path_link: pathlib.Path):
+def input_file_opening(path_link: pathlib.Path, binary: bool = False):
     '''
     This function attempts to open the file as specified by the 
     name passed in through the argument for reading .
 
     Params:
         str: the name of the file to be opened.
+        bool: whether to open the file in binary mode instead of as UTF-8 
+        text.
 
     Returns:
         The file object if succesful, PlaceHolder object otherwise.
@@ -35,7 +38,11 @@ def input_file_opening(path_link: pathlib.Path):
     has_problem = False
 
     try:
-        file = path_link.open("r", encoding="utf-8")
+        if (binary):
+            file = path_link.open("rb")
+
+        else:
+            file = path_link.open("r", encoding="utf-8")
 
     except PermissionError:
         err_print(
@@ -56,13 +63,15 @@ def input_file_opening(path_link: pathlib.Path):
 
     return file
 
-def output_file_opening(path_link: pathlib.Path):
+def output_file_opening(path_link: pathlib.Path, binary: bool = False):
     '''
     This function attempts to open the file as specified by the 
     name passed in through the argument for writing.
 
     Params:
         str: the name of the file to be opened.
+        bool: whether to open the file in binary mode instead of as UTF-8 
+        text.
 
     Returns:
         The file object if succesful, PlaceHolder object otherwise.
@@ -70,7 +79,11 @@ def output_file_opening(path_link: pathlib.Path):
     has_problem = False
 
     try:
-        file = path_link.open("w", encoding="utf-8")
+        if (binary):
+            file = path_link.open("wb")
+
+        else:
+            file = path_link.open("w", encoding="utf-8")
 
     except PermissionError:
         err_print(
@@ -87,6 +100,34 @@ def output_file_opening(path_link: pathlib.Path):
 
     return file
 
+def hash_file(file, size: int) -> bytes:
+    '''
+    This function computes the SHA-256 digest of the start of a file, a bit 
+    at a time.
+
+    Params:
+        file: a file opened for reading in binary mode.
+        int: how many bytes (from the start of the file) to hash.
+
+    Returns:
+        The digest, or b"" if the file is shorter than size.
+    '''
+
+    checksum = hashlib.sha256()
+
+    file.seek(0)
+
+    while (size > 0):
+        data = file.read(min(size, 1024*1024))
+
+        if not (data):
+            return b""
+
+        checksum.update(data)
+        size -= len(data)
+
+    return checksum.digest()
+
 def overwriting_file_warning(name: str) -> bool:
     '''
     This function warns the user of potentially overwriting an existing file 
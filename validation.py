@@ -0,0 +1,287 @@
+'''
+validation.py: checking that archives, playlists and videos are of correct
+format (see README), and pointing out exactly where the first mistake is.
+
+Every find_..._error() function returns None if what it is given is correct,
+otherwise a description of the first mistake starting with its path, e.g.
+
+    playlists["PL..."]["videos"]["dQw4w9WgXcQ"]["channel"]: expected a string but found null
+
+The videos are checked with a single lookup per attribute, the slower checks
+that explain what is wrong only run once something is.
+'''
+
+# Python
+from typing import Any, Dict, Tuple, Union
+import functools
+import json
+import time
+
+# Internal
+from configuration import TIME_FORMAT_STR
+
+VIDEO_ATTRIBUTES: Tuple[str, ...] = ("id", "name", "channel", "link")
+PLAYLIST_ATTRIBUTES: Tuple[Tuple[str, type], ...] = (
+    ("id", str),
+    ("videos", dict),
+    ("link", str)
+)
+PAGE_ATTRIBUTES: Tuple[Tuple[str, Tuple[type, ...]], ...] = (
+    ("page_token", (str,)),
+    ("next_page_token", (str, type(None))),
+    ("etag", (str, type(None))),
+    ("count", (int,))
+)
+
+JSON_TYPE_NAMES: Dict[type, str] = {
+    dict: "an object",
+    list: "an array",
+    str: "a string",
+    int: "a number",
+    float: "a number",
+    bool: "a boolean",
+    type(None): "null"
+}
+
+
+def describe_type(value: Any) -> str:
+    return JSON_TYPE_NAMES.get(type(value), type(value).__name__)
+
+def make_path(path: str, key: str) -> str:
+    return f"{path}[{json.dumps(key, ensure_ascii=False)}]"
+
+@functools.lru_cache(maxsize=256)
+def parse_time_str(time_str: str) -> Union[time.struct_time, None]:
+    '''
+    This function parses the time string of an archive. The result is kept,
+    so checking the time then using it only parses it once.
+
+    Params:
+        str which is the time string.
+
+    Returns:
+        The equivalent struct_time object, None if it is not of correct
+        format.
+    '''
+
+    try:
+        return time.strptime(time_str, TIME_FORMAT_STR)
+
+    except ValueError:
+        return None
+
+def find_video_error(video: Any, path: str = "video") -> Union[str, None]:
+    '''
+    This function checks whether the given value is of correct format of a
+    video as defined in README.
+
+    Params:
+        The video, and its path (for the description of the mistake).
+
+    Returns:
+        None if it is correct, the description of the first mistake otherwise.
+    '''
+
+    if not (isinstance(video, dict)):
+        return f"{path}: expected an object but found {describe_type(video)}"
+
+    for attribute in VIDEO_ATTRIBUTES:
+
+        if (attribute not in video):
+            return f"{make_path(path, attribute)}: missing"
+
+        if not (isinstance(video[attribute], str)):
+            return f"{make_path(path, attribute)}: expected a string but found {describe_type(video[attribute])}"
+
+    return None
+
+def find_pages_error(pages: Any, path: str = "pages") -> Union[str, None]:
+    '''
+    This function checks whether the given value is of correct format of the
+    pages attribute of a playlist as defined in README.
+
+    Params:
+        The pages, and their path (for the description of the mistake).
+
+    Returns:
+        None if they are correct, the description of the first mistake
+        otherwise.
+    '''
+
+    if not (isinstance(pages, list)):
+        return f"{path}: expected an array but found {describe_type(pages)}"
+
+    # The token of the page the previous page points to, "" for the first.
+    expected_page_token: Union[str, None] = ""
+
+    for index, page in enumerate(pages):
+        page_path = f"{path}[{index}]"
+
+        if not (isinstance(page, dict)):
+            return f"{page_path}: expected an object but found {describe_type(page)}"
+
+        for attribute, attribute_types in PAGE_ATTRIBUTES:
+
+            if (attribute not in page):
+                return f"{make_path(page_path, attribute)}: missing"
+
+            # bool is a subclass of int, but true is not a count.
+            if (type(page[attribute]) is bool or
+                not isinstance(page[attribute], attribute_types)):
+
+                expected = " or ".join(JSON_TYPE_NAMES[attribute_type] for attribute_type in attribute_types)
+
+                return f"{make_path(page_path, attribute)}: expected {expected} but found {describe_type(page[attribute])}"
+
+        if (page["count"] < 0):
+            return f"{make_path(page_path, 'count')}: expected a count but found {page['count']}"
+
+        # The pages have to follow one another, otherwise the archiver could
+        # go round in circles when they are unchanged.
+        if (page["page_token"] != expected_page_token):
+            return f"{make_path(page_path, 'page_token')}: expected {json.dumps(expected_page_token, ensure_ascii=False)} but found {json.dumps(page['page_token'], ensure_ascii=False)}"
+
+        expected_page_token = page["next_page_token"]
+
+    if (len(pages) != 0 and expected_page_token != None):
+        return f"{make_path(f'{path}[{len(pages) - 1}]', 'next_page_token')}: expected null for the last page but found {json.dumps(expected_page_token, ensure_ascii=False)}"
+
+    return None
+
+def find_playlist_error(playlist: Any, path: str = "playlist") -> Union[str, None]:
+    '''
+    This function checks whether the given value is of correct format of a
+    playlist as defined in README.
+
+    Params:
+        The playlist, and its path (for the description of the mistake).
+
+    Returns:
+        None if it is correct, the description of the first mistake otherwise.
+    '''
+
+    if not (isinstance(playlist, dict)):
+        return f"{path}: expected an object but found {describe_type(playlist)}"
+
+    for attribute, attribute_type in PLAYLIST_ATTRIBUTES:
+
+        if (attribute not in playlist):
+            return f"{make_path(path, attribute)}: missing"
+
+        if not (isinstance(playlist[attribute], attribute_type)):
+            return f"{make_path(path, attribute)}: expected {JSON_TYPE_NAMES[attribute_type]} but found {describe_type(playlist[attribute])}"
+
+    if ("pages" in playlist):
+        error = find_pages_error(playlist["pages"], make_path(path, "pages"))
+
+        if (error != None):
+            return error
+
+    videos = playlist["videos"]
+
+    for video_id, video in videos.items():
+
+        # Nearly every video is correct, so only the common case is checked
+        # here (a subclass of str, a missing attribute or a video that is
+        # not an object all fall through to find_video_error()).
+        try:
+            if (type(video["id"]) is str and
+                type(video["name"]) is str and
+                type(video["channel"]) is str and
+                type(video["link"]) is str):
+
+                continue
+
+        except (KeyError, TypeError, IndexError):
+            pass
+
+        error = find_video_error(video, make_path(make_path(path, "videos"), video_id))
+
+        if (error != None):
+            return error
+
+    return None
+
+def find_time_error(time_str: Any, path: str = "time") -> Union[str, None]:
+
+    if not (isinstance(time_str, str)):
+        return f"{path}: expected a string but found {describe_type(time_str)}"
+
+    if (parse_time_str(time_str) == None):
+        return f"{path}: {json.dumps(time_str, ensure_ascii=False)} is not of the format {json.dumps(TIME_FORMAT_STR)}"
+
+    return None
+
+def find_archive_error(archive: Any) -> Union[str, None]:
+    '''
+    This function checks whether the given value is of correct format of an
+    archive as defined in README.
+
+    Params:
+        The whole archive.
+
+    Returns:
+        None if it is correct, the description of the first mistake otherwise.
+    '''
+
+    if not (isinstance(archive, dict)):
+        return f"archive: expected an object but found {describe_type(archive)}"
+
+    if ("time" not in archive):
+        return "time: missing"
+
+    if ("playlists" not in archive):
+        return "playlists: missing"
+
+    error = find_time_error(archive["time"])
+
+    if (error != None):
+        return error
+
+    if not (isinstance(archive["playlists"], dict)):
+        return f"playlists: expected an object but found {describe_type(archive['playlists'])}"
+
+    for playlist_id, playlist in archive["playlists"].items():
+        error = find_playlist_error(playlist, make_path("playlists", playlist_id))
+
+        if (error != None):
+            return error
+
+    return None
+
+def find_archive_stream_error(reader, trust: bool = False) -> Union[str, None]:
+    '''
+    This function checks the archive being read by the given reader, one
+    playlist at a time as each one is parsed, and stops at the first mistake
+    without reading the rest.
+
+    Params:
+        reader: the ArchiveReader (or BinaryArchiveReader) of the archive,
+        which must not have been iterated yet.
+        trust: if True and the archive has a checksum (see README) that
+        matches, the playlists are not checked at all, since the archive is
+        exactly what archiver.py wrote.
+
+    Returns:
+        None if it is correct, the description of the first mistake otherwise.
+    '''
+
+    try:
+        if (trust and reader.verify_checksum()):
+            reader.find_playlists()
+
+            return find_time_error(reader.read_time())
+
+        for playlist_id, playlist in reader.iterate():
+            error = find_playlist_error(playlist, make_path("playlists", playlist_id))
+
+            if (error != None):
+                return error
+
+    except ValueError as error:
+        return f"archive: {error}"
+
+    if (reader.time == None):
+        return "time: missing"
+
+    return find_time_error(reader.time)
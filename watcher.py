@@ -0,0 +1,623 @@
+'''
+watcher.py: keeps archiving the same playlists as a long running process,
+each on its own schedule, instead of running archiver.py and comparator.py
+from cron.
+
+Usage: python3 watcher.py [-i <interval>] [-j <jobs>] [-f json|binary] [--chain <directory>] [--events <events_file>] [--quota <units>] [--rate <requests_per_second>] [--api-url <url>] [--metrics <json_file>] [--prometheus <file>] <input_file> <output_file>
+
+Every line of <input_file> is a playlist url (like for archiver.py),
+optionally followed by how often (in seconds) the playlist is archived
+again, <interval> by default.
+
+The latest archive stays in memory. A playlist that is due is fetched with
+the ETags of its pages (so unchanged pages are not downloaded again) and
+compared with what it was as soon as it is fetched. Once the playlists due
+at the same time are fetched, if anything changed, the archive is written to
+<output_file> from memory, and added to the snapshot chain (if any) with its
+delta worked out from memory too, so nothing is read back from disk. Then
+every video that changed is written as an event.
+
+<output_file> is read once on start if it exists, so the watcher carries
+on where it left off. Since the events are only written once the archive
+that has the changes is saved, a change is never lost nor reported twice
+across restarts.
+
+Ctrl+C (or SIGTERM) stops the watcher once the fetches going on give up,
+which they do at their next request.
+'''
+
+# Python
+from typing import Dict, Iterator, List, Tuple, Union
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import argparse
+import heapq
+import json
+import pathlib
+import signal
+import sys
+import threading
+import time
+
+# Internal
+from configuration import (
+    API_URL,
+    MAX_CONCURRENT_FETCHES,
+    QUOTA_DAILY_BUDGET,
+    REQUESTS_PER_SECOND,
+    TIME_FORMAT_STR,
+    WATCH_INTERVAL
+)
+from utilities import err_print, input_file_opening
+from PlaceHolder import PlaceHolder
+from Transport import Transport
+from ResponseCache import ResponseCache
+from QuotaScheduler import QuotaScheduler
+from ConcurrencyController import ConcurrencyController
+from Metrics import Metrics
+from ArchiveWriter import ArchiveWriter
+from BinaryArchive import BinaryArchiveWriter
+from SnapshotChain import SnapshotChain
+from ReportWriter import iterate_changed_videos
+from archiver import read_archive, fetch_playlist_with_quota, playlist_url_verifier
+from comparator import (
+    compare_video_set,
+    check_changes_empty,
+    check_format_of_playlist,
+    check_time_format
+)
+
+class Snapshot:
+    '''
+    This class is an archive in memory, it has the time and iterate() of an
+    ArchiveReader so that it can be added to a snapshot chain as it is.
+    '''
+
+    def __init__(self, time_str: str, playlists: Dict[str, dict]):
+        self.time: str = time_str
+        self.playlists: Dict[str, dict] = playlists
+
+    def iterate(self) -> Iterator[Tuple[str, dict]]:
+        yield from self.playlists.items()
+
+
+class Watcher:
+
+    def __init__(
+        self,
+        input_file,
+        output_file,
+        interval: float = WATCH_INTERVAL,
+        max_concurrent_fetches: int = MAX_CONCURRENT_FETCHES,
+        output_format: str = "json",
+        snapshot_chain_directory = None,
+        events_file = None,
+        metrics_file = None,
+        prometheus_file = None
+    ) -> None:
+        '''
+        Reads the input file and the last archive (if there is one), the
+        program exits if either is not valid.
+
+        interval is how often (in seconds) the playlists without an interval
+        of their own are archived again.
+
+        output_format is the format of the archive written, either "json" or
+        "binary" (see BinaryArchive.py).
+
+        snapshot_chain_directory is an optional snapshot chain (see
+        SnapshotChain.py) every archive written is also added to.
+
+        events_file is the file the events are appended to, one JSON object
+        per line (see emit_events()), they are printed if it is None.
+
+        metrics_file and prometheus_file are optional files the metrics (see
+        Metrics.py) are written to after every round of fetches.
+        '''
+
+        self.output_file_path: pathlib.Path = pathlib.Path(output_file).expanduser().resolve()
+
+        if (output_format == "binary"):
+            self.archive_writer_class = BinaryArchiveWriter
+
+        else:
+            self.archive_writer_class = ArchiveWriter
+
+        self.max_concurrent_fetches: int = max(1, max_concurrent_fetches)
+
+        Transport.get_transport().set_pool_size(self.max_concurrent_fetches)
+
+        ConcurrencyController.get_controller().set_maximum(
+            self.max_concurrent_fetches
+        )
+
+        # A page cached less than CACHE_TTL ago would be taken as it was,
+        # conditional requests already make unchanged pages cheap.
+        ResponseCache.get_cache().set_enabled(False)
+
+        # The url, id and interval of every playlist, in the order of the
+        # input file.
+        self.urls: List[str] = []
+        self.playlist_ids: List[str] = []
+        self.intervals: List[float] = []
+
+        self.read_input_file(pathlib.Path(input_file).expanduser().resolve(), interval)
+
+        # The latest JSON representation of every playlist fetched so far,
+        # keyed by its id.
+        self.playlists: Dict[str, dict] = {}
+
+        if (self.output_file_path.exists()):
+            last_archive = read_archive(self.output_file_path)
+
+            if (last_archive == None):
+                exit(1)
+
+            # Only the playlists still in the input file are watched.
+            self.playlists = {
+                playlist_id: playlist
+                for playlist_id, playlist in last_archive[1].items()
+                if (playlist_id in self.playlist_ids)
+            }
+
+        self.snapshot_chain: Union[SnapshotChain, None] = None
+
+        # The playlists of the last snapshot added to the chain, None until
+        # the watcher adds one (the chain is read for the first delta only).
+        self.chain_playlists: Union[Dict[str, dict], None] = None
+
+        if (snapshot_chain_directory != None):
+            snapshot_chain_path = pathlib.Path(snapshot_chain_directory).expanduser().resolve()
+
+            try:
+                self.snapshot_chain = SnapshotChain(snapshot_chain_path)
+
+            except (OSError, ValueError):
+                err_print(f"File {snapshot_chain_path.as_posix()} is not a snapshot chain or is corrupted, please check it again.")
+
+                exit(1)
+
+        self.events_file = sys.stdout
+
+        if (events_file != None):
+            events_file_path = pathlib.Path(events_file).expanduser().resolve()
+
+            try:
+                self.events_file = events_file_path.open("a", encoding="utf-8")
+
+            except OSError:
+                err_print(f"File {events_file_path.as_posix()} cannot be opened, please check it again.")
+
+                exit(1)
+
+        self.metrics_file_path: Union[pathlib.Path, None] = None
+        self.prometheus_file_path: Union[pathlib.Path, None] = None
+
+        if (metrics_file != None):
+            self.metrics_file_path = pathlib.Path(metrics_file).expanduser().resolve()
+
+        if (prometheus_file != None):
+            self.prometheus_file_path = pathlib.Path(prometheus_file).expanduser().resolve()
+
+        # Set by stop(), main_work() returns once it is.
+        self.stopped = threading.Event()
+
+    def read_input_file(self, input_file_path: pathlib.Path, interval: float) -> None:
+        '''
+        This method reads the playlists to watch and their intervals, the
+        program exits if a line is not valid. A playlist that appears more
+        than once is only watched once.
+        '''
+
+        input_file = input_file_opening(input_file_path)
+
+        if (input_file == PlaceHolder.get_place_holder()):
+            exit(1)
+
+        lines = [line.split() for line in input_file]
+
+        input_file.close()
+
+        for line_number, fields in enumerate(lines, 1):
+
+            if not (fields):
+                continue
+
+            playlist_id = playlist_url_verifier(fields[0])
+
+            try:
+                playlist_interval = float(fields[1]) if (len(fields) > 1) else interval
+
+            except ValueError:
+                playlist_interval = -1
+
+            if (not playlist_id or len(fields) > 2 or playlist_interval <= 0):
+                err_print(f"Line {line_number} of the input file is not a playlist url followed by an optional interval in seconds, please recheck it.")
+
+                exit(1)
+
+            if (playlist_id in self.playlist_ids):
+                continue
+
+            self.urls.append(fields[0])
+            self.playlist_ids.append(playlist_id)
+            self.intervals.append(playlist_interval)
+
+        if not (self.urls):
+            err_print("There is no playlist to watch in the input file.")
+
+            exit(1)
+
+    def main_work(self) -> None:
+        '''
+        This method fetches the playlists that are due, waits until the next
+        one is, and so on until stop() is called.
+        '''
+
+        # (when it is due, index of the playlist), every playlist is due
+        # right away.
+        schedule: List[Tuple[float, int]] = [
+            (time.monotonic(), index) for index in range(len(self.urls))
+        ]
+
+        with ThreadPoolExecutor(
+            max_workers=self.max_concurrent_fetches
+        ) as executor:
+
+            while not (self.stopped.is_set()):
+                now = time.monotonic()
+
+                due: List[int] = []
+
+                while (schedule and schedule[0][0] <= now):
+                    due.append(heapq.heappop(schedule)[1])
+
+                if not (due):
+                    self.stopped.wait(schedule[0][0] - now)
+                    continue
+
+                self.fetch_playlists(executor, due)
+
+                # The next fetch is counted from when this one was due, so
+                # the schedule does not drift by how long fetches take.
+                for index in due:
+                    heapq.heappush(schedule, (now + self.intervals[index], index))
+
+    def fetch_playlists(self, executor: ThreadPoolExecutor, indexes: List[int]) -> None:
+        '''
+        This method fetches the playlists of the given indexes, compares each
+        one with what it was as soon as it is fetched, then saves the archive
+        if anything changed and only then writes the events.
+
+        A playlist that cannot be fetched keeps what it was and is tried
+        again at its next turn. If the archive cannot be saved, the playlists
+        go back to what they were in the last archive saved, so that their
+        changes are found (and reported) again at their next turn.
+        '''
+
+        futures = {
+            executor.submit(
+                fetch_playlist_with_quota,
+                self.urls[index],
+                self.playlists.get(self.playlist_ids[index])
+            ): index
+            for index in indexes
+        }
+
+        # What the playlists that changed were before, keyed by their id
+        # (None for the ones fetched for the first time).
+        old_playlists: Dict[str, Union[dict, None]] = {}
+
+        # (playlist id, changes) of the playlists with videos that changed.
+        pending_events: List[Tuple[str, tuple]] = []
+
+        for future in as_completed(futures):
+            this_playlist = future.result()
+
+            if not (this_playlist):
+                continue
+
+            playlist_id = this_playlist.get_id()
+            playlist_json = this_playlist.construct_json_obj()
+
+            old_playlist_json = self.playlists.get(playlist_id)
+
+            # Renames and new ETags are not events but still go in the
+            # archive.
+            if (playlist_json == old_playlist_json):
+                continue
+
+            old_playlists[playlist_id] = old_playlist_json
+            self.playlists[playlist_id] = playlist_json
+
+            if (old_playlist_json == None):
+                err_print(f"Watching the playlist {playlist_id} ({len(playlist_json['videos'])} video(s))")
+                continue
+
+            changes = compare_video_set(old_playlist_json["videos"], playlist_json["videos"])
+
+            if not (check_changes_empty(changes)):
+                pending_events.append((playlist_id, changes))
+
+        if (old_playlists):
+
+            if (self.save()):
+
+                for playlist_id, changes in pending_events:
+                    self.emit_events(playlist_id, changes)
+
+            else:
+                for playlist_id, old_playlist_json in old_playlists.items():
+
+                    if (old_playlist_json == None):
+                        del self.playlists[playlist_id]
+
+                    else:
+                        self.playlists[playlist_id] = old_playlist_json
+
+        QuotaScheduler.get_scheduler().save_state()
+
+        self.write_metrics()
+
+    def emit_events(self, playlist_id: str, changes: tuple) -> None:
+        '''
+        This method writes an event for every video of the playlist that
+        changed, one JSON object per line:
+
+            {"time": str, "playlist_id": str, "change": str, "video_id": str, "old": {"name": str, "channel": str}, "new": ...}
+
+        like the ndjson format of comparator.py, with the time the change was
+        seen.
+        '''
+
+        time_str = time.strftime(TIME_FORMAT_STR)
+
+        lines = [
+            json.dumps({
+                "time": time_str,
+                "playlist_id": playlist_id,
+                "change": change,
+                "video_id": video_id,
+                "old": {"name": old_video.name, "channel": old_video.channel} if (old_video != None) else None,
+                "new": {"name": new_video.name, "channel": new_video.channel} if (new_video != None) else None
+            }, ensure_ascii=False)
+            for change, video_id, old_video, new_video in iterate_changed_videos(changes)
+        ]
+
+        self.events_file.write("\n".join(lines) + "\n")
+        self.events_file.flush()
+
+        Metrics.get_metrics().increment("events_total", len(lines))
+
+    def save(self) -> bool:
+        '''
+        This method writes the archive in memory to the output file (and the
+        snapshot chain, if any), with the playlists in the order of the input
+        file. A failure is printed but does not stop the watcher, the next
+        save writes everything again.
+
+        Returns:
+            True if the output file was written (even if adding to the
+            snapshot chain failed), False otherwise.
+        '''
+
+        time_str = time.strftime(TIME_FORMAT_STR)
+
+        snapshot = Snapshot(time_str, {
+            playlist_id: self.playlists[playlist_id]
+            for playlist_id in self.playlist_ids
+            if (playlist_id in self.playlists)
+        })
+
+        archive_writer = self.archive_writer_class(self.output_file_path, time_str)
+
+        if not (archive_writer.open()):
+            err_print(f"Could not write the archive to {self.output_file_path.as_posix()}.")
+            return False
+
+        try:
+            for playlist in snapshot.playlists.values():
+                archive_writer.write_playlist(playlist)
+
+            archive_writer.finish()
+
+        except OSError as error:
+            err_print(f"Could not write the archive to {self.output_file_path.as_posix()}: {error}")
+
+            return False
+
+        finally:
+            archive_writer.close()
+
+        if (self.snapshot_chain == None):
+            return True
+
+        try:
+            snapshot_index = self.snapshot_chain.append(
+                snapshot,
+                check_format_of_playlist,
+                check_time_format,
+                self.chain_playlists
+            )
+
+        except (OSError, ValueError) as error:
+            err_print(f"Could not add the archive to the snapshot chain: {error}")
+
+            # The next delta is worked out from the chain itself again.
+            self.chain_playlists = None
+            return True
+
+        self.chain_playlists = snapshot.playlists
+
+        err_print(f"Saved as snapshot {snapshot_index} of the chain")
+
+        return True
+
+    def write_metrics(self) -> None:
+
+        if (self.metrics_file_path == None and self.prometheus_file_path == None):
+            return
+
+        metrics = Metrics.get_metrics()
+        scheduler = QuotaScheduler.get_scheduler()
+
+        metrics.set_gauge("quota_used_units", scheduler.used)
+        metrics.set_gauge("quota_budget_units", scheduler.budget)
+        metrics.set_gauge("watched_playlists", len(self.playlists))
+
+        if not (metrics.write(self.metrics_file_path, self.prometheus_file_path)):
+            err_print("Could not write the metrics files.")
+
+    def stop(self) -> None:
+        '''
+        This method makes main_work() return once the fetches going on are
+        done, they give up at their next request or retry.
+        '''
+
+        self.stopped.set()
+
+        QuotaScheduler.get_scheduler().stop()
+
+    def close(self) -> None:
+
+        if (self.events_file != sys.stdout):
+            self.events_file.close()
+
+        if (self.snapshot_chain != None):
+            self.snapshot_chain.close()
+
+def main() -> None:
+
+    parser = argparse.ArgumentParser(
+        description="Keep archiving Youtube playlists, each on its own schedule, and report what changes as it happens.",
+        epilog=(
+            "Every line of <input_file> is a playlist url, optionally followed "
+            "by how often (in seconds) the playlist is archived again."
+        )
+    )
+
+    parser.add_argument("input_file")
+    parser.add_argument("output_file")
+    parser.add_argument(
+        "-i", "--interval",
+        type=float,
+        default=WATCH_INTERVAL,
+        help=f"seconds between 2 fetches of a playlist without an interval of its own (default: {WATCH_INTERVAL:.0f})"
+    )
+
+    parser.add_argument(
+        "-j", "--jobs",
+        type=int,
+        default=MAX_CONCURRENT_FETCHES,
+        help=f"number of playlists fetched at the same time (default: {MAX_CONCURRENT_FETCHES})"
+    )
+
+    parser.add_argument(
+        "-f", "--format",
+        choices=["json", "binary"],
+        default="json",
+        help="format of the archive written (default: json)"
+    )
+
+    parser.add_argument(
+        "--chain",
+        default=None,
+        help="a snapshot chain every archive written is also added to, it is created if needed"
+    )
+
+    parser.add_argument(
+        "--events",
+        default=None,
+        help="a file the change events are appended to (default: they are printed)"
+    )
+
+    parser.add_argument(
+        "--quota",
+        type=int,
+        default=QUOTA_DAILY_BUDGET,
+        help=f"quota units that can be used per day (default: {QUOTA_DAILY_BUDGET})"
+    )
+
+    parser.add_argument(
+        "--rate",
+        type=float,
+        default=REQUESTS_PER_SECOND,
+        help=f"maximum number of requests sent per second (default: {REQUESTS_PER_SECOND})"
+    )
+
+    parser.add_argument(
+        "--api-url",
+        default=API_URL,
+        help="url of the playlistItems endpoint, to use another server like benchmarks/mock_api.py (default: the Youtube API)"
+    )
+
+    parser.add_argument(
+        "--metrics",
+        default=None,
+        help="a file the metrics are written to after every round of fetches, as JSON"
+    )
+
+    parser.add_argument(
+        "--prometheus",
+        default=None,
+        help="a file the metrics are written to after every round of fetches, in the Prometheus text format"
+    )
+
+    args = parser.parse_args()
+
+    if (args.interval <= 0):
+        err_print("The interval must be greater than 0.")
+
+        exit(1)
+
+    if (args.jobs < 1):
+        err_print("The number of jobs must be at least 1.")
+
+        exit(1)
+
+    if (args.rate <= 0):
+        err_print("The request rate must be greater than 0.")
+
+        exit(1)
+
+    scheduler = QuotaScheduler.get_scheduler()
+    scheduler.set_budget(args.quota)
+    scheduler.set_rate(args.rate)
+
+    Transport.get_transport().set_api_url(args.api_url)
+
+    # The quota of another API is not the quota of Youtube.
+    if (args.api_url != API_URL):
+        scheduler.set_persistent(False)
+
+    watcher = Watcher(
+        args.input_file,
+        args.output_file,
+        args.interval,
+        args.jobs,
+        args.format,
+        args.chain,
+        args.events,
+        args.metrics,
+        args.prometheus
+    )
+
+    # Ctrl+C (or SIGTERM, when run as a service) only asks the watcher to
+    # stop, so that it is never stopped between saving the archive and
+    # writing the events.
+    def handle_signal(signal_number, frame) -> None:
+        err_print("Stopping...")
+
+        watcher.stop()
+
+    signal.signal(signal.SIGINT, handle_signal)
+    signal.signal(signal.SIGTERM, handle_signal)
+
+    watcher.main_work()
+
+    QuotaScheduler.get_scheduler().save_state()
+    watcher.close()
+
+    err_print("Stopped")
+
+if (__name__ == "__main__"):
+    main()
@@ -0,0 +1,87 @@
+'''
+ytarchiver.py: one entry point for all the programs of the archiver, as
+subcommands.
+
+Usage: python3 ytarchiver.py <command> [<arguments> ...]
+       python3 ytarchiver.py <command> --help
+
+Every command takes the same arguments as the program it runs (see
+COMMANDS), for example "python3 ytarchiver.py compare <old_archive>
+<new_archive> <output_file>" is "python3 comparator.py <old_archive>
+<new_archive> <output_file>".
+
+Only the module of the command given is imported, so a command never pays
+for the dependencies of the others (like requests, which only the archiver
+needs). benchmarks/startup.py checks how long every command takes to import.
+'''
+
+# Python
+import sys
+import importlib
+from typing import Callable, Dict, List, Tuple
+
+# Internal
+from utilities import err_print
+
+# Command -> (module that has its main(), description).
+COMMANDS: Dict[str, Tuple[str, str]] = {
+    "archive": ("archiver", "archive Youtube playlists"),
+    "watch": ("watcher", "keep archiving Youtube playlists and report changes as they happen"),
+    "compare": ("comparator", "compare 2 archives or snapshots"),
+    "convert": ("converter", "convert an archive between the JSON and binary formats"),
+    "timeline": ("timeline", "report the history of videos over many archives"),
+    "snapshots": ("snapshots", "list or import snapshots of a snapshot store"),
+    "chain": ("chain", "list, add or extract snapshots of a snapshot chain"),
+    "lookup": ("lookup", "find videos by id in a lookup index"),
+    "search": ("search", "find videos by name or channel in a search index")
+}
+
+def get_usage() -> List[str]:
+    return [
+        "Usage: python3 ytarchiver.py <command> [<arguments> ...]",
+        "",
+        "Commands:"
+    ] + [
+        f"    {command:<12}{description} ({module_name}.py)"
+        for command, (module_name, description) in COMMANDS.items()
+    ]
+
+def load_command(command: str) -> Callable[[], None]:
+    '''
+    This function imports the module of the command.
+
+    Returns:
+        The main() of the module.
+    '''
+
+    return importlib.import_module(COMMANDS[command][0]).main
+
+def main() -> None:
+
+    if (len(sys.argv) == 2 and sys.argv[1] in ("-h", "--help")):
+        print("\n".join(get_usage()))
+
+        exit(0)
+
+    if (len(sys.argv) < 2 or sys.argv[1] not in COMMANDS):
+
+        if (len(sys.argv) >= 2):
+            err_print(f"Unknown command {sys.argv[1]}")
+
+        for line in get_usage():
+            err_print(line)
+
+        exit(1)
+
+    command = sys.argv[1]
+
+    command_main = load_command(command)
+
+    # The programs read their arguments from sys.argv, as if they were run on
+    # their own (argparse also names itself after sys.argv[0]).
+    sys.argv = [f"{sys.argv[0]} {command}"] + sys.argv[2:]
+
+    command_main()
+
+if (__name__ == "__main__"):
+    main()